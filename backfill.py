@@ -0,0 +1,162 @@
+import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from ohlc import (
+    FOLDER,
+    SESSIONS,
+    ChangeFilter,
+    TIMEFRAME,
+    concat_ticks,
+    make_ticks,
+    ohlc_all_sessions,
+    parse_ts_from_filename,
+    read_symbol_price_from_file,
+    use_change_filter,
+    write_session_outputs,
+)
+
+# ======================
+# CONFIG
+# ======================
+# Số file tối đa mỗi phần việc; None = chia mỗi ngày thành đủ phần cho các process
+FILES_PER_CHUNK = None
+
+BAR_COLUMNS = ["date", "session", "time", "symbol", "open", "high", "low", "close"]
+
+
+# ======================
+# Helpers
+# ======================
+def list_snapshots(folder: str, start_date: str | None = None, end_date: str | None = None) -> list[str]:
+    """
+    Các file snapshot có timestamp hợp lệ trong [start_date, end_date] (YYYYMMDD), sắp theo thời gian.
+    """
+    paths = []
+    for entry in os.scandir(folder):
+        if not entry.is_file() or parse_ts_from_filename(entry.path) is None:
+            continue
+        day = entry.name[:8]
+        if start_date and day < start_date:
+            continue
+        if end_date and day > end_date:
+            continue
+        paths.append(entry.path)
+    return sorted(paths, key=os.path.basename)
+
+
+def split_chunks(paths: list[str], workers: int, files_per_chunk: int | None = FILES_PER_CHUNK) -> list[list[str]]:
+    """
+    Chia file theo ngày giao dịch, rồi cắt mỗi ngày thành các đoạn liên tiếp theo thời gian.
+    """
+    by_day = {}
+    for p in paths:
+        by_day.setdefault(os.path.basename(p)[:8], []).append(p)
+
+    if files_per_chunk is None:
+        # ít ngày -> cắt nhỏ để vẫn dùng hết các process
+        per_day = max(1, -(-workers // max(1, len(by_day))))
+        files_per_chunk = max(1, -(-max(len(v) for v in by_day.values()) // per_day)) if by_day else 1
+
+    chunks = []
+    for day in sorted(by_day):
+        files = by_day[day]
+        for i in range(0, len(files), files_per_chunk):
+            chunks.append(files[i:i + files_per_chunk])
+    return chunks
+
+
+def partial_bars(
+    paths: list[str],
+    timeframe: str,
+    sessions: list[tuple[str, str]] = SESSIONS,
+    change_only: bool = True,
+) -> pd.DataFrame:
+    """
+    Chạy trong process con: đọc 1 đoạn file rồi dựng nến từng phần; chỉ trả nến về, không trả tick.
+    change_only đã được kiểm tra với timeframe ở process cha (use_change_filter()).
+    """
+    rows = []
+    change = ChangeFilter() if change_only else None
+    for f in paths:
+        try:
+            sp = read_symbol_price_from_file(f)
+        except Exception:
+            continue
+        if sp.empty:
+            continue
+        ticks = make_ticks(sp, parse_ts_from_filename(f))
+        rows.append(change.apply(ticks) if change is not None else ticks)
+
+    if not rows:
+        return pd.DataFrame(columns=BAR_COLUMNS)
+    return ohlc_all_sessions(concat_ticks(rows), timeframe, sessions)
+
+
+def merge_partial_bars(parts: list[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Gộp nến từng phần (đã xếp theo thứ tự thời gian của đoạn): open của phần đầu,
+    high = max, low = min, close của phần cuối.
+    """
+    parts = [p for p in parts if not p.empty]
+    if not parts:
+        return pd.DataFrame(columns=BAR_COLUMNS)
+
+    bars = (pd.concat(parts, ignore_index=True)
+            .groupby(["date", "session", "time", "symbol"], sort=False)
+            .agg(open=("open", "first"), high=("high", "max"), low=("low", "min"), close=("close", "last"))
+            .reset_index())
+    return bars[BAR_COLUMNS].sort_values(["date", "session", "time", "symbol"])
+
+
+def backfill_sessions(
+    folder: str,
+    timeframe: str,
+    workers: int | None = None,
+    start_date: str | None = None,
+    end_date: str | None = None,
+    files_per_chunk: int | None = FILES_PER_CHUNK,
+    write: bool = True,
+) -> pd.DataFrame:
+    """
+    Giống export_sessions() nhưng đọc + dựng nến song song trên nhiều process.
+    Không dựng bảng tick đầy đủ nên bộ nhớ chỉ phụ thuộc kích thước 1 đoạn.
+    """
+    workers = workers or os.cpu_count() or 1
+    paths = list_snapshots(folder, start_date, end_date)
+    if not paths:
+        print("Không có file snapshot nào để backfill.")
+        return pd.DataFrame(columns=BAR_COLUMNS)
+
+    chunks = split_chunks(paths, workers, files_per_chunk)
+    change_only = use_change_filter(timeframe)
+    print(f"Backfill {len(paths)} file, {len(chunks)} phần, {workers} process...")
+
+    if workers == 1:
+        parts = [partial_bars(c, timeframe, SESSIONS, change_only) for c in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            # map giữ đúng thứ tự các đoạn -> open/close gộp đúng
+            parts = list(ex.map(partial_bars, chunks, [timeframe] * len(chunks), [SESSIONS] * len(chunks),
+                                [change_only] * len(chunks)))
+
+    bars = merge_partial_bars(parts)
+    if write:
+        write_session_outputs(bars, folder, timeframe)
+    return bars
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dựng lại OHLC từ folder snapshot bằng nhiều process")
+    parser.add_argument("--folder", default=FOLDER)
+    parser.add_argument("--timeframe", default=TIMEFRAME)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--start", default=None, help="YYYYMMDD")
+    parser.add_argument("--end", default=None, help="YYYYMMDD")
+    parser.add_argument("--files-per-chunk", type=int, default=FILES_PER_CHUNK)
+    args = parser.parse_args()
+
+    backfill_sessions(args.folder, args.timeframe, workers=args.workers,
+                      start_date=args.start, end_date=args.end, files_per_chunk=args.files_per_chunk)
@@ -0,0 +1,128 @@
+import os
+import argparse
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from ohlc import FOLDER
+from detect import lower_wick_signal
+from sweep import symbol_order
+
+# ======================
+# CONFIG
+# ======================
+HORIZONS = [1, 3, 5]   # lợi nhuận sau 1/3/5 nến
+MAE_MFE_BARS = 5       # cửa sổ tính MAE/MFE (số nến sau tín hiệu)
+# Cột giới hạn cửa sổ ngoài mã: None = nến sau tín hiệu có thể sang phiên/ngày khác (qua nghỉ trưa, qua đêm);
+# ["date"] = chỉ trong cùng ngày; ["date", "session"] = chỉ trong cùng phiên
+WITHIN = None
+
+
+# ======================
+# Backtest
+# ======================
+def signal_trades(
+    bars: pd.DataFrame,
+    signal: np.ndarray | None = None,
+    horizons: list[int] = HORIZONS,
+    window: int = MAE_MFE_BARS,
+    within: list[str] | None = WITHIN,
+) -> pd.DataFrame:
+    """
+    Mỗi tín hiệu 1 dòng: vào lệnh ở close nến tín hiệu, tính cho mọi tín hiệu cùng lúc:
+    - fwd_ret_{n}: close sau n nến / giá vào - 1 (cùng mã, NaN nếu chưa đủ nến)
+    - mae / mfe: low thấp nhất / high cao nhất trong `window` nến sau đó so với giá vào
+    bars: nến intraday (export_sessions) hoặc nến ngày (vn30.py); signal: mảng bool theo dòng của bars,
+    None -> lower_wick_signal().
+    Cửa sổ chỉ tính trong cùng mã (và cùng giá trị các cột `within`): mặc định nến intraday
+    được tính nối qua ranh giới phiên và ngày.
+    """
+    if signal is None:
+        signal = lower_wick_signal(bars)
+    signal = np.asarray(signal, dtype=bool)
+
+    order = symbol_order(bars)
+    keys = [bars[c].astype(str).to_numpy()[order] for c in ["symbol", *(within or [])]]
+    # nhóm (mã, within...) liền nhau sau khi sắp theo (mã, thời gian)
+    codes = pd.factorize(pd.MultiIndex.from_arrays(keys))[0]
+    ohlc = {c: pd.to_numeric(bars[c], errors="coerce").to_numpy(dtype="float64")[order] for c in ["high", "low", "close"]}
+    idx = np.flatnonzero(signal[order])  # vị trí tín hiệu trên mảng đã sắp
+
+    sorted_bars = bars.iloc[order]
+    keep = [c for c in ["date", "session", "time", "symbol"] if c in bars.columns]
+    trades = sorted_bars.iloc[idx][keep].reset_index(drop=True)
+    entry = ohlc["close"][idx]
+    trades["entry"] = entry
+
+    n = len(codes)
+    for h in horizons:
+        j = idx + h
+        ok = (j < n)
+        exit_ = np.full(len(idx), np.nan)
+        exit_[ok] = np.where(codes[j[ok]] == codes[idx[ok]], ohlc["close"][j[ok]], np.nan)
+        trades[f"fwd_ret_{h}"] = exit_ / entry - 1
+
+    if window > 0:
+        # cửa sổ [t+1, t+window]: đệm NaN ở cuối, che các nến khác nhóm
+        def pad(x, v):
+            return np.concatenate([x[1:], np.full(window, v)])
+
+        hi = sliding_window_view(pad(ohlc["high"], np.nan), window)[idx]
+        lo = sliding_window_view(pad(ohlc["low"], np.nan), window)[idx]
+        same = sliding_window_view(pad(codes, -1), window)[idx] == codes[idx, None]
+        hi = np.where(same & np.isfinite(hi), hi, -np.inf).max(axis=1)
+        lo = np.where(same & np.isfinite(lo), lo, np.inf).min(axis=1)
+        trades["bars_ahead"] = same.sum(axis=1)
+        trades["mfe"] = np.where(np.isfinite(hi), hi / entry - 1, np.nan)
+        trades["mae"] = np.where(np.isfinite(lo), lo / entry - 1, np.nan)
+
+    return trades
+
+
+def summarize(trades: pd.DataFrame, by: str | list[str] | None = None) -> pd.DataFrame:
+    """
+    Thống kê theo từng horizon: số lệnh, lợi nhuận TB/trung vị, tỉ lệ thắng (lợi nhuận > 0), MAE/MFE TB.
+    by: "session", "symbol", ... để tách nhóm; None -> 1 dòng tổng.
+    """
+    ret_cols = [c for c in trades.columns if c.startswith("fwd_ret_")]
+    x = trades.assign(**{f"win_{c[8:]}": (trades[c] > 0).where(trades[c].notna()) for c in ret_cols})
+
+    agg = {"signals": ("entry", "size")}
+    for c in ret_cols:
+        h = c[8:]
+        agg[f"n_{h}"] = (c, "count")
+        agg[f"mean_ret_{h}"] = (c, "mean")
+        agg[f"median_ret_{h}"] = (c, "median")
+        agg[f"hit_rate_{h}"] = (f"win_{h}", "mean")
+    if "mae" in x.columns:
+        agg["mean_mae"] = ("mae", "mean")
+        agg["mean_mfe"] = ("mfe", "mean")
+
+    if by is None:
+        return x.assign(_all="all").groupby("_all").agg(**agg).reset_index(drop=True)
+    return x.groupby(by, observed=True).agg(**agg).reset_index()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest tín hiệu nến rút chân trên bảng nến OHLC")
+    parser.add_argument("--bars", default=os.path.join(FOLDER, "ohlc.csv"), help="ohlc.csv hoặc file daily của vn30.py")
+    parser.add_argument("--horizons", default=",".join(map(str, HORIZONS)))
+    parser.add_argument("--window", type=int, default=MAE_MFE_BARS)
+    parser.add_argument("--within", default=None, help="vd. date hoặc date,session: không tính nến sang ngày/phiên khác")
+    parser.add_argument("--out", default=None, help="ghi danh sách lệnh ra CSV")
+    args = parser.parse_args()
+
+    bars = pd.read_csv(args.bars)
+    trades = signal_trades(bars, horizons=[int(h) for h in args.horizons.split(",")], window=args.window,
+                           within=args.within.split(",") if args.within else WITHIN)
+    print(f"{len(bars)} nến, {len(trades)} tín hiệu")
+    print(summarize(trades).T.to_string(header=False))
+    for by in ["session", "symbol"]:
+        if by in trades.columns:
+            print(f"\n--- Theo {by} ---")
+            print(summarize(trades, by).to_string(index=False))
+
+    if args.out:
+        trades.to_csv(args.out, index=False, encoding="utf-8-sig")
+        print(f"Đã ghi {args.out}")
@@ -0,0 +1,191 @@
+import pandas as pd
+
+from ohlc import SESSIONS, TIMEFRAME, ohlc_all_sessions
+
+BAR_COLUMNS = ["date", "session", "time", "symbol", "open", "high", "low", "close"]
+
+
+class BarEngine:
+    """
+    Gộp nến OHLC theo luồng: giữ nến đang chạy (tạm tính) của từng mã và
+    cộng dồn từng snapshot mới vào, thay vì dựng lại cả phiên từ toàn bộ tick.
+
+    Giả định tick đến theo thứ tự thời gian (ingestor đọc file theo tên timestamp);
+    tick cũ hơn nến đang chạy của mã đó, hoặc thuộc nến đã đóng, sẽ bị bỏ qua và đếm vào `late_ticks`.
+    Nến đã đóng được giữ theo từng phiên, nên ghi file 1 phiên chỉ đụng tới nến của phiên đó.
+    """
+
+    def __init__(self, timeframe: str = TIMEFRAME, sessions: list[tuple[str, str]] = SESSIONS):
+        self.timeframe = timeframe
+        self.sessions = sessions
+        self.current = pd.DataFrame(columns=BAR_COLUMNS)  # nến tạm tính, mỗi mã 1 dòng
+        self._completed = {}    # phiên -> nến đã đóng, sắp theo (time, symbol)
+        self.closed_time = {}       # mã -> mốc nến đã đóng gần nhất
+        self.touched = set()        # ngày (YYYYMMDD) có nến vừa đóng, chưa được lưu (xem LivePipeline.save_checkpoint)
+        self.late_ticks = 0
+
+    def _fold(self, new_bars: pd.DataFrame) -> pd.DataFrame:
+        """
+        Gộp nến mới vào nến đang chạy; trả về các nến vừa đóng.
+        """
+        if new_bars.empty:
+            return pd.DataFrame(columns=BAR_COLUMNS)
+
+        # bỏ nến thuộc nến đã đóng của cùng mã (không mở lại nến đã đóng -> không có 2 dòng cùng khoá)
+        if self.closed_time:
+            closed = new_bars["symbol"].map(self.closed_time)
+            late = closed.notna() & (new_bars["time"] <= pd.to_datetime(closed))
+            if late.any():
+                self.late_ticks += int(late.sum())
+                new_bars = new_bars.loc[~late]
+
+        if not self.current.empty:
+            # bỏ nến cũ hơn nến đang chạy của cùng mã
+            cur_time = self.current.set_index("symbol")["time"]
+            prev = new_bars["symbol"].map(cur_time)
+            late = prev.notna() & (new_bars["time"] < prev)
+            if late.any():
+                self.late_ticks += int(late.sum())
+                new_bars = new_bars.loc[~late]
+            combined = pd.concat([self.current, new_bars], ignore_index=True)
+        else:
+            combined = new_bars
+        if combined.empty:
+            return pd.DataFrame(columns=BAR_COLUMNS)
+
+        # cùng (mã, phiên, mốc nến): open lấy của nến cũ, close lấy của nến mới
+        bars = (combined.groupby(["symbol", "session", "time"], sort=False)
+                .agg(date=("date", "first"), open=("open", "first"), high=("high", "max"),
+                     low=("low", "min"), close=("close", "last"))
+                .reset_index()
+                .sort_values(["time", "session"], kind="stable"))
+
+        # nến mới nhất của mỗi mã là nến đang chạy, còn lại đã đóng
+        is_current = ~bars.duplicated("symbol", keep="last")
+        self.current = bars.loc[is_current, BAR_COLUMNS].reset_index(drop=True)
+        done = bars.loc[~is_current, BAR_COLUMNS].reset_index(drop=True)
+        self._add_completed(done)
+        return done
+
+    def _add_completed(self, done: pd.DataFrame):
+        if done.empty:
+            return
+        for session, part in done.groupby("session", sort=False):
+            self._completed[session] = _merge_sorted(self._completed.get(session), part)
+        last = done.groupby("symbol", sort=False)["time"].max()
+        self.closed_time.update(last.to_dict())
+        self.touched.update(done["date"].unique())
+
+    def latest_date(self) -> str | None:
+        """
+        Ngày (YYYYMMDD) mới nhất có nến, đã đóng hoặc đang chạy.
+        """
+        dates = [x["date"].iloc[-1] for x in self._completed.values() if not x.empty]
+        if not self.current.empty:
+            dates.append(self.current["date"].max())
+        return max(dates) if dates else None
+
+    def state(self, since: str | None = None) -> dict:
+        """
+        Trạng thái để checkpoint (xem load_state()). since: chỉ lấy nến đã đóng từ ngày này trở đi
+        (các ngày trước lưu riêng 1 lần); closed_time vẫn đủ để bỏ tick trễ của mọi ngày.
+        """
+        return {"current": self.current, "completed": self.completed(since), "closed_time": dict(self.closed_time),
+                "late_ticks": self.late_ticks}
+
+    def load_state(self, state: dict, history: pd.DataFrame | None = None):
+        """
+        history: nến đã đóng của các ngày trước `since` (nếu state() được lưu với since).
+        """
+        self.current = state["current"]
+        self._completed = {}
+        self.closed_time = {}
+        for done in (history, state["completed"]):
+            if done is not None:
+                self._add_completed(done)
+        self.closed_time.update(state.get("closed_time", {}))
+        self.touched = set()
+        self.late_ticks = state["late_ticks"]
+
+    def seed(self, bars: pd.DataFrame):
+        """
+        Khởi tạo từ bảng nến đã dựng sẵn (vd. kết quả export_sessions()).
+        """
+        self._fold(bars[BAR_COLUMNS])
+
+    def update(self, ticks: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Cộng dồn 1 lô tick (1 hoặc vài snapshot). Trả về (nến vừa đóng, nến tạm tính hiện tại).
+        """
+        if ticks.empty:
+            return pd.DataFrame(columns=BAR_COLUMNS), self.current
+        new_bars = ohlc_all_sessions(ticks, self.timeframe, self.sessions)
+        done = self._fold(new_bars)
+        return done, self.current
+
+    def close_until(self, now) -> pd.DataFrame:
+        """
+        Đóng các nến tạm tính đã hết giờ (hết timeframe hoặc hết phiên) tính đến `now`.
+        """
+        if self.current.empty:
+            return pd.DataFrame(columns=BAR_COLUMNS)
+
+        cur = self.current
+        bar_end = cur["time"] + pd.Timedelta(self.timeframe)
+        sess_end = (cur["time"].dt.normalize()
+                    + pd.to_timedelta(cur["session"].str[5:7].astype(int), unit="h")
+                    + pd.to_timedelta(cur["session"].str[7:9].astype(int), unit="min"))
+        expired = bar_end.where(bar_end < sess_end, sess_end) <= pd.Timestamp(now)
+
+        done = cur.loc[expired].reset_index(drop=True)
+        self.current = cur.loc[~expired].reset_index(drop=True)
+        self._add_completed(done)
+        return done
+
+    def completed(self, since: str | None = None, until: str | None = None) -> pd.DataFrame:
+        """
+        Nến đã đóng, lọc theo ngày (YYYYMMDD) nếu có: since <= date <= until.
+        """
+        parts = []
+        for x in self._completed.values():
+            # mỗi phiên sắp theo time -> cắt khoảng ngày bằng searchsorted
+            lo = 0 if since is None else x["time"].searchsorted(pd.Timestamp(since), side="left")
+            hi = len(x) if until is None else x["time"].searchsorted(pd.Timestamp(until) + pd.Timedelta(days=1), side="left")
+            if hi > lo:
+                parts.append(x.iloc[lo:hi])
+        if not parts:
+            return pd.DataFrame(columns=BAR_COLUMNS)
+        return pd.concat(parts, ignore_index=True)
+
+    def bars(self, session: str | None = None) -> pd.DataFrame:
+        """
+        Nến đã đóng + nến tạm tính (lọc theo phiên nếu có), sắp như ohlc_for_session().
+        """
+        if session is None:
+            parts = [x for x in (self.completed(), self.current) if not x.empty]
+            if not parts:
+                return pd.DataFrame(columns=BAR_COLUMNS)
+            return pd.concat(parts, ignore_index=True).sort_values(["date", "session", "time", "symbol"])
+
+        done = self._completed.get(session)
+        cur = self.current.loc[self.current["session"] == session]
+        if done is None and cur.empty:
+            return pd.DataFrame(columns=BAR_COLUMNS)
+        return _merge_sorted(done, cur)
+
+
+def _merge_sorted(done: pd.DataFrame | None, new: pd.DataFrame) -> pd.DataFrame:
+    """
+    Ghép `new` vào `done` (nến 1 phiên, đã sắp theo time, symbol = thứ tự date, session, time, symbol):
+    chỉ sắp lại phần đuôi từ mốc sớm nhất của `new`, phần đầu giữ nguyên.
+    """
+    if done is None or done.empty:
+        return new.sort_values(["time", "symbol"], ignore_index=True)
+    if new.empty:
+        return done
+    cut = done["time"].searchsorted(new["time"].min(), side="left")
+    tail = pd.concat([x for x in (done.iloc[cut:], new) if not x.empty], ignore_index=True)
+    tail = tail.sort_values(["time", "symbol"])
+    if cut == 0:
+        return tail.reset_index(drop=True)
+    return pd.concat([done.iloc[:cut], tail], ignore_index=True)
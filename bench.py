@@ -0,0 +1,297 @@
+import os
+import io
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import contextlib
+import subprocess
+import tracemalloc
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from ohlc import (
+    COL_SYMBOL_IDX,
+    COL_K_IDX,
+    CHANGE_ONLY,
+    SESSIONS,
+    TIMEFRAME,
+    build_ticks_from_folder,
+    export_sessions,
+    ohlc_for_session,
+    read_symbol_price_from_file,
+)
+from detect import add_lower_wick_signal, lower_wick_signal
+
+# ======================
+# CONFIG
+# ======================
+# Kích thước gần giống file export iBoard thật (toàn sàn ~1.600 mã, ~30 cột)
+N_SYMBOLS = 1600
+N_COLUMNS = 30
+N_FILES = 50
+N_DAYS = 1
+REPEAT = 3
+
+
+# ======================
+# Snapshot giả lập
+# ======================
+def write_snapshot(path: str, symbols: list[str], prices: np.ndarray, rng: np.random.Generator, n_columns: int = N_COLUMNS):
+    """
+    Ghi 1 file giống iBoard export: 2 dòng header (dòng 2 có "CK"), mã ở cột A, giá khớp ở cột K.
+    Mã chưa khớp lệnh để trống giá.
+    """
+    n = len(symbols)
+    cols = []
+    for j in range(n_columns):
+        if j == COL_SYMBOL_IDX:
+            cols.append(np.asarray(symbols, dtype=object))
+        elif j == COL_K_IDX:
+            p = np.char.mod("%.2f", prices).astype(object)
+            p[rng.random(n) < 0.1] = ""
+            cols.append(p)
+        else:
+            cols.append(rng.integers(1, 10_000_000, n).astype(str).astype(object))
+
+    header1 = ["CK"] + [f"Cot{j}" for j in range(1, n_columns)]
+    header2 = ["CK"] + ["Giá" if j == COL_K_IDX else "KL" for j in range(1, n_columns)]
+    body = np.column_stack(cols)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write(",".join(header1) + "\n")
+        f.write(",".join(header2) + "\n")
+        f.write("\n".join(",".join(r) for r in body))
+        f.write("\n")
+
+
+def make_snapshot_folder(
+    folder: str,
+    n_symbols: int = N_SYMBOLS,
+    n_snapshots: int = N_FILES,
+    n_days: int = 1,
+    interval_s: int = 10,
+    start: str = "0900",
+    seed: int = 0,
+) -> list[str]:
+    """
+    Sinh n_days x n_snapshots file YYYYMMDD_HHMMSS_priceboard.csv; giá đi ngẫu nhiên, ~40% mã đổi giá mỗi nhịp.
+    """
+    os.makedirs(folder, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    symbols = [f"S{i:04d}" for i in range(n_symbols)]
+    base = rng.uniform(5, 150, n_symbols)
+
+    paths = []
+    day0 = datetime(2026, 2, 16)
+    for d in range(n_days):
+        ts = day0 + timedelta(days=d, hours=int(start[:2]), minutes=int(start[2:]))
+        prices = base.copy()
+        for _ in range(n_snapshots):
+            moved = rng.random(n_symbols) < 0.4
+            prices = np.where(moved, np.round(prices * (1 + rng.normal(0, 0.003, n_symbols)), 2), prices)
+            path = os.path.join(folder, f"{ts.strftime('%Y%m%d_%H%M%S')}_priceboard.csv")
+            write_snapshot(path, symbols, prices, rng)
+            paths.append(path)
+            ts += timedelta(seconds=interval_s)
+    return paths
+
+
+# ======================
+# Mốc so sánh
+# ======================
+def read_symbol_price_legacy(path: str) -> pd.DataFrame:
+    """
+    Bản đọc cũ (parse toàn bộ cột rồi mới lọc), giữ lại để so sánh.
+    """
+    df = pd.read_csv(path)
+
+    if df.shape[1] <= COL_K_IDX:
+        return pd.DataFrame(columns=["symbol", "price"])
+
+    x = df.iloc[:, [COL_SYMBOL_IDX, COL_K_IDX]].copy()
+    x.columns = ["symbol", "price"]
+
+    x["symbol"] = x["symbol"].astype(str).str.strip()
+    x = x[(x["symbol"] != "") & (x["symbol"].str.upper() != "CK")]
+
+    x["price"] = pd.to_numeric(x["price"], errors="coerce")
+    x = x.dropna(subset=["price"])
+
+    return x
+
+
+# ======================
+# Đo
+# ======================
+def measure(fn, *args, repeat: int = REPEAT) -> dict:
+    """
+    Chạy fn(*args) `repeat` lần: lấy thời gian tốt nhất và peak bộ nhớ Python (tracemalloc, không tính buffer của Arrow) của lần đầu.
+    """
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    result = fn(*args)
+    first = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = first
+    for _ in range(repeat - 1):
+        t0 = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - t0)
+
+    return {"seconds": best, "peak_bytes": peak, "result": result}
+
+
+def bench_reader(paths: list[str], repeat: int = REPEAT) -> list[dict]:
+    """
+    So sánh read_symbol_price_legacy và read_symbol_price_from_file trên cùng các file.
+    """
+    def read_all(reader):
+        return [reader(p) for p in paths]
+
+    rows = []
+    for name, reader in [("legacy", read_symbol_price_legacy), ("read_symbol_price_from_file", read_symbol_price_from_file)]:
+        m = measure(read_all, reader, repeat=repeat)
+        frames = m.pop("result")
+        one = measure(reader, paths[0], repeat=1)
+        n_rows = sum(len(f) for f in frames)
+        rows.append({
+            "stage": "read_symbol_price",
+            "impl": name,
+            "files": len(paths),
+            "rows": n_rows,
+            "seconds": m["seconds"],
+            "ms_per_file": m["seconds"] / len(paths) * 1000,
+            "rows_per_sec": n_rows / m["seconds"] if m["seconds"] else None,
+            "peak_bytes_per_file": one["peak_bytes"],
+            "result_bytes": int(sum(f.memory_usage(deep=True).sum() for f in frames)),
+        })
+    return rows
+
+
+def _stage(stage: str, m: dict, rows: int, items: int | None = None, ticks: int | None = None) -> dict:
+    # rows: số dòng đầu vào thô (dòng snapshot đã parse / số nến), so được với bản legacy;
+    # ticks: số tick còn lại sau ChangeFilter mà khâu này thực sự xử lý
+    return {
+        "stage": stage,
+        "impl": "current",
+        "files": items,
+        "rows": rows,
+        "ticks": ticks,
+        "seconds": m["seconds"],
+        "rows_per_sec": rows / m["seconds"] if m["seconds"] else None,
+        "ticks_per_sec": ticks / m["seconds"] if ticks is not None and m["seconds"] else None,
+        "peak_bytes": m["peak_bytes"],
+    }
+
+
+def bench_pipeline(folder: str, paths: list[str], timeframe: str = TIMEFRAME, repeat: int = REPEAT) -> list[dict]:
+    """
+    Đo từng khâu của chuỗi ingest -> OHLC -> detect trên cùng 1 folder snapshot:
+    build_ticks_from_folder, ohlc_for_session (mọi phiên), export_sessions, add_lower_wick_signal
+    (đọc/ghi CSV) và lower_wick_signal (trong bộ nhớ).
+    Thông lượng rows_per_sec tính trên số dòng snapshot thô (trước ChangeFilter) để so với bản legacy;
+    ticks_per_sec tính trên số tick sau lọc.
+    """
+    rows = []
+    quiet = contextlib.redirect_stdout(io.StringIO())
+    raw = sum(len(read_symbol_price_from_file(p)) for p in paths)
+
+    m = measure(build_ticks_from_folder, folder, CHANGE_ONLY, timeframe, repeat=repeat)
+    ticks = m.pop("result")
+    rows.append(_stage("build_ticks_from_folder", m, raw, len(paths), len(ticks)))
+
+    def all_sessions_loop():
+        return [ohlc_for_session(ticks, s, e, timeframe) for s, e in SESSIONS]
+    m = measure(all_sessions_loop, repeat=repeat)
+    m.pop("result")
+    rows.append(_stage("ohlc_for_session", m, raw, ticks=len(ticks)))
+
+    out_dir = os.path.join(folder, "_bench_out")
+    os.makedirs(out_dir, exist_ok=True)
+    with quiet:
+        m = measure(export_sessions, out_dir, timeframe, ticks.copy(), repeat=repeat)
+    bars = m.pop("result")
+    rows.append(_stage("export_sessions", m, raw, ticks=len(ticks)))
+
+    detect_path = os.path.join(out_dir, "detect.csv")
+    bars.to_csv(detect_path, index=False)
+    with quiet:
+        m = measure(add_lower_wick_signal, detect_path, repeat=repeat)
+    m.pop("result")
+    rows.append(_stage("add_lower_wick_signal", m, len(bars)))
+
+    m = measure(lower_wick_signal, bars, repeat=repeat)
+    m.pop("result")
+    rows.append(_stage("lower_wick_signal", m, len(bars)))
+    return rows
+
+
+def environment() -> dict:
+    """
+    Thông tin máy/phiên bản đi kèm kết quả để so sánh giữa các lần chạy.
+    """
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        rev = None
+    try:
+        import pyarrow
+        pa_version = pyarrow.__version__
+    except ImportError:
+        pa_version = None
+    return {
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "git": rev,
+        "python": sys.version.split()[0],
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "pyarrow": pa_version,
+        "machine": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark chuỗi ingest -> OHLC -> detect trên snapshot iBoard giả lập")
+    parser.add_argument("--symbols", type=int, default=N_SYMBOLS)
+    parser.add_argument("--files", type=int, default=N_FILES, help="số snapshot mỗi ngày")
+    parser.add_argument("--days", type=int, default=N_DAYS)
+    parser.add_argument("--timeframe", default=TIMEFRAME)
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--reader-only", action="store_true", help="chỉ so sánh 2 bản đọc file")
+    parser.add_argument("--out", default=None, help="ghi kết quả ra file JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = make_snapshot_folder(tmp, n_symbols=args.symbols, n_snapshots=args.files,
+                                     n_days=args.days, seed=args.seed)
+        results = bench_reader(paths, repeat=args.repeat)
+        if not args.reader_only:
+            results += bench_pipeline(tmp, paths, args.timeframe, repeat=args.repeat)
+
+    for r in results:
+        if r["stage"] == "read_symbol_price":
+            print(f"{r['impl']:>28}: {r['ms_per_file']:.2f} ms/file | peak/file {r['peak_bytes_per_file'] / 1e6:.2f} MB "
+                  f"| kết quả {r['result_bytes'] / 1e6:.2f} MB")
+        else:
+            tick_rate = f" ({r['ticks_per_sec']:,.0f} tick/s sau lọc)" if r["ticks_per_sec"] else ""
+            print(f"{r['stage']:>28}: {r['seconds'] * 1000:.1f} ms | {r['rows_per_sec'] or 0:,.0f} dòng/s{tick_rate} "
+                  f"| peak {r['peak_bytes'] / 1e6:.2f} MB")
+
+    if args.out:
+        report = {
+            "params": {"symbols": args.symbols, "files": args.files, "days": args.days,
+                       "timeframe": args.timeframe, "repeat": args.repeat, "seed": args.seed},
+            "env": environment(),
+            "results": results,
+        }
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,473 @@
+import os
+import re
+import time
+import queue
+import argparse
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from ohlc import FOLDER, concat_ticks, make_ticks, parse_ts_from_filename, read_symbol_price_from_file
+from capture import read_priceboard_from_driver, parse_priceboard_html, write_archive
+from downloads import make_unique_path, wait_until_stable
+
+# ======================
+# CONFIG
+# ======================
+# Tên bảng -> trang iBoard. Mỗi bảng 1 Chrome riêng, chạy song song cùng nhịp.
+# (kiểm tra lại đường dẫn từng bảng trên iBoard trước khi chạy)
+BOARDS = {
+    "hose": "https://iboard.ssi.com.vn/bang-gia/hose",
+    "hnx": "https://iboard.ssi.com.vn/bang-gia/hnx",
+    "upcom": "https://iboard.ssi.com.vn/bang-gia/upcom",
+    "vn30": "https://iboard.ssi.com.vn/bang-gia/vn30",
+    "deriv": "https://iboard.ssi.com.vn/bang-gia/chung-khoan-phai-sinh",
+}
+
+# "export": mỗi bảng click export, Chrome tải CSV về <FOLDER>/<DOWNLOAD_SUBDIR>/<bảng>/,
+#           renamer của bảng đó đổi tên + chuyển sang FOLDER
+# "dom":    đọc bảng giá thẳng từ trang, không tải file
+CAPTURE_MODE = "export"
+INTERVAL_SECONDS = 10       # các bảng chụp cùng nhịp, căn theo đồng hồ (10s -> :00, :10, :20...)
+ARCHIVE_EVERY = 6           # chế độ dom: cứ N nhịp lưu 1 file CSV archive mỗi bảng (0 = không lưu)
+BATCH_WAIT_SECONDS = 1.0    # gom snapshot các bảng tới trong khoảng này vào 1 chu kỳ pipeline
+
+DOWNLOAD_SUBDIR = "_boards"  # folder con không bị ingestor quét (chỉ đọc file ở FOLDER)
+COOLDOWN_SECONDS = 5
+RENAME_WORKERS = 4
+
+# tên bảng nằm giữa timestamp và tên gốc: 20260220_143501_hose_priceboard.csv
+BOARD_NAME = re.compile(r"^[A-Za-z0-9-]+$")
+# file đã rename có prefix timestamp -> không rename lại (ngăn rename loop khi tải về thẳng FOLDER)
+RENAMED_PATTERN = re.compile(r"^\d{8}_\d{6}_")
+
+
+# ======================
+# Helpers
+# ======================
+_NO_TIME = np.iinfo("int64").min
+
+
+class TickMerger:
+    """
+    Gộp tick của nhiều bảng giá vào 1 luồng: mỗi mã chỉ nhận tick mới hơn tick cuối đã nhận.
+    Bỏ tick trùng (time, symbol) khi 1 mã có mặt trên nhiều bảng (vd. VN30 nằm trong HOSE),
+    và tick cũ của bảng tới muộn, để BarEngine / ChangeFilter luôn thấy tick theo thứ tự thời gian.
+    """
+
+    def __init__(self):
+        self.last_time = {}  # mã -> time (ns) của tick cuối đã nhận
+        self.dropped = 0
+
+    def apply(self, ticks: pd.DataFrame) -> pd.DataFrame:
+        if ticks.empty:
+            return ticks
+
+        codes, uniq = pd.factorize(ticks["symbol"].astype(str))
+        times = ticks["time"].to_numpy(dtype="datetime64[ns]").astype("int64")
+        prev = np.array([self.last_time.get(s, _NO_TIME) for s in uniq], dtype="int64")[codes]
+        keep = (times > prev) & ~pd.DataFrame({"s": codes, "t": times}).duplicated().to_numpy()
+
+        if keep.any():
+            last = pd.Series(times[keep]).groupby(codes[keep]).max()
+            self.last_time.update(zip(uniq[last.index], last.tolist()))
+        self.dropped += int((~keep).sum())
+        return ticks.loc[keep].reset_index(drop=True)
+
+
+class BoardRenamer:
+    """
+    Đổi tên file CSV tải về của 1 bảng giá: chờ tải xong -> chuyển sang dest_dir với tên
+    <timestamp>_<bảng>_<tên gốc>.csv -> publish(bảng, path mới).
+    board=None: tên <timestamp>_<tên gốc>.csv (main.py: 1 trình duyệt, tải thẳng vào FOLDER).
+
+    Mỗi bảng 1 instance với folder tải, cooldown và danh sách file đang chờ riêng,
+    nên các bảng không đè hay chặn file của nhau.
+    """
+
+    def __init__(self, board: str | None, download_dir: str, dest_dir: str, publish, executor: ThreadPoolExecutor,
+                 cooldown: float = COOLDOWN_SECONDS):
+        self.board = board
+        self.download_dir = download_dir
+        self.dest_dir = dest_dir
+        self.publish = publish
+        self.executor = executor
+        self.cooldown = cooldown
+        self.recently_handled = {}  # path -> last_time
+        self.pending = {}  # path -> threading.Event (set khi biết chắc file đã tải xong)
+        self.lock = threading.Lock()
+        self.renamed = 0
+
+    def should_ignore(self, file_path: str) -> bool:
+        now = time.time()
+        last = self.recently_handled.get(file_path)
+        if last and (now - last) < self.cooldown:
+            return True
+
+        for k in list(self.recently_handled.keys()):
+            if now - self.recently_handled[k] > 30:
+                self.recently_handled.pop(k, None)
+        return False
+
+    def handle(self, file_path: str, completed: bool = False):
+        """
+        Đưa file CSV mới trong download_dir vào thread pool để rename khi tải xong.
+        completed=True: đã biết file hoàn tất (sự kiện .crdownload -> .csv), rename ngay.
+        """
+        filename = os.path.basename(file_path)
+        if not filename.lower().endswith(".csv") or RENAMED_PATTERN.match(filename):
+            return
+
+        with self.lock:
+            done = self.pending.get(file_path)
+            if done is not None:
+                if completed:
+                    done.set()
+                return
+            if self.should_ignore(file_path):
+                return
+
+            self.recently_handled[file_path] = time.time()
+            done = threading.Event()
+            if completed:
+                done.set()
+            self.pending[file_path] = done
+
+        self.executor.submit(self._rename_when_complete, file_path, done)
+
+    def _rename_when_complete(self, file_path: str, done: threading.Event):
+        filename = os.path.basename(file_path)
+        label = self.board or "Rename"
+        try:
+            if not wait_until_stable(file_path, timeout=120, done_event=done):
+                print(f"[{label}] Timeout/chưa ổn định: {filename}")
+                return
+
+            tag = f"{self.board}_" if self.board else ""
+            new_filename = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{tag}{filename}"
+            try:
+                with self.lock:
+                    new_path = make_unique_path(self.dest_dir, new_filename)
+                    os.replace(file_path, new_path)
+                    # đánh dấu cả path mới để sự kiện tiếp theo của nó bị bỏ qua
+                    self.recently_handled[new_path] = time.time()
+                    self.renamed += 1
+                print(f"[{label}] Rename OK: {filename} -> {os.path.basename(new_path)}")
+                self.publish(self.board, new_path)
+            except Exception as e:
+                print(f"[{label}] Lỗi rename {filename}: {e}")
+        finally:
+            with self.lock:
+                self.pending.pop(file_path, None)
+
+
+def start_rename_observer(renamers: list[BoardRenamer]):
+    # import ở đây để chế độ dom / fixture HTML không cần watchdog
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+
+    class Handler(FileSystemEventHandler):
+        def __init__(self, renamer):
+            self.renamer = renamer
+
+        def on_created(self, event):
+            if not event.is_directory:
+                self.renamer.handle(event.src_path)
+
+        def on_moved(self, event):
+            if event.is_directory:
+                return
+            # Chrome đổi tên .crdownload -> .csv khi tải xong
+            completed = event.src_path.lower().endswith(".crdownload")
+            self.renamer.handle(event.dest_path, completed=completed)
+
+    observer = Observer()
+    for r in renamers:
+        observer.schedule(Handler(r), r.download_dir, recursive=False)
+    observer.start()
+    return observer
+
+
+# ======================
+# Coordinator
+# ======================
+class CaptureCoordinator:
+    """
+    Chạy nhiều bảng giá song song (mỗi bảng 1 thread + 1 driver), gộp snapshot vào 1 pipeline.
+
+    - mỗi bảng có stream riêng: folder tải, renamer (cooldown riêng), tên file gắn tag bảng
+      (<timestamp>_<bảng>_...csv) nên không trùng tên trong FOLDER dùng chung;
+    - 1 thread tiêu thụ gom snapshot của các bảng trong cùng nhịp, lọc trùng qua TickMerger
+      rồi gọi pipeline.on_ticks() 1 lần;
+    - pipeline=None: chỉ ghi file vào FOLDER cho process khác (merged_ohlc_detect.py) đọc.
+
+        coord = CaptureCoordinator(FOLDER, pipeline)
+        coord.add_board("hose", step)     # step(ts) chụp 1 nhịp của bảng
+        coord.start(); ...; coord.stop()
+    """
+
+    def __init__(self, folder: str = FOLDER, pipeline=None, interval: float = INTERVAL_SECONDS,
+                 archive_every: int = ARCHIVE_EVERY, batch_wait: float = BATCH_WAIT_SECONDS):
+        self.folder = folder
+        self.pipeline = pipeline
+        self.interval = interval
+        self.archive_every = archive_every
+        self.batch_wait = batch_wait
+        self.merger = TickMerger()
+        self.renamers = {}  # bảng -> BoardRenamer
+        self.stats = {}     # bảng -> bộ đếm
+        self._steps = {}    # bảng -> step(ts)
+        self._queue = queue.Queue()
+        self._stop = threading.Event()
+        self._threads = []
+        self._consumer = None
+        self._observer = None
+        self._executor = ThreadPoolExecutor(max_workers=RENAME_WORKERS, thread_name_prefix="rename")
+
+    def download_dir(self, board: str) -> str:
+        return os.path.join(self.folder, DOWNLOAD_SUBDIR, board)
+
+    def add_board(self, board: str, step=None, watch: bool = True) -> BoardRenamer | None:
+        """
+        Đăng ký 1 bảng. step(ts): hàm chụp 1 nhịp (click export / đọc DOM...), None = không tự chụp.
+        watch=True: theo dõi folder tải của bảng, rename file CSV tải về (kể cả file người dùng tự export).
+        """
+        if not BOARD_NAME.match(board):
+            raise ValueError(f"Tên bảng chỉ gồm chữ, số, '-': {board!r}")
+        if board in self.stats:
+            raise ValueError(f"Bảng {board!r} đã đăng ký")
+        self.stats[board] = {"snapshots": 0, "ticks": 0, "errors": 0, "last": None}
+        if step is not None:
+            self._steps[board] = step
+        if not watch:
+            return None
+        os.makedirs(self.download_dir(board), exist_ok=True)
+        # Chrome tải lại đúng tên cũ mỗi nhịp -> cooldown phải ngắn hơn nhịp chụp
+        self.renamers[board] = BoardRenamer(board, self.download_dir(board), self.folder, self.publish_file, self._executor,
+                                            cooldown=min(COOLDOWN_SECONDS, self.interval / 2))
+        return self.renamers[board]
+
+    def add_driver_board(self, board: str, driver, mode: str = CAPTURE_MODE):
+        """
+        Bảng chạy trên 1 Selenium driver đã mở sẵn trang bảng giá.
+        """
+        if mode == "dom":
+            return self.add_board(board, lambda ts: self.publish_ticks(board, ts, read_priceboard_from_driver(driver, ts)),
+                                  watch=False)
+        return self.add_board(board, lambda ts: click_export(driver))
+
+    def add_fixture_board(self, board: str, html_path: str):
+        """
+        Bảng đọc từ file HTML lưu sẵn (chạy offline, không cần trình duyệt). File được đọc lại mỗi nhịp.
+        """
+        def step(ts):
+            with open(html_path, "r", encoding="utf-8") as f:
+                self.publish_ticks(board, ts, parse_priceboard_html(f.read(), ts))
+        self.add_board(board, step, watch=False)
+
+    # ---------- nguồn snapshot ----------
+    def publish_file(self, board: str, path: str):
+        """
+        File đã rename vào FOLDER. Có pipeline -> đọc luôn trên thread rename rồi đưa vào hàng đợi.
+        """
+        ts = parse_ts_from_filename(path)
+        if self.pipeline is None:
+            self._count(board, ts, None)
+            return
+        try:
+            ticks = make_ticks(read_symbol_price_from_file(path), ts)
+        except Exception as e:
+            self.stats[board]["errors"] += 1
+            print(f"[{board}] Lỗi đọc {os.path.basename(path)}: {e}")
+            return
+        self._count(board, ts, ticks)
+        self._queue.put((board, ts, ticks, path))
+
+    def publish_ticks(self, board: str, ts: datetime, ticks: pd.DataFrame):
+        """
+        Tick đọc thẳng từ trang. Cứ archive_every nhịp (hoặc luôn, nếu không có pipeline) lưu 1 file archive.
+        """
+        self._count(board, ts, ticks)
+        n = self.stats[board]["snapshots"]
+        path = None
+        if not ticks.empty and (self.pipeline is None or (self.archive_every and n % self.archive_every == 0)):
+            path = write_archive(ticks, self.folder, ts, tag=board)
+        if self.pipeline is not None:
+            self._queue.put((board, ts, make_ticks(ticks, ts), path))
+
+    def _count(self, board: str, ts: datetime | None, ticks: pd.DataFrame | None):
+        st = self.stats[board]
+        st["snapshots"] += 1
+        st["ticks"] += 0 if ticks is None else len(ticks)
+        st["last"] = ts
+
+    # ---------- chạy ----------
+    def start(self):
+        if self.renamers:
+            self._observer = start_rename_observer(list(self.renamers.values()))
+        if self.pipeline is not None:
+            self._consumer = threading.Thread(target=self._consume, name="boards-pipeline", daemon=True)
+            self._consumer.start()
+        for board, step in self._steps.items():
+            t = threading.Thread(target=self._run_board, args=(board, step), name=f"board-{board}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        print(f"Đang chụp {len(self.stats)} bảng: {', '.join(self.stats)} (mỗi {self.interval:g}s)")
+
+    def _run_board(self, board: str, step):
+        while not self._stop.is_set():
+            # căn theo đồng hồ để các bảng chụp cùng lúc -> 1 chu kỳ pipeline mỗi nhịp
+            wait = self.interval - time.time() % self.interval
+            if self._stop.wait(wait):
+                return
+            try:
+                step(datetime.now().replace(microsecond=0))
+            except Exception as e:
+                self.stats[board]["errors"] += 1
+                print(f"[{board}] Lỗi khi chụp: {e}")
+
+    def _consume(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            stop = False
+            # gom snapshot các bảng khác của cùng nhịp
+            deadline = time.monotonic() + self.batch_wait
+            while True:
+                try:
+                    p = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if p is None:
+                    stop = True
+                    break
+                batch.append(p)
+
+            try:
+                self.process(batch)
+            except Exception as e:
+                print(f"[Pipeline] Lỗi: {e}")
+
+            if stop:
+                return
+
+    def process(self, batch: list[tuple[str, datetime, pd.DataFrame, str | None]]):
+        """
+        1 chu kỳ pipeline cho các snapshot [(bảng, ts, tick, file archive/None), ...] của nhiều bảng.
+        """
+        frames = []
+        sources = []
+        # theo thời gian để TickMerger giữ đúng thứ tự tick của từng mã
+        for board, ts, ticks, path in sorted(batch, key=lambda x: x[1]):
+            ticks = self.merger.apply(ticks)
+            frames.append(ticks)
+            if path is not None:
+                sources.append((path, ticks))
+        now = max(x[1] for x in batch)
+        return self.pipeline.on_ticks(concat_ticks(frames), now, sources=sources)
+
+    def stop(self, timeout: float = 30):
+        """
+        Dừng các bảng, chờ rename xong, xử lý nốt hàng đợi. Không đóng pipeline (người gọi tự close()).
+        """
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout)
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+        self._executor.shutdown(wait=True)
+        if self._consumer is not None:
+            self._queue.put(None)
+            self._consumer.join(timeout)
+
+    def summary(self) -> str:
+        parts = [f"{b}: {s['snapshots']} snapshot, {s['ticks']} tick, {s['errors']} lỗi"
+                 + (f", cuối {s['last']:%H:%M:%S}" if s["last"] else "")
+                 for b, s in self.stats.items()]
+        return " | ".join(parts) + f" | trùng/cũ đã bỏ: {self.merger.dropped} tick"
+
+
+# ======================
+# Selenium
+# ======================
+def open_board(url: str, download_dir: str):
+    """
+    Mở 1 Chrome riêng cho 1 bảng, tải file về download_dir của bảng đó.
+    """
+    from selenium import webdriver
+
+    options = webdriver.ChromeOptions()
+    prefs = {
+        "download.default_directory": os.path.abspath(download_dir),
+        "download.prompt_for_download": False,
+        "download.directory_upgrade": True,
+        "safebrowsing.enabled": True,
+    }
+    options.add_experimental_option("prefs", prefs)
+    driver = webdriver.Chrome(options=options)
+    driver.get(url)
+    return driver
+
+
+def click_export(driver, timeout: float = 20):
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+
+    button = WebDriverWait(driver, timeout).until(EC.element_to_be_clickable((By.ID, "btnExportPriceboard")))
+    button.click()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chụp nhiều bảng giá iBoard song song vào 1 pipeline")
+    parser.add_argument("--folder", default=FOLDER)
+    parser.add_argument("--boards", default=",".join(BOARDS), help="các bảng trong BOARDS, cách nhau dấu phẩy")
+    parser.add_argument("--mode", choices=["export", "dom"], default=CAPTURE_MODE)
+    parser.add_argument("--fixture", action="append", default=[], metavar="BẢNG=FILE.html",
+                        help="chạy offline: đọc bảng từ file HTML thay vì trình duyệt (lặp lại cho nhiều bảng)")
+    parser.add_argument("--interval", type=float, default=INTERVAL_SECONDS)
+    parser.add_argument("--rounds", type=int, default=0, help="dừng sau N nhịp (0 = chạy tới Ctrl+C)")
+    parser.add_argument("--no-pipeline", action="store_true", help="chỉ ghi file, để merged_ohlc_detect.py xử lý")
+    args = parser.parse_args()
+
+    pipeline = None
+    if not args.no_pipeline:
+        from merged_ohlc_detect import LivePipeline
+
+        pipeline = LivePipeline(args.folder)
+        pipeline.start()
+
+    coord = CaptureCoordinator(args.folder, pipeline, interval=args.interval)
+    drivers = []
+    try:
+        if args.fixture:
+            for spec in args.fixture:
+                board, html_path = spec.split("=", 1)
+                coord.add_fixture_board(board, html_path)
+        else:
+            for board in args.boards.split(","):
+                driver = open_board(BOARDS[board], coord.download_dir(board))
+                drivers.append(driver)
+                coord.add_driver_board(board, driver, args.mode)
+
+        coord.start()
+        n = 0
+        while not args.rounds or n < args.rounds:
+            time.sleep(args.interval)
+            n += 1
+            print(coord.summary())
+    except KeyboardInterrupt:
+        print("Dừng chương trình.")
+    finally:
+        coord.stop()
+        if pipeline is not None:
+            pipeline.close()
+        for driver in drivers:
+            driver.quit()
+        print(coord.summary())
@@ -0,0 +1,146 @@
+import os
+import sys
+from datetime import datetime
+from html.parser import HTMLParser
+
+import pandas as pd
+
+from ohlc import COL_SYMBOL_IDX, COL_K_IDX, make_ticks
+
+# ======================
+# CONFIG
+# ======================
+# Bảng giá trên trang: mỗi dòng 1 mã, thứ tự cột giống file export (A = mã, K = giá khớp)
+ROW_SELECTOR = "table tbody tr"
+CELL_SELECTOR = "td"
+
+# Lấy symbol + giá khớp của mọi dòng trong 1 lần gọi execute_script
+_JS_READ_PRICEBOARD = """
+const rows = document.querySelectorAll(arguments[0]);
+const symIdx = arguments[2], priceIdx = arguments[3];
+const out = [];
+for (const r of rows) {
+    const cells = r.querySelectorAll(arguments[1]);
+    if (cells.length > Math.max(symIdx, priceIdx)) {
+        out.push([cells[symIdx].textContent, cells[priceIdx].textContent]);
+    }
+}
+return out;
+"""
+
+
+# ======================
+# Helpers
+# ======================
+def rows_to_ticks(rows: list, ts: datetime | None = None) -> pd.DataFrame:
+    """
+    [[symbol, price_text], ...] -> DataFrame (symbol, price[, time]), làm sạch giống read_symbol_price_from_file().
+    """
+    x = pd.DataFrame(rows, columns=["symbol", "price"])
+    x["symbol"] = x["symbol"].astype(str).str.strip()
+    x = x[(x["symbol"] != "") & (x["symbol"].str.upper() != "CK")]
+
+    # giá hiển thị có thể có dấu phân cách nghìn
+    price = x["price"].astype(str).str.strip().str.replace(",", "", regex=False)
+    x["price"] = pd.to_numeric(price, errors="coerce")
+    x = x.dropna(subset=["price"])
+
+    if ts is not None:
+        # cùng định dạng tick gọn với ingest từ file
+        return make_ticks(x, ts)
+    return x.reset_index(drop=True)
+
+
+def read_priceboard_from_driver(driver, ts: datetime | None = None) -> pd.DataFrame:
+    """
+    Đọc bảng giá đang hiển thị qua Selenium driver (không cần click export / tải file).
+    """
+    rows = driver.execute_script(_JS_READ_PRICEBOARD, ROW_SELECTOR, CELL_SELECTOR, COL_SYMBOL_IDX, COL_K_IDX)
+    return rows_to_ticks(rows or [], ts)
+
+
+class _PriceboardHTMLParser(HTMLParser):
+    """
+    Parser tối giản cho bảng giá lưu ra HTML: lấy text các ô <td> trong <tbody><tr>.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.rows = []
+        self._in_body = 0
+        self._row = None
+        self._cell = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "tbody":
+            self._in_body += 1
+        elif tag == "tr" and self._in_body:
+            self._row = []
+        elif tag == "td" and self._row is not None:
+            self._cell = []
+
+    def handle_endtag(self, tag):
+        if tag == "td" and self._cell is not None:
+            self._row.append("".join(self._cell))
+            self._cell = None
+        elif tag == "tr" and self._row is not None:
+            self.rows.append(self._row)
+            self._row = None
+        elif tag == "tbody" and self._in_body:
+            self._in_body -= 1
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+
+def parse_priceboard_html(html: str, ts: datetime | None = None) -> pd.DataFrame:
+    """
+    Đọc bảng giá từ HTML đã lưu (chạy offline, không cần trình duyệt).
+    """
+    p = _PriceboardHTMLParser()
+    p.feed(html)
+    need = max(COL_SYMBOL_IDX, COL_K_IDX)
+    rows = [[r[COL_SYMBOL_IDX], r[COL_K_IDX]] for r in p.rows if len(r) > need]
+    return rows_to_ticks(rows, ts)
+
+
+def write_archive(ticks: pd.DataFrame, folder: str, ts: datetime, tag: str = "dom") -> str:
+    """
+    Lưu snapshot ra CSV cùng bố cục file export (mã ở cột A, giá ở cột K) để các công cụ cũ vẫn đọc được.
+    """
+    width = max(COL_SYMBOL_IDX, COL_K_IDX) + 1
+    cols = {i: [""] * len(ticks) for i in range(width)}
+    cols[COL_SYMBOL_IDX] = ticks["symbol"].to_numpy()
+    cols[COL_K_IDX] = ticks["price"].to_numpy()
+    out = pd.DataFrame(cols)
+    out.columns = ["CK"] + [f"c{i}" for i in range(1, width)]
+
+    path = os.path.join(folder, f"{ts.strftime('%Y%m%d_%H%M%S')}_{tag}_priceboard.csv")
+    out.to_csv(path, index=False, encoding="utf-8-sig")
+    return path
+
+
+def capture_once(driver, pipeline=None, archive_folder: str | None = None) -> pd.DataFrame:
+    """
+    1 nhịp capture: đọc bảng giá từ driver -> đẩy tick vào pipeline -> (tuỳ chọn) lưu archive.
+    """
+    ts = datetime.now().replace(microsecond=0)
+    ticks = read_priceboard_from_driver(driver, ts)
+
+    path = None
+    if archive_folder and not ticks.empty:
+        path = write_archive(ticks, archive_folder, ts)
+
+    if pipeline is not None:
+        pipeline.on_ticks(ticks, ts, source_path=path)
+
+    return ticks
+
+
+if __name__ == "__main__":
+    # Kiểm tra offline với bảng giá lưu từ trình duyệt: python capture.py priceboard.html
+    with open(sys.argv[1], "r", encoding="utf-8") as f:
+        df = parse_priceboard_html(f.read())
+    print(df.head(20))
+    print(f"Tổng: {len(df)} mã")
@@ -1,6 +1,9 @@
+import os
 import pandas as pd
 import numpy as np
 
+from writer import append_csv
+
 # ===== CONFIG =====
 CSV_PATH = r"C:\Users\Admin\Desktop\trading_data\5_wick_lower_sample.csv"
 
@@ -8,9 +11,105 @@ MIN_LOWER_WICK_PCT_RANGE = 0.45   # wick dưới >= 45% range
 MIN_LOWER_WICK_MULT_BODY = 2.0    # wick dưới >= 2 lần body
 MIN_CLOSE_POSITION = 0.70         # close nằm trong top 30%
 REQUIRE_BULLISH_CLOSE = False
+
+# 1 tín hiệu = 1 nến
+SIGNAL_KEY = ["date", "session", "time", "symbol"]
 # ===================
 
 
+def lower_wick_signal(
+    o,
+    h=None,
+    l=None,
+    c=None,
+    *,
+    min_lower_wick_pct_range: float | None = None,
+    min_lower_wick_mult_body: float | None = None,
+    min_close_position: float | None = None,
+    require_bullish_close: bool | None = None,
+) -> np.ndarray:
+    """
+    Mảng bool nến rút chân, tính thẳng trên bộ nhớ (không đọc/ghi file).
+    Nhận 4 mảng open/high/low/close, hoặc 1 DataFrame có các cột đó.
+    Ngưỡng chỉ nhận theo tên (keyword), để None -> dùng CONFIG ở trên.
+    """
+    if isinstance(o, pd.DataFrame):
+        if h is not None or l is not None or c is not None:
+            raise TypeError("lower_wick_signal(DataFrame): ngưỡng phải truyền theo tên, vd. min_close_position=0.7")
+        df = o
+        o, h, l, c = (pd.to_numeric(df[k], errors="coerce").to_numpy() for k in ["open", "high", "low", "close"])
+
+    # import khi gọi: patterns.py lấy ngưỡng mặc định của mẫu lower_wick từ CONFIG của file này
+    from patterns import compute_features, lower_wick
+
+    f = compute_features(o, h, l, c)
+    return lower_wick(
+        f,
+        MIN_LOWER_WICK_PCT_RANGE if min_lower_wick_pct_range is None else min_lower_wick_pct_range,
+        MIN_LOWER_WICK_MULT_BODY if min_lower_wick_mult_body is None else min_lower_wick_mult_body,
+        MIN_CLOSE_POSITION if min_close_position is None else min_close_position,
+        REQUIRE_BULLISH_CLOSE if require_bullish_close is None else require_bullish_close,
+    )
+
+
+def detect_lower_wick(bars: pd.DataFrame, **thresholds) -> pd.DataFrame:
+    """
+    Các dòng nến rút chân trong bảng nến (giữ nguyên cột, thêm signal = "yes").
+    """
+    if bars.empty:
+        return bars.assign(signal=pd.Series(dtype=str))
+    hits = bars.loc[lower_wick_signal(bars, **thresholds)].copy()
+    hits["signal"] = "yes"
+    return hits
+
+
+class SignalSink:
+    """
+    Ghi tín hiệu ra CSV kiểu append-only: mỗi nến (date, session, time, symbol) chỉ ghi 1 lần,
+    không đọc lại hay ghi đè file mỗi chu kỳ.
+    writer: AsyncWriter (tuỳ chọn) để ghi trên thread nền.
+    """
+
+    def __init__(self, path: str, writer=None):
+        self.path = path
+        self.writer = writer
+        self.seen = set()
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            try:
+                old = pd.read_csv(path, dtype=str)
+            except pd.errors.EmptyDataError:
+                old = pd.DataFrame()
+            if "signal" in old.columns:
+                # file kiểu cũ (add_lower_wick_signal) có cả dòng "no"
+                old = old[old["signal"] == "yes"]
+            if set(SIGNAL_KEY).issubset(old.columns):
+                self.seen.update(self._keys(old))
+
+    @staticmethod
+    def _keys(df: pd.DataFrame) -> list[tuple]:
+        times = pd.to_datetime(df["time"], errors="coerce").astype(str)
+        return list(zip(df["date"].astype(str), df["session"].astype(str), times, df["symbol"].astype(str)))
+
+    def append(self, hits: pd.DataFrame) -> pd.DataFrame:
+        """
+        Ghi thêm các tín hiệu chưa có trong file; trả về đúng các dòng vừa ghi.
+        """
+        if hits.empty:
+            return hits
+        keys = self._keys(hits)
+        is_new = np.array([k not in self.seen for k in keys])
+        new = hits.loc[is_new]
+        if new.empty:
+            return new
+
+        if self.writer is not None:
+            self.writer.append(new, self.path)
+        else:
+            append_csv(new, self.path)
+        self.seen.update(k for k, n in zip(keys, is_new) if n)
+        return new
+
+
 def add_lower_wick_signal(csv_path):
     df = pd.read_csv(csv_path)
 
@@ -18,26 +117,7 @@ def add_lower_wick_signal(csv_path):
     for c in ["open", "high", "low", "close"]:
         df[c] = pd.to_numeric(df[c], errors="coerce")
 
-    o = df["open"]
-    h = df["high"]
-    l = df["low"]
-    c = df["close"]
-
-    eps = 1e-9
-    candle_range = (h - l).clip(lower=0)
-    body = (c - o).abs()
-    lower_wick = (np.minimum(o, c) - l).clip(lower=0)
-
-    lower_wick_pct_range = lower_wick / (candle_range + eps)
-    lower_wick_mult_body = lower_wick / (body + eps)
-    close_position = (c - l) / (candle_range + eps)
-
-    cond1 = lower_wick_pct_range >= MIN_LOWER_WICK_PCT_RANGE
-    cond2 = lower_wick_mult_body >= MIN_LOWER_WICK_MULT_BODY
-    cond3 = close_position >= MIN_CLOSE_POSITION
-    cond4 = (c >= o) if REQUIRE_BULLISH_CLOSE else True
-
-    signal = cond1 & cond2 & cond3 & cond4
+    signal = lower_wick_signal(df)
 
     # thêm cột signal vào dataframe
     df["signal"] = np.where(signal, "yes", "no")
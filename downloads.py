@@ -0,0 +1,64 @@
+import os
+import time
+
+# ======================
+# CONFIG
+# ======================
+# Chờ file export tải xong (dùng chung cho main.py và boards.py)
+STABLE_POLL_SECONDS = 0.1   # chỉ dùng khi không thấy sự kiện .crdownload -> .csv
+STABLE_CHECKS = 3
+
+
+# ======================
+# Helpers
+# ======================
+def make_unique_path(folder, filename):
+    base, ext = os.path.splitext(filename)
+    candidate = filename
+    i = 1
+    while os.path.exists(os.path.join(folder, candidate)):
+        candidate = f"{base}_{i}{ext}"
+        i += 1
+    return os.path.join(folder, candidate)
+
+
+def wait_until_stable(file_path, timeout=120, done_event=None):
+    """
+    Chờ file tải xong: kích thước đứng yên STABLE_CHECKS lần liên tiếp, hoặc done_event được set.
+    """
+    start = time.time()
+    last_size = -1
+    stable_count = 0
+
+    while time.time() - start < timeout:
+        # Chrome đã đổi .crdownload -> .csv: coi như xong, khỏi chờ tiếp
+        if done_event is not None and done_event.is_set():
+            return True
+
+        if not os.path.exists(file_path):
+            _sleep(STABLE_POLL_SECONDS, done_event)
+            continue
+
+        try:
+            size = os.path.getsize(file_path)
+        except OSError:
+            size = -1
+
+        if size == last_size and size > 0:
+            stable_count += 1
+            if stable_count >= STABLE_CHECKS:
+                return True
+        else:
+            stable_count = 0
+            last_size = size
+
+        _sleep(STABLE_POLL_SECONDS, done_event)
+
+    return False
+
+
+def _sleep(seconds, done_event=None):
+    if done_event is not None:
+        done_event.wait(seconds)
+    else:
+        time.sleep(seconds)
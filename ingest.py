@@ -0,0 +1,237 @@
+import os
+
+import pandas as pd
+
+from ohlc import CHANGE_ONLY, FOLDER, TIMEFRAME, ChangeFilter, concat_ticks, empty_ticks, make_ticks, parse_ts_from_filename, read_symbol_price_from_file, use_change_filter
+
+
+class TickIngestor:
+    """
+    Gom tick tăng dần từ folder snapshot iBoard.
+
+    Nhớ các file đã parse (path -> size, mtime) để mỗi lần update() chỉ đọc
+    file mới hoặc file bị ghi lại, thay vì glob + read_csv lại toàn bộ lịch sử.
+    change_only: chỉ lưu tick đổi giá (xem ChangeFilter); tự tắt nếu `timeframe` không phải bội số của BASE_TIMEFRAME.
+    Sau release() chỉ còn nhớ manifest: tick mới vẫn được trả về nhưng không giữ lại trong bộ nhớ.
+    """
+
+    def __init__(self, folder: str, change_only: bool = CHANGE_ONLY, timeframe: str = TIMEFRAME):
+        self.folder = folder
+        self.change = ChangeFilter() if use_change_filter(timeframe, change_only) else None
+        self.manifest = {}  # path -> (size, mtime_ns)
+        self.done_before = None  # ngày YYYYMMDD: file các ngày trước đó coi như đã đọc xong (xem forget_before())
+        self._frames = {}  # path -> DataFrame tick (time, symbol, price)
+        self._data = None  # bảng tick đã gộp (cache)
+        self._seen = set()
+        self.keep_ticks = True  # False sau release(): không giữ tick đã ingest
+        self.last_scanned = 0  # số file snapshot thấy ở lần scan() gần nhất
+        self.last_parsed = 0  # số file đọc được ở lần ingest gần nhất
+        self.last_failed = 0  # số file lỗi (đang ghi dở...) ở lần ingest gần nhất
+
+    def state(self) -> dict:
+        """
+        Mốc đã ingest (manifest) + trạng thái lọc đổi giá, để checkpoint; không gồm tick.
+        """
+        st = {"manifest": dict(self.manifest), "done_before": self.done_before}
+        if self.change is not None:
+            st["last_price"] = dict(self.change.last_price)
+            st["last_bucket"] = dict(self.change.last_bucket)
+        return st
+
+    def load_state(self, state: dict):
+        """
+        Khôi phục từ state(): các file trong manifest coi như đã đọc, lần update() sau chỉ đọc file mới hơn.
+        """
+        self.manifest = dict(state["manifest"])
+        self.done_before = state.get("done_before")
+        self._frames = {}
+        self._data = None
+        if self.change is not None and "last_price" in state:
+            self.change.last_price = dict(state["last_price"])
+            self.change.last_bucket = dict(state["last_bucket"])
+
+    def release(self):
+        """
+        Bỏ toàn bộ tick đang giữ (vd. đã dựng vào nến), từ giờ không giữ tick nữa; manifest giữ nguyên.
+        Dùng cho live loop: chi phí mỗi lần ingest chỉ phụ thuộc vào file mới, không vào lịch sử.
+        """
+        self.keep_ticks = False
+        self._frames = {}
+        self._data = None
+
+    def forget_before(self, day: str):
+        """
+        Coi mọi file trước ngày `day` (YYYYMMDD) là đã đọc xong: bỏ khỏi manifest, scan()/changed() bỏ qua.
+        Manifest (và checkpoint) chỉ còn file từ `day` trở đi thay vì tăng mãi theo số snapshot.
+        """
+        if self.done_before is not None and day <= self.done_before:
+            return
+        self.done_before = day
+        for p in [p for p in self.manifest if self._is_done(p)]:
+            self.manifest.pop(p, None)
+            if self._frames.pop(p, None) is not None:
+                self._data = None
+
+    def _is_done(self, path: str) -> bool:
+        return self.done_before is not None and os.path.basename(path)[:8] < self.done_before
+
+    def scan(self) -> list[tuple[str, tuple[int, int]]]:
+        """
+        Liệt kê các file CSV có timestamp hợp lệ mà chưa parse hoặc đã thay đổi.
+        """
+        found = []
+        self._seen = set()
+        self.last_scanned = 0
+        try:
+            entries = list(os.scandir(self.folder))
+        except FileNotFoundError:
+            return found
+
+        for entry in entries:
+            if not entry.is_file() or not entry.name.lower().endswith(".csv"):
+                continue
+            if parse_ts_from_filename(entry.path) is None or self._is_done(entry.path):
+                continue
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            self._seen.add(entry.path)
+            self.last_scanned += 1
+            sig = (st.st_size, st.st_mtime_ns)
+            if self.manifest.get(entry.path) != sig:
+                found.append((entry.path, sig))
+
+        found.sort(key=lambda x: os.path.basename(x[0]))
+        return found
+
+    def update(self) -> pd.DataFrame:
+        """
+        Quét folder, đọc các file mới, trả về tick mới (time, symbol, price) của lần quét này.
+        """
+        found = self.scan()
+        self.prune()
+        return self.ingest(found)
+
+    def prune(self):
+        """
+        File cũ bị xoá khỏi folder (theo lần scan() gần nhất) -> bỏ tick tương ứng.
+        """
+        gone = [p for p in self.manifest if p not in self._seen]
+        for p in gone:
+            self.manifest.pop(p, None)
+            self._frames.pop(p, None)
+        if gone:
+            self._data = None
+
+    def ingest_paths(self, paths: list[str]) -> pd.DataFrame:
+        """
+        Đọc đúng các file được báo (vd. từ sự kiện rename của main.py), không quét folder.
+        """
+        return self.ingest(self.changed(paths))
+
+    def changed(self, paths: list[str]) -> list[tuple[str, tuple[int, int]]]:
+        """
+        Lọc trong `paths` các file chưa parse hoặc đã thay đổi (giống scan() nhưng không quét folder).
+        """
+        found = []
+        for path in paths:
+            if parse_ts_from_filename(path) is None or self._is_done(path):
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            sig = (st.st_size, st.st_mtime_ns)
+            if self.manifest.get(path) != sig:
+                found.append((path, sig))
+
+        found.sort(key=lambda x: os.path.basename(x[0]))
+        return found
+
+    def add(self, path: str, ticks: pd.DataFrame):
+        """
+        Ghi nhận 1 file mà tick của nó đã có trong bộ nhớ (vd. file archive vừa ghi),
+        để lần quét sau không parse lại. Không lọc ChangeFilter (người gọi lọc bằng filter()).
+        """
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        ticks = make_ticks(ticks)
+        self.manifest[path] = (st.st_size, st.st_mtime_ns)
+        if not self.keep_ticks:
+            return
+        if path in self._frames:
+            self._data = None
+        elif self._data is not None:
+            self._data = concat_ticks([self._data, ticks])
+        self._frames[path] = ticks
+
+    def filter(self, ticks: pd.DataFrame) -> pd.DataFrame:
+        """
+        Lọc tick lấy từ nguồn khác (vd. đọc thẳng từ trình duyệt) qua cùng ChangeFilter với tick đọc từ file.
+        """
+        ticks = make_ticks(ticks)
+        if self.change is not None:
+            ticks = self.change.apply(ticks)
+        return ticks
+
+    def ingest(self, found: list[tuple[str, tuple[int, int]]]) -> pd.DataFrame:
+        """
+        Đọc các file từ scan()/changed(), trả về tick mới.
+        """
+        new_rows = []
+        replaced = False
+        self.last_parsed = self.last_failed = 0
+
+        for path, sig in found:
+            try:
+                sp = read_symbol_price_from_file(path)
+            except Exception:
+                # file đang ghi dở -> để lần sau đọc lại
+                self.last_failed += 1
+                continue
+            self.last_parsed += 1
+
+            sp = make_ticks(sp, parse_ts_from_filename(path))
+            if self.change is not None:
+                sp = self.change.apply(sp)
+
+            self.manifest[path] = sig
+            if self.keep_ticks:
+                if path in self._frames:
+                    replaced = True
+                self._frames[path] = sp
+            if not sp.empty:
+                new_rows.append(sp)
+
+        if replaced:
+            self._data = None
+
+        if not new_rows:
+            return empty_ticks()
+
+        new_data = concat_ticks(new_rows)
+        if self.keep_ticks and self._data is not None:
+            self._data = concat_ticks([self._data, new_data])
+
+        return new_data
+
+    def ticks(self) -> pd.DataFrame:
+        """
+        Toàn bộ tick đang giữ, cùng định dạng với build_ticks_from_folder() (rỗng sau release()).
+        """
+        if self._data is None:
+            frames = [f for f in self._frames.values() if not f.empty]
+            if not frames:
+                return empty_ticks()
+            self._data = concat_ticks(frames)
+
+        return self._data.sort_values(["symbol", "time"])
+
+
+if __name__ == "__main__":
+    ingestor = TickIngestor(FOLDER)
+    new = ingestor.update()
+    print(f"Đã ingest {len(ingestor.manifest)} file, {len(new)} tick.")
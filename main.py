@@ -1,122 +1,65 @@
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 import keyboard
-import os
 import time
-import re
+import queue
+import threading
 from datetime import datetime
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
+from concurrent.futures import ThreadPoolExecutor
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from boards import BoardRenamer, start_rename_observer
 
 FOLDER_TO_WATCH = r"C:\Users\Admin\Desktop\trading_data"
 
-# File đã rename sẽ có dạng: 20260220_143501_original.csv
-RENAMED_PATTERN = re.compile(r"^\d{8}_\d{6}_")
-
-recently_handled = {}  # path -> last_time
+# File đã rename sẽ có dạng: 20260220_143501_original.csv (đổi tên bởi boards.BoardRenamer)
 COOLDOWN_SECONDS = 5
 
-def make_unique_path(folder, filename):
-    base, ext = os.path.splitext(filename)
-    candidate = filename
-    i = 1
-    while os.path.exists(os.path.join(folder, candidate)):
-        candidate = f"{base}_{i}{ext}"
-        i += 1
-    return os.path.join(folder, candidate)
-
-def wait_until_stable(file_path, timeout=120):
-    start = time.time()
-    last_size = -1
-    stable_count = 0
-
-    while time.time() - start < timeout:
-        if not os.path.exists(file_path):
-            time.sleep(0.2)
-            continue
-
-        try:
-            size = os.path.getsize(file_path)
-        except OSError:
-            size = -1
-
-        if size == last_size and size > 0:
-            stable_count += 1
-            if stable_count >= 3:
-                return True
-        else:
-            stable_count = 0
-            last_size = size
-
-        time.sleep(0.5)
-
-    return False
-
-def should_ignore(file_path):
-    now = time.time()
-
-    # cooldown theo path để tránh bắn event nhiều lần
-    last = recently_handled.get(file_path)
-    if last and (now - last) < COOLDOWN_SECONDS:
-        return True
-
-    # dọn cache cũ cho gọn
-    for k in list(recently_handled.keys()):
-        if now - recently_handled[k] > 30:
-            recently_handled.pop(k, None)
-
-    return False
-
-def rename_csv(file_path):
-    folder, filename = os.path.split(file_path)
-
-    # ignore file tạm
-    if filename.lower().endswith(".crdownload"):
-        return
+# Chạy ingest -> OHLC -> detect ngay khi có snapshot mới (trong process này).
+# Đặt False nếu chạy merged_ohlc_detect.py ở process riêng.
+PIPELINE_INLINE = True
 
-    # chỉ CSV
-    if not filename.lower().endswith(".csv"):
-        return
+# "export": click nút export, Chrome tải CSV, watcher rename rồi đưa vào pipeline
+# "dom":    đọc bảng giá thẳng từ trang qua driver, đẩy tick vào pipeline trong bộ nhớ
+CAPTURE_MODE = "export"
+ARCHIVE_EVERY = 6  # chế độ dom: cứ N nhịp lưu 1 file CSV archive (0 = không lưu)
 
-    # nếu đã có prefix timestamp thì bỏ qua (ngăn rename loop)
-    if RENAMED_PATTERN.match(filename):
-        return
+# Snapshot đã rename xong -> pipeline tiêu thụ
+snapshot_queue = queue.Queue()
 
-    # tránh xử lý lặp do nhiều event
-    if should_ignore(file_path):
-        return
+# Xử lý file tải xong trên thread pool, không chặn thread của observer
+RENAME_WORKERS = 4
 
-    # đánh dấu đang xử lý
-    recently_handled[file_path] = time.time()
+rename_executor = ThreadPoolExecutor(max_workers=RENAME_WORKERS, thread_name_prefix="rename")
 
-    if not wait_until_stable(file_path, timeout=120):
-        print(f"[Rename] Timeout/chưa ổn định: {filename}")
-        return
+def publish_snapshot(board, path):
+    snapshot_queue.put(path)
 
-    now_str = datetime.now().strftime("%Y%m%d_%H%M%S")
-    new_filename = f"{now_str}_{filename}"
-    new_path = make_unique_path(folder, new_filename)
-
-    try:
-        os.rename(file_path, new_path)
-        # đánh dấu cả path mới để event tiếp theo bị ignore
-        recently_handled[new_path] = time.time()
-        print(f"[Rename] OK: {filename} -> {os.path.basename(new_path)}")
-    except Exception as e:
-        print(f"[Rename] Lỗi: {filename}: {e}")
-
-class RenameHandler(FileSystemEventHandler):
-    def on_created(self, event):
-        if event.is_directory:
+def run_pipeline_consumer(pipeline):
+    while True:
+        path = snapshot_queue.get()
+        if path is None:
             return
-        rename_csv(event.src_path)
+        paths = [path]
+        stop = False
+        # gom các snapshot đang chờ để xử lý 1 lượt
+        while True:
+            try:
+                p = snapshot_queue.get_nowait()
+            except queue.Empty:
+                break
+            if p is None:
+                stop = True
+                break
+            paths.append(p)
+
+        try:
+            pipeline.on_snapshot(paths)
+        except Exception as e:
+            print(f"[Pipeline] Lỗi: {e}")
 
-    def on_moved(self, event):
-        if event.is_directory:
+        if stop:
             return
-        rename_csv(event.dest_path)
 
 if __name__ == "__main__":
     # Chrome download về đúng folder
@@ -131,9 +74,20 @@ if __name__ == "__main__":
 
     driver = webdriver.Chrome(options=options)
 
-    observer = Observer()
-    observer.schedule(RenameHandler(), FOLDER_TO_WATCH, recursive=False)
-    observer.start()
+    consumer = None
+    pipeline = None
+    if PIPELINE_INLINE:
+        from merged_ohlc_detect import LivePipeline
+
+        pipeline = LivePipeline(FOLDER_TO_WATCH)
+        pipeline.start()
+        consumer = threading.Thread(target=run_pipeline_consumer, args=(pipeline,), daemon=True)
+        consumer.start()
+
+    # tải thẳng vào folder theo dõi: rename tại chỗ, không gắn tên bảng
+    renamer = BoardRenamer(None, FOLDER_TO_WATCH, FOLDER_TO_WATCH, publish_snapshot, rename_executor,
+                           cooldown=COOLDOWN_SECONDS)
+    observer = start_rename_observer([renamer])
     print(f"Đang theo dõi: {FOLDER_TO_WATCH} (Ctrl+C để dừng)")
 
     try:
@@ -143,7 +97,23 @@ if __name__ == "__main__":
 
         print("Bắt đầu auto export mỗi 30 giây...")
 
+        n_capture = 0
         while True:
+            if CAPTURE_MODE == "dom":
+                from capture import capture_once
+
+                n_capture += 1
+                # không có pipeline trong process -> luôn lưu file để process khác đọc
+                archive = pipeline is None or (ARCHIVE_EVERY and n_capture % ARCHIVE_EVERY == 0)
+                try:
+                    ticks = capture_once(driver, pipeline, FOLDER_TO_WATCH if archive else None)
+                    print(f"Đã đọc bảng giá lúc: {datetime.now().strftime('%H:%M:%S')} ({len(ticks)} mã)")
+                except Exception as e:
+                    print("Lỗi khi đọc bảng giá:", e)
+
+                time.sleep(10)
+                continue
+
             try:
                 # chờ button sẵn sàng để click
                 button = wait.until(
@@ -163,4 +133,10 @@ if __name__ == "__main__":
     finally:
         observer.stop()
         observer.join()
+        rename_executor.shutdown(wait=True)
+        if consumer is not None:
+            snapshot_queue.put(None)
+            consumer.join(timeout=30)
+        if pipeline is not None:
+            pipeline.close()
         driver.quit()
\ No newline at end of file
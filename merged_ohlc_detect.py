@@ -1,17 +1,29 @@
 import os
-import re
 import glob
-from datetime import datetime, time as dtime
+import pickle
+import threading
+from datetime import datetime
 import pandas as pd
 import numpy as np
 
+from ingest import TickIngestor
+from bar_engine import BarEngine
+from detect import SignalSink, detect_lower_wick, lower_wick_signal
+from metrics import Metrics
+from writer import AsyncWriter, replace_with_retry
+from ohlc import CHANGE_ONLY, ChangeFilter, build_bars, use_change_filter, concat_ticks, empty_ticks, hhmm_to_time, make_ticks, ohlc_all_sessions, parse_ts_from_filename, read_symbol_price_from_file, write_session_outputs
+
 # ======================
 # CONFIG
 # ======================
 FOLDER = r"C:\Users\Admin\Desktop\trading_data"
 TIMEFRAME = "60min"
-COL_SYMBOL_IDX = 0
-COL_K_IDX = 10
+POLL_SECONDS = 10  # nhịp cập nhật nến, khớp với chu kỳ export 10s của main.py
+METRICS_FILE = "metrics_{date}.jsonl"  # số đo từng chu kỳ (JSON lines) trong FOLDER, mỗi ngày 1 file; None = không ghi
+# Checkpoint trạng thái live để khởi động lại không phải dựng lại toàn bộ folder
+CHECKPOINT_FILE = "_checkpoint.pkl"  # trong FOLDER; None = tắt
+CHECKPOINT_EVERY = 6                 # lưu sau mỗi N chu kỳ (~1 phút với nhịp 10s)
+CHECKPOINT_VERSION = 2               # 2: nến các ngày trước nằm ở file riêng _checkpoint_YYYYMMDD.pkl
 SESSIONS = [
     ("0900", "1000"),
     ("1000", "1100"),
@@ -19,40 +31,23 @@ SESSIONS = [
     ("1300", "1400"),
     ("1400", "1430"),
 ]
-TS_PATTERN = re.compile(r"^(?P<ts>\d{8}_\d{6})_.*\.csv$", re.IGNORECASE)
 
 # Detect config
 MIN_LOWER_WICK_PCT_RANGE = 0.45   # wick dưới >= 45% range
 MIN_LOWER_WICK_MULT_BODY = 2.0    # wick dưới >= 2 lần body
 MIN_CLOSE_POSITION = 0.70         # close nằm trong top 30%
 REQUIRE_BULLISH_CLOSE = False
+# detect.csv chỉ nhận nến đã đóng. True: detect thêm nến đang chạy (tín hiệu sớm, nến có thể còn đổi),
+# ghi đè mỗi chu kỳ vào PROVISIONAL_FILE (chỉ gồm tín hiệu của nến đang chạy hiện tại)
+DETECT_PROVISIONAL = False
+PROVISIONAL_FILE = "detect_provisional.csv"
 
 # ======================
 # OHLC Helpers
 # ======================
-def parse_ts_from_filename(path: str) -> datetime | None:
-    m = TS_PATTERN.match(os.path.basename(path))
-    if not m:
-        return None
-    return datetime.strptime(m.group("ts"), "%Y%m%d_%H%M%S")
-
-def read_symbol_price_from_file(path: str) -> pd.DataFrame:
-    df = pd.read_csv(path)
-    if df.shape[1] <= COL_K_IDX:
-        return pd.DataFrame(columns=["symbol", "price"])
-    x = df.iloc[:, [COL_SYMBOL_IDX, COL_K_IDX]].copy()
-    x.columns = ["symbol", "price"]
-    x["symbol"] = x["symbol"].astype(str).str.strip()
-    x = x[(x["symbol"] != "") & (x["symbol"].str.upper() != "CK")]
-    x["price"] = pd.to_numeric(x["price"], errors="coerce")
-    x = x.dropna(subset=["price"])
-    return x
-
-def hhmm_to_time(hhmm: str) -> dtime:
-    return dtime(int(hhmm[:2]), int(hhmm[2:]))
-
-def build_ticks_from_folder(folder: str) -> pd.DataFrame:
-    files = glob.glob(os.path.join(folder, "*.csv"))
+def build_ticks_from_folder(folder: str, change_only: bool = CHANGE_ONLY, timeframes: str | list[str] = TIMEFRAME) -> pd.DataFrame:
+    files = sorted(glob.glob(os.path.join(folder, "*.csv")), key=os.path.basename)
+    change = ChangeFilter() if use_change_filter(timeframes, change_only) else None
     rows = []
     for f in files:
         ts = parse_ts_from_filename(f)
@@ -64,11 +59,11 @@ def build_ticks_from_folder(folder: str) -> pd.DataFrame:
             continue
         if sp.empty:
             continue
-        sp["time"] = ts
-        rows.append(sp)
+        ticks = make_ticks(sp, ts)
+        rows.append(change.apply(ticks) if change is not None else ticks)
     if not rows:
-        return pd.DataFrame(columns=["time", "symbol", "price"])
-    data = pd.concat(rows, ignore_index=True)
+        return empty_ticks()
+    data = concat_ticks(rows)
     data = data.sort_values(["symbol", "time"])
     return data
 
@@ -77,73 +72,47 @@ def ohlc_for_session(data: pd.DataFrame, start_hhmm: str, end_hhmm: str, timefra
         return pd.DataFrame(columns=["date", "session", "time", "symbol", "open", "high", "low", "close"])
     start_t = hhmm_to_time(start_hhmm)
     end_t = hhmm_to_time(end_hhmm)
-    mask = (data["time"].dt.time >= start_t) & (data["time"].dt.time < end_t)
-    sub = data.loc[mask].copy()
+    tod = data["time"].dt.time
+    sub = data.loc[(tod >= start_t) & (tod < end_t)]
     if sub.empty:
         return pd.DataFrame(columns=["date", "session", "time", "symbol", "open", "high", "low", "close"])
-    session_name = f"{start_hhmm}-{end_hhmm}"
-    out = []
-    for sym, g in sub.groupby("symbol"):
-        s = g.set_index("time")["price"].sort_index()
-        ohlc = s.resample(timeframe).ohlc().dropna()
-        ohlc["symbol"] = sym
-        out.append(ohlc.reset_index())
-    if not out:
+    res = build_bars(sub, timeframe)
+    if res.empty:
         return pd.DataFrame(columns=["date", "session", "time", "symbol", "open", "high", "low", "close"])
-    res = pd.concat(out, ignore_index=True)
     res["date"] = res["time"].dt.strftime("%Y%m%d")
-    res["session"] = session_name
+    res["session"] = f"{start_hhmm}-{end_hhmm}"
     res = res[["date", "session", "time", "symbol", "open", "high", "low", "close"]]
     return res.sort_values(["date", "session", "time", "symbol"])
 
-def export_sessions(folder: str, timeframe: str):
-    data = build_ticks_from_folder(folder)
+def export_sessions(folder: str, timeframe: str, data: pd.DataFrame | None = None) -> pd.DataFrame:
+    if data is None:
+        data = build_ticks_from_folder(folder, timeframes=timeframe)
     if data.empty:
         print("Không có dữ liệu tick hợp lệ từ các file trong folder (kiểm tra tên file/timestamp & cột K).")
-        return
+        return pd.DataFrame(columns=["date", "session", "time", "symbol", "open", "high", "low", "close"])
     data["time"] = pd.to_datetime(data["time"], errors="coerce")
     data = data.dropna(subset=["time"])
-    for start_hhmm, end_hhmm in SESSIONS:
-        sess_df = ohlc_for_session(data, start_hhmm, end_hhmm, timeframe)
-        if sess_df.empty:
-            print(f"Session {start_hhmm}-{end_hhmm}: không có dữ liệu.")
-            continue
-        out_path = os.path.join(folder, f"OHLC_{timeframe}_{start_hhmm}-{end_hhmm}.csv")
-        sess_df.to_csv(out_path, index=False, encoding="utf-8-sig")
-        print(f"OK: {start_hhmm}-{end_hhmm} -> {out_path} ({len(sess_df)} dòng)")
-    all_out = []
-    for start_hhmm, end_hhmm in SESSIONS:
-        all_out.append(ohlc_for_session(data, start_hhmm, end_hhmm, timeframe))
-    all_out = [x for x in all_out if not x.empty]
-    if all_out:
-        merged = pd.concat(all_out, ignore_index=True).sort_values(["date", "session", "time", "symbol"])
-        merged_path = os.path.join(folder, f"OHLC_ALL_SESSIONS_{timeframe}.csv")
-        merged.to_csv(merged_path, index=False, encoding="utf-8-sig")
-        print(f"OK: Tổng hợp -> {merged_path} ({len(merged)} dòng)")
+    bars = ohlc_all_sessions(data, timeframe, SESSIONS)
+    write_session_outputs(bars, folder, timeframe, SESSIONS)
+    return bars
 
 # ======================
 # Detect Helpers
 # ======================
+def detect_params() -> dict:
+    return dict(
+        min_lower_wick_pct_range=MIN_LOWER_WICK_PCT_RANGE,
+        min_lower_wick_mult_body=MIN_LOWER_WICK_MULT_BODY,
+        min_close_position=MIN_CLOSE_POSITION,
+        require_bullish_close=REQUIRE_BULLISH_CLOSE,
+    )
+
 def add_lower_wick_signal(csv_path):
+    # Giữ lại cho các script cũ; live pipeline detect trong bộ nhớ (detect_lower_wick + SignalSink)
     df = pd.read_csv(csv_path)
     for c in ["open", "high", "low", "close"]:
         df[c] = pd.to_numeric(df[c], errors="coerce")
-    o = df["open"]
-    h = df["high"]
-    l = df["low"]
-    c = df["close"]
-    eps = 1e-9
-    candle_range = (h - l).clip(lower=0)
-    body = (c - o).abs()
-    lower_wick = (np.minimum(o, c) - l).clip(lower=0)
-    lower_wick_pct_range = lower_wick / (candle_range + eps)
-    lower_wick_mult_body = lower_wick / (body + eps)
-    close_position = (c - l) / (candle_range + eps)
-    cond1 = lower_wick_pct_range >= MIN_LOWER_WICK_PCT_RANGE
-    cond2 = lower_wick_mult_body >= MIN_LOWER_WICK_MULT_BODY
-    cond3 = close_position >= MIN_CLOSE_POSITION
-    cond4 = (c >= o) if REQUIRE_BULLISH_CLOSE else True
-    signal = cond1 & cond2 & cond3 & cond4
+    signal = lower_wick_signal(df, **detect_params())
     df["signal"] = np.where(signal, "yes", "no")
     if (df["signal"] == "yes").sum() == 0:
         # Tạo file trắng với header
@@ -154,64 +123,295 @@ def add_lower_wick_signal(csv_path):
         print(f"Đã thêm cột 'signal' vào file. Số dòng có nến rút chân: {(df['signal'] == 'yes').sum()}")
 
 # ======================
-# Main
+# Live pipeline
 # ======================
-if __name__ == "__main__":
-    import time
-    import argparse
-    # Không cần chọn mode, chạy tuần tự các bước
-    folder = FOLDER
-    timeframe = TIMEFRAME
-    csv_path = os.path.join(folder, 'detect.csv')
-
-    # Bước 1: xuất OHLC từng phiên và tổng hợp vào ohlc.csv
-    export_sessions(folder, timeframe)
-    # Tổng hợp tất cả các phiên vào ohlc.csv
-    all_ohlc = []
+def get_current_session(now: datetime | None = None):
+    now = (now or datetime.now()).time()
     for start_hhmm, end_hhmm in SESSIONS:
-        file_path = os.path.join(folder, f"OHLC_{timeframe}_{start_hhmm}-{end_hhmm}.csv")
-        if os.path.exists(file_path):
-            df = pd.read_csv(file_path)
-            all_ohlc.append(df)
-    if all_ohlc:
-        ohlc_all = pd.concat(all_ohlc, ignore_index=True)
-        ohlc_all.to_csv(os.path.join(folder, "ohlc.csv"), index=False)
-        print(f"Đã tạo file tổng hợp OHLC: {os.path.join(folder, 'ohlc.csv')}")
-    else:
-        print("Không có dữ liệu OHLC để tổng hợp.")
+        start_t = hhmm_to_time(start_hhmm)
+        end_t = hhmm_to_time(end_hhmm)
+        if start_t <= now < end_t:
+            return start_hhmm, end_hhmm
+    return None, None
 
-    # Bước 2: detect signal nến rút chân
-    if not os.path.exists(csv_path):
-        # Tạo file detect.csv trắng với header
-        pd.DataFrame(columns=["date","session","time","symbol","open","high","low","close"]).to_csv(csv_path, index=False)
-    add_lower_wick_signal(csv_path)
+def _dump(obj, path: str):
+    """
+    pickle ra file tạm rồi đổi tên: file cũ còn nguyên nếu ghi lỗi giữa chừng.
+    """
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+    replace_with_retry(tmp, path)
 
-    # Bước 3: auto update sessions
-    def get_current_session():
-        now = datetime.now().time()
+class LivePipeline:
+    """
+    Ingest -> nến theo luồng -> file phiên hiện tại -> detect, chạy mỗi khi có snapshot mới.
+    Dùng được từ vòng lặp poll bên dưới hoặc gọi thẳng từ sự kiện rename của main.py.
+    """
+    def __init__(self, folder: str = FOLDER, timeframe: str = TIMEFRAME):
+        self.folder = folder
+        self.timeframe = timeframe
+        self.detect_path = os.path.join(folder, "detect.csv")
+        self.provisional_path = os.path.join(folder, PROVISIONAL_FILE)
+        self.ingestor = TickIngestor(folder, timeframe=timeframe)
+        self.engine = BarEngine(timeframe, SESSIONS)
+        # ghi file trên thread nền (atomic), vòng lặp không chờ đĩa
+        self.writer = AsyncWriter()
+        self.signals = SignalSink(self.detect_path, writer=self.writer)
+        # ngân sách 1 chu kỳ = nhịp poll: chu kỳ chậm hơn nhịp là bị tụt lại sau snapshot mới
+        self.metrics = Metrics(os.path.join(folder, METRICS_FILE) if METRICS_FILE else None, budget=POLL_SECONDS,
+                               writer=self.writer)
+        self.checkpoint_path = os.path.join(folder, CHECKPOINT_FILE) if CHECKPOINT_FILE else None
+        self._history_days = set()  # ngày đã lưu nến ra file riêng (history_path())
+        self._cycles_since_checkpoint = 0
+        # on_snapshot/on_ticks có thể được gọi từ nhiều thread (watcher, capture)
+        self._lock = threading.RLock()
+
+    def start(self, now: datetime | None = None) -> pd.DataFrame:
+        # Khởi động lại giữa phiên: lấy trạng thái từ checkpoint, chỉ đọc các snapshot mới hơn
+        if self.restore_checkpoint():
+            self.ingestor.release()
+            self.on_snapshot(now=now)
+            # on_snapshot chỉ ghi file của phiên hiện tại (không ghi gì nếu ngoài giờ):
+            # ghi lại mọi file phiên để có cả các nến dựng từ snapshot đến trong lúc dừng
+            return self.write_sessions()
+        # Ingest tăng dần: các lần sau chỉ đọc các snapshot mới
+        self.ingestor.update()
+        # Bước 1: xuất OHLC từng phiên và tổng hợp vào ohlc.csv
+        bars = export_sessions(self.folder, self.timeframe, data=self.ingestor.ticks())
+        # Tổng hợp tất cả các phiên vào ohlc.csv (lấy thẳng từ bảng nến trong bộ nhớ, không đọc lại file)
+        if not bars.empty:
+            ohlc_all = bars.sort_values(["session", "date", "time", "symbol"])
+            self.writer.write(ohlc_all, os.path.join(self.folder, "ohlc.csv"))
+            print(f"Đã tạo file tổng hợp OHLC: {os.path.join(self.folder, 'ohlc.csv')}")
+        else:
+            print("Không có dữ liệu OHLC để tổng hợp.")
+        # Nến theo luồng: mỗi snapshot chỉ cộng dồn tick mới vào nến đang chạy
+        self.engine.seed(bars)
+        self.engine.close_until(now or datetime.now())
+        # Bước 2: detect signal nến rút chân trên các nến đã đóng, chỉ ghi thêm tín hiệu mới
+        # (nến đang chạy được detect khi nó đóng)
+        if not os.path.exists(self.detect_path):
+            # Tạo file detect.csv trắng với header
+            pd.DataFrame(columns=["date","session","time","symbol","open","high","low","close","signal"]).to_csv(self.detect_path, index=False)
+        self.detect(self.engine.completed())
+        # tick đã nằm trong nến: bỏ khỏi bộ nhớ, các lần ingest sau chỉ tốn theo số file mới
+        self.ingestor.release()
+        self.save_checkpoint()
+        return bars
+
+    def write_sessions(self) -> pd.DataFrame:
+        """
+        Ghi lại file mọi phiên, OHLC_ALL_SESSIONS và ohlc.csv từ nến trong bộ nhớ (giống lúc dựng từ đầu).
+        """
         for start_hhmm, end_hhmm in SESSIONS:
-            start_t = hhmm_to_time(start_hhmm)
-            end_t = hhmm_to_time(end_hhmm)
-            if start_t <= now < end_t:
-                return start_hhmm, end_hhmm
-        return None, None
-
-    while True:
-        start_hhmm, end_hhmm = get_current_session()
-        if start_hhmm:
             session_name = f"{start_hhmm}-{end_hhmm}"
-            out_path = os.path.join(folder, f"OHLC_{timeframe}_{session_name}.csv")
-            # Xóa file cũ
-            if os.path.exists(out_path):
-                os.remove(out_path)
-            # Xuất dữ liệu phiên hiện tại
-            data = build_ticks_from_folder(folder)
-            data["time"] = pd.to_datetime(data["time"], errors="coerce")
-            data = data.dropna(subset=["time"])
-            sess_df = ohlc_for_session(data, start_hhmm, end_hhmm, timeframe)
-            sess_df.to_csv(out_path, index=False, encoding="utf-8-sig")
-            print(f"Đã cập nhật file {out_path} ({len(sess_df)} dòng)")
-        else:
+            sess_df = self.engine.bars(session_name)
+            if not sess_df.empty:
+                out_path = os.path.join(self.folder, f"OHLC_{self.timeframe}_{session_name}.csv")
+                self.writer.write(sess_df, out_path, encoding="utf-8-sig")
+        bars = self.engine.bars()
+        if not bars.empty:
+            self.writer.write(bars, os.path.join(self.folder, f"OHLC_ALL_SESSIONS_{self.timeframe}.csv"), encoding="utf-8-sig")
+            self.writer.write(bars.sort_values(["session", "date", "time", "symbol"]), os.path.join(self.folder, "ohlc.csv"))
+        return bars
+
+    def history_path(self, day: str) -> str:
+        base, ext = os.path.splitext(self.checkpoint_path)
+        return f"{base}_{day}{ext}"
+
+    def save_checkpoint(self):
+        """
+        Lưu mốc file đã ingest, nến đang chạy/đã đóng và tín hiệu đã ghi ra 1 file (ghi tạm rồi đổi tên).
+        Checkpoint chỉ chứa nến đã đóng của ngày mới nhất; nến các ngày trước được ghi 1 lần ra
+        history_path(ngày) (ghi lại nếu ngày đó có thêm nến), và manifest chỉ giữ file từ ngày mới nhất
+        (ingestor.forget_before), nên mỗi lần lưu không tăng theo lịch sử.
+        """
+        if not self.checkpoint_path:
+            return
+        # tín hiệu trong signals.seen phải nằm trong detect.csv trước khi được checkpoint
+        self.writer.flush()
+        with self._lock:
+            since = self.engine.latest_date()
+            old_days = sorted(d for d in self.engine.touched if d < since)
+            self.engine.touched.difference_update(old_days)
+            history = {d: self.engine.completed(d, d) for d in old_days}
+            if since is not None:
+                self.ingestor.forget_before(since)
+            state = {
+                "version": CHECKPOINT_VERSION,
+                "timeframe": self.timeframe,
+                "sessions": SESSIONS,
+                "saved_at": datetime.now(),
+                "ingestor": self.ingestor.state(),
+                "engine": self.engine.state(since),
+                "history": sorted(self._history_days | set(old_days)),
+                "signals": set(self.signals.seen),
+            }
+        try:
+            for day, bars in history.items():
+                _dump(bars, self.history_path(day))
+            _dump(state, self.checkpoint_path)
+        except OSError as e:
+            print(f"Không lưu được checkpoint: {e}")
+            with self._lock:
+                self.engine.touched.update(old_days)
+            return
+        self._history_days.update(old_days)
+        self._cycles_since_checkpoint = 0
+
+    def restore_checkpoint(self) -> bool:
+        """
+        Nạp checkpoint nếu có và khớp cấu hình (timeframe, phiên). Trả về True nếu đã khôi phục.
+        """
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return False
+        try:
+            with open(self.checkpoint_path, "rb") as f:
+                state = pickle.load(f)
+        except Exception as e:
+            print(f"Checkpoint lỗi, dựng lại từ đầu: {e}")
+            return False
+        if (state.get("version") != CHECKPOINT_VERSION or state.get("timeframe") != self.timeframe
+                or state.get("sessions") != SESSIONS):
+            print("Checkpoint khác cấu hình (timeframe/phiên), dựng lại từ đầu.")
+            return False
+
+        try:
+            history = []
+            for day in state["history"]:
+                with open(self.history_path(day), "rb") as f:
+                    history.append(pickle.load(f))
+        except Exception as e:
+            print(f"Thiếu nến ngày cũ của checkpoint, dựng lại từ đầu: {e}")
+            return False
+
+        with self._lock:
+            self.ingestor.load_state(state["ingestor"])
+            self.engine.load_state(state["engine"], pd.concat(history, ignore_index=True) if history else None)
+            self.signals.seen.update(state["signals"])
+            self._history_days = set(state["history"])
+        print(f"Khôi phục checkpoint lúc {state['saved_at']:%H:%M:%S}: "
+              f"{len(self.ingestor.manifest)} file, {len(self.engine.completed()) + len(self.engine.current)} nến")
+        return True
+
+    def on_snapshot(self, paths: list[str] | None = None, now: datetime | None = None) -> pd.DataFrame | None:
+        """
+        Xử lý snapshot mới. paths=None -> tự quét folder tìm file mới.
+        Trả về nến của phiên hiện tại (None nếu ngoài giờ giao dịch).
+        """
+        with self._lock, self.metrics.cycle() as m:
+            with m.stage("scan"):
+                if paths is None:
+                    found = self.ingestor.scan()
+                    self.ingestor.prune()
+                    m.count("files_scanned", self.ingestor.last_scanned)
+                else:
+                    found = self.ingestor.changed(paths)
+            with m.stage("parse"):
+                new_ticks = self.ingestor.ingest(found)
+            m.count("files_parsed", self.ingestor.last_parsed)
+            m.count("files_failed", self.ingestor.last_failed)
+            # tick đọc từ file đã qua ChangeFilter trong ingestor
+            return self._cycle(new_ticks, now)
+
+    def on_ticks(
+        self,
+        new_ticks: pd.DataFrame,
+        now: datetime | None = None,
+        source_path: str | None = None,
+        sources: list[tuple[str, pd.DataFrame]] | None = None,
+    ) -> pd.DataFrame | None:
+        """
+        Xử lý 1 lô tick (time, symbol, price) đã có sẵn trong bộ nhớ, vd. lấy thẳng từ trình duyệt.
+        source_path: file archive chứa đúng các tick này (để lần quét folder sau không đọc lại).
+        sources: lô gộp từ nhiều file (vd. nhiều bảng giá) -> [(file, tick của file đó), ...].
+        Tick đi qua ChangeFilter ở đây, giống hệt tick đọc từ file (có archive hay không).
+        """
+        with self._lock:
+            if source_path is not None:
+                self.ingestor.add(source_path, new_ticks)
+            for path, ticks in sources or []:
+                self.ingestor.add(path, ticks)
+            return self._cycle(self.ingestor.filter(new_ticks), now)
+
+    def _cycle(self, new_ticks: pd.DataFrame, now: datetime | None) -> pd.DataFrame | None:
+        """
+        1 chu kỳ cho lô tick đã lọc: cập nhật nến/detect/file, checkpoint theo nhịp.
+        """
+        with self._lock, self.metrics.cycle() as m:
+            res = self._update(new_ticks, now or datetime.now(), m)
+            self._cycles_since_checkpoint += 1
+            if CHECKPOINT_EVERY and self._cycles_since_checkpoint >= CHECKPOINT_EVERY:
+                with m.stage("checkpoint"):
+                    self.save_checkpoint()
+            return res
+
+    def _update(self, new_ticks: pd.DataFrame, now: datetime, m) -> pd.DataFrame | None:
+        """
+        Cộng tick vào nến, detect, ghi file phiên hiện tại (gọi trong lock + chu kỳ metrics).
+        """
+        m.count("ticks", len(new_ticks))
+        closed = []
+        with m.stage("bars"):
+            if not new_ticks.empty:
+                closed.append(self.engine.update(new_ticks)[0])
+            closed.append(self.engine.close_until(now))
+            closed = pd.concat([x for x in closed if not x.empty] or [closed[-1]], ignore_index=True)
+        m.count("bars_closed", len(closed))
+        # Nến vừa đóng luôn được detect (kể cả khi đóng lúc hết phiên)
+        with m.stage("detect"):
+            self.detect(closed)
+            if DETECT_PROVISIONAL:
+                # tín hiệu sớm của nến đang chạy: file riêng, ghi đè mỗi chu kỳ (không vào detect.csv)
+                self.writer.write(detect_lower_wick(self.engine.current, **detect_params()), self.provisional_path)
+        start_hhmm, end_hhmm = get_current_session(now)
+        if not start_hhmm:
             print("Không nằm trong phiên nào, chờ...")
-        time.sleep(60)  # Kiểm tra mỗi phút
+            return None
+        session_name = f"{start_hhmm}-{end_hhmm}"
+        out_path = os.path.join(self.folder, f"OHLC_{self.timeframe}_{session_name}.csv")
+        with m.stage("write"):
+            # Xuất dữ liệu phiên hiện tại (nến đã đóng + nến tạm tính): ghi file tạm rồi đổi tên
+            # trên thread nền, người đọc không bao giờ thấy file trống / ghi dở
+            sess_df = self.engine.bars(session_name)
+            self.writer.write(sess_df, out_path, encoding="utf-8-sig")
+        m.count("session_bars", len(sess_df))
+        print(f"Đã cập nhật file {out_path} ({len(sess_df)} dòng)")
+        return sess_df
+
+    def close(self):
+        """
+        Lưu checkpoint, ghi nốt các file đang chờ rồi dừng thread ghi.
+        """
+        self.save_checkpoint()
+        self.writer.close()
+
+    def detect(self, bars: pd.DataFrame) -> pd.DataFrame:
+        """
+        Detect nến rút chân trong bộ nhớ, append tín hiệu mới vào detect.csv. Trả về các tín hiệu mới.
+        """
+        new = self.signals.append(detect_lower_wick(bars, **detect_params()))
+        self.metrics.count("signals", len(new))
+        if len(new):
+            print(f"Tín hiệu nến rút chân mới: {len(new)} ({', '.join(new['symbol'].astype(str))})")
+        return new
+
+# ======================
+# Main
+# ======================
+if __name__ == "__main__":
+    import time
+    # Chạy riêng (process tiêu thụ): poll folder theo nhịp export.
+    # Nếu chạy main.py với PIPELINE_INLINE = True thì không cần chạy script này.
+    pipeline = LivePipeline(FOLDER, TIMEFRAME)
+    pipeline.start()
+
+    # Bước 3: auto update sessions
+    try:
+        while True:
+            pipeline.on_snapshot()
+            time.sleep(POLL_SECONDS)  # theo nhịp export của main.py
+    finally:
+        pipeline.close()
     # ...existing code...
@@ -0,0 +1,147 @@
+import json
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+
+# ======================
+# CONFIG
+# ======================
+CYCLE_BUDGET_SECONDS = 60   # 1 chu kỳ (ingest -> nến -> ghi file -> detect) phải xong trong khoảng này
+WINDOW = 500                # số chu kỳ gần nhất dùng cho percentile
+PERCENTILES = (50, 90, 99)
+SUMMARY_EVERY = 30          # in bảng percentile mỗi N chu kỳ (0 = không in)
+
+
+class Cycle:
+    """
+    Số đo của 1 chu kỳ: wall/CPU time từng khâu + bộ đếm (file, tick, nến, tín hiệu...).
+    """
+
+    def __init__(self):
+        self.started = datetime.now()
+        self._t0 = time.perf_counter()
+        self._c0 = time.process_time()
+        self.stages = {}    # tên khâu -> {"wall": s, "cpu": s}
+        self.counters = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        t0, c0 = time.perf_counter(), time.process_time()
+        try:
+            yield self
+        finally:
+            s = self.stages.setdefault(name, {"wall": 0.0, "cpu": 0.0})
+            s["wall"] += time.perf_counter() - t0
+            s["cpu"] += time.process_time() - c0
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + int(n)
+
+    def record(self, budget: float) -> dict:
+        wall = time.perf_counter() - self._t0
+        return {
+            "ts": self.started.isoformat(timespec="milliseconds"),
+            "wall": wall,
+            "cpu": time.process_time() - self._c0,
+            "overrun": wall > budget,
+            "stages": self.stages,
+            "counters": self.counters,
+        }
+
+
+class Metrics:
+    """
+    Đo từng chu kỳ của live loop: ghi mỗi chu kỳ 1 dòng JSON (path), giữ cửa sổ trượt để tính
+    percentile, cảnh báo khi 1 chu kỳ vượt ngân sách thời gian.
+    path có "{date}" -> mỗi ngày 1 file (YYYYMMDD); writer: AsyncWriter để ghi trên thread nền.
+
+        with metrics.cycle() as m:
+            with m.stage("ingest"):
+                ...
+            m.count("ticks", len(ticks))
+    """
+
+    def __init__(self, path: str | None = None, budget: float = CYCLE_BUDGET_SECONDS, window: int = WINDOW,
+                 writer=None):
+        self.path = path
+        self.writer = writer
+        self.budget = budget
+        self.window = window
+        self.history = {}   # "cycle" / tên khâu -> deque wall time
+        self.cycles = 0
+        self.overruns = 0
+        self._current = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def cycle(self):
+        """
+        Mở 1 chu kỳ. Gọi lồng nhau (vd. on_snapshot -> _cycle) thì dùng chung chu kỳ ngoài cùng.
+        """
+        if self._current is not None:
+            yield self._current
+            return
+
+        self._current = Cycle()
+        try:
+            yield self._current
+        finally:
+            cycle, self._current = self._current, None
+            self._finish(cycle.record(self.budget))
+
+    def count(self, name: str, n: int = 1):
+        """
+        Cộng bộ đếm vào chu kỳ đang mở (không có chu kỳ nào thì bỏ qua).
+        """
+        if self._current is not None:
+            self._current.count(name, n)
+
+    def _finish(self, rec: dict):
+        with self._lock:
+            self.cycles += 1
+            self._push("cycle", rec["wall"])
+            for name, s in rec["stages"].items():
+                self._push(name, s["wall"])
+            if rec["overrun"]:
+                self.overruns += 1
+
+        if self.path:
+            path = self.path.format(date=rec["ts"][:10].replace("-", ""))
+            line = json.dumps(rec, ensure_ascii=False) + "\n"
+            try:
+                if self.writer is not None:
+                    self.writer.append_lines([line], path)
+                else:
+                    with open(path, "a", encoding="utf-8") as f:
+                        f.write(line)
+            except (OSError, RuntimeError) as e:
+                print(f"Không ghi được metrics: {e}")
+
+        if rec["overrun"]:
+            slowest = max(rec["stages"].items(), key=lambda kv: kv[1]["wall"], default=(None, None))[0]
+            print(f"⚠️ Chu kỳ mất {rec['wall']:.1f}s, vượt ngân sách {self.budget:.0f}s (chậm nhất: {slowest})")
+        if SUMMARY_EVERY and self.cycles % SUMMARY_EVERY == 0:
+            print(self.summary())
+
+    def _push(self, name: str, value: float):
+        if name not in self.history:
+            self.history[name] = deque(maxlen=self.window)
+        self.history[name].append(value)
+
+    def percentiles(self, qs: tuple = PERCENTILES) -> dict[str, dict[str, float]]:
+        """
+        Percentile wall time (giây) của chu kỳ và từng khâu trên cửa sổ gần nhất.
+        """
+        with self._lock:
+            data = {k: np.fromiter(v, dtype="float64") for k, v in self.history.items()}
+        return {k: {f"p{q}": float(np.percentile(v, q)) for q in qs} for k, v in data.items() if len(v)}
+
+    def summary(self) -> str:
+        parts = [f"{name} " + "/".join(f"{v * 1000:.0f}" for v in p.values())
+                 for name, p in self.percentiles().items()]
+        qs = "/".join(f"p{q}" for q in PERCENTILES)
+        return f"⏱ {self.cycles} chu kỳ, {self.overruns} lần quá hạn | {qs} (ms): " + " | ".join(parts)
@@ -3,7 +3,18 @@ import re
 import glob
 from datetime import datetime, time as dtime
 
+import numpy as np
 import pandas as pd
+from pandas.api.types import union_categoricals
+
+from writer import atomic_write_csv
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+except ImportError:  # không có pyarrow -> đọc bằng pandas
+    pa = None
 
 # ======================
 # CONFIG
@@ -14,6 +25,11 @@ FOLDER = r"C:\Users\Admin\Desktop\trading_data"
 # gợi ý: "1min", "5min", "15min"
 TIMEFRAME = "60min"
 
+# Bộ khung nến dựng cùng lúc: dựng nến BASE_TIMEFRAME từ tick 1 lần rồi gộp lên các khung lớn hơn
+# (mỗi khung phải là bội số của BASE_TIMEFRAME)
+BASE_TIMEFRAME = "1min"
+TIMEFRAMES = ["5min", "15min", "60min"]
+
 # Excel column: A = 1 (index 0), K = 11 (index 10)
 COL_SYMBOL_IDX = 0
 COL_K_IDX = 10
@@ -27,6 +43,18 @@ SESSIONS = [
     ("1400", "1430"),
 ]
 
+# Bảng tick gọn: time datetime64[ns] (int64 epoch), symbol category (mã số + từ điển), price float32.
+# Giá iBoard có tối đa 2 chữ số thập phân -> nến được làm tròn lại về float64 khi dựng OHLC.
+TICK_COLUMNS = ["time", "symbol", "price"]
+PRICE_DTYPE = "float32"
+PRICE_DECIMALS = 2
+
+# Chỉ giữ tick khi giá của mã thay đổi (hoặc là tick đầu tiên của mã trong 1 nến BASE_TIMEFRAME)
+CHANGE_ONLY = True
+
+# Giá khớp hợp lệ ở cột K (ô trống, "Giá", "-"... bị bỏ)
+PRICE_PATTERN = r"^\s*[-+]?(\d+(\.\d*)?|\.\d+)([eE][-+]?\d+)?\s*$"
+
 # Tên file: 20260220_144417_....csv
 TS_PATTERN = re.compile(r"^(?P<ts>\d{8}_\d{6})_.*\.csv$", re.IGNORECASE)
 
@@ -43,36 +71,186 @@ def parse_ts_from_filename(path: str) -> datetime | None:
 
 def read_symbol_price_from_file(path: str) -> pd.DataFrame:
     """
-    Đọc 1 file CSV kiểu iBoard export, lấy:
-      - symbol: cột A
+    Đọc 1 file CSV kiểu iBoard export, chỉ parse 2 cột:
+      - symbol: cột A (category)
       - price : cột K (Khớp lệnh - Giá)
     """
-    df = pd.read_csv(path)
-
-    if df.shape[1] <= COL_K_IDX:
+    if pa is not None:
+        try:
+            return _read_symbol_price_arrow(path)
+        except (pa.ArrowInvalid, UnicodeDecodeError):
+            # số cột không đều / encoding lạ -> để pandas xử lý
+            pass
+    return _read_symbol_price_pandas(path)
+
+
+def _read_symbol_price_arrow(path: str) -> pd.DataFrame:
+    sym_col, price_col = f"f{COL_SYMBOL_IDX}", f"f{COL_K_IDX}"
+    t = pa_csv.read_csv(
+        path,
+        # bỏ dòng header, chỉ lấy 2 cột dạng chuỗi rồi tự lọc/ép kiểu trong Arrow
+        read_options=pa_csv.ReadOptions(autogenerate_column_names=True, skip_rows=1, use_threads=False),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=[sym_col, price_col],
+            include_missing_columns=True,
+            column_types={sym_col: pa.string(), price_col: pa.string()},
+        ),
+    )
+
+    sym = pc.utf8_trim_whitespace(t[sym_col])
+    price = t[price_col]
+    keep = pc.and_(
+        pc.and_(pc.not_equal(sym, ""), pc.not_equal(pc.utf8_upper(sym), "CK")),
+        pc.match_substring_regex(price, PRICE_PATTERN),
+    )
+    keep = pc.fill_null(keep, False)
+
+    sym = pc.filter(sym, keep).combine_chunks().dictionary_encode()
+    price = pc.cast(pc.utf8_trim_whitespace(pc.filter(price, keep)), pa.float64())
+    return pd.DataFrame({"symbol": sym.to_pandas(), "price": price.to_numpy()})
+
+
+def _read_symbol_price_pandas(path: str) -> pd.DataFrame:
+    try:
+        x = pd.read_csv(path, usecols=[COL_SYMBOL_IDX, COL_K_IDX], dtype=str, na_filter=False)
+    except ValueError:
+        # file ít hơn 11 cột
         return pd.DataFrame(columns=["symbol", "price"])
-
-    x = df.iloc[:, [COL_SYMBOL_IDX, COL_K_IDX]].copy()
     x.columns = ["symbol", "price"]
 
-    x["symbol"] = x["symbol"].astype(str).str.strip()
-    x = x[(x["symbol"] != "") & (x["symbol"].str.upper() != "CK")]
+    sym = x["symbol"].str.strip()
+    x = x.assign(symbol=sym)[(sym != "") & (sym.str.upper() != "CK")]
 
-    x["price"] = pd.to_numeric(x["price"], errors="coerce")
-    x = x.dropna(subset=["price"])
+    # cùng điều kiện với bản Arrow: chỉ nhận số thập phân ("inf", "nan", "1,025"... bị bỏ)
+    price = x["price"].str.strip()
+    x = x.assign(price=price)[price.str.match(PRICE_PATTERN)]
+    x["price"] = pd.to_numeric(x["price"])
+    x["symbol"] = x["symbol"].astype("category")
+    return x.reset_index(drop=True)
 
-    return x
+
+def make_ticks(sp: pd.DataFrame, ts: datetime | None = None) -> pd.DataFrame:
+    """
+    (symbol, price) của 1 snapshot + timestamp -> bảng tick gọn ngay lúc ingest.
+    ts=None -> lấy cột time có sẵn trong `sp`.
+    """
+    sym = sp["symbol"]
+    if not isinstance(sym.dtype, pd.CategoricalDtype):
+        sym = sym.astype(str).astype("category")
+    if ts is None:
+        time = pd.to_datetime(sp["time"]).to_numpy(dtype="datetime64[ns]")
+    else:
+        time = np.full(len(sp), np.datetime64(pd.Timestamp(ts), "ns"))
+    return pd.DataFrame({
+        "time": time,
+        "symbol": sym.array,
+        "price": sp["price"].to_numpy(dtype=PRICE_DTYPE),
+    })
+
+
+def empty_ticks() -> pd.DataFrame:
+    return pd.DataFrame({
+        "time": np.array([], dtype="datetime64[ns]"),
+        "symbol": pd.Categorical([]),
+        "price": np.array([], dtype=PRICE_DTYPE),
+    })
+
+
+def concat_ticks(frames: list[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Nối nhiều bảng tick mà vẫn giữ symbol dạng category (gộp từ điển mã, sắp theo chữ cái);
+    pd.concat thường sẽ đổi về object khi các file có tập mã khác nhau.
+    """
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return empty_ticks()
+    if len(frames) == 1:
+        return frames[0].reset_index(drop=True)
+
+    sym = union_categoricals([pd.Categorical(f["symbol"]) for f in frames], sort_categories=True)
+    return pd.DataFrame({
+        "time": np.concatenate([f["time"].to_numpy(dtype="datetime64[ns]") for f in frames]),
+        "symbol": sym,
+        "price": np.concatenate([f["price"].to_numpy(dtype=PRICE_DTYPE) for f in frames]),
+    })
+
+
+class ChangeFilter:
+    """
+    Bỏ các dòng mà giá của mã không đổi so với tick trước đó (mỗi snapshot 10s lặp lại cả bảng).
+
+    Vẫn giữ tick đầu tiên của mỗi mã trong từng nến `base` làm mốc mở nến, nên nến mọi khung
+    là bội số của `base` (và mọi phiên, vì phiên cắt ở phút tròn) giống hệt khi giữ toàn bộ tick:
+    dòng bị bỏ luôn trùng giá với 1 dòng được giữ ngay trước nó trong cùng nến.
+    Giả định tick đến theo thứ tự thời gian (giống BarEngine).
+    """
+
+    def __init__(self, base: str = BASE_TIMEFRAME):
+        self.step = pd.Timedelta(base).value
+        self.last_price = {}   # mã -> giá cuối
+        self.last_bucket = {}  # mã -> mốc nến base của tick cuối
+        self.seen = 0
+        self.kept = 0
+
+    def apply(self, ticks: pd.DataFrame) -> pd.DataFrame:
+        if ticks.empty:
+            return ticks
+
+        # sắp theo (mã, thời gian) để so mỗi tick với tick liền trước của cùng mã
+        times = ticks["time"].to_numpy(dtype="datetime64[ns]")
+        order = np.lexsort([times, pd.factorize(ticks["symbol"])[0]])
+        sym = ticks["symbol"].astype(str).to_numpy()[order]
+        price = ticks["price"].to_numpy()[order]
+        bucket = times[order].astype("int64") // self.step
+
+        # tick trước đó của cùng mã: trong lô này, hoặc từ trạng thái các lô trước
+        first = np.r_[True, sym[1:] != sym[:-1]]
+        prev_price = np.r_[np.nan, price[:-1]].astype("float64")
+        prev_bucket = np.r_[-1, bucket[:-1]]
+        if first.any():
+            prev_price[first] = [self.last_price.get(s, np.nan) for s in sym[first]]
+            prev_bucket[first] = [self.last_bucket.get(s, -1) for s in sym[first]]
+
+        keep = (price != prev_price) | (bucket != prev_bucket)
+
+        last = np.r_[sym[1:] != sym[:-1], True]
+        self.last_price.update(zip(sym[last], price[last].tolist()))
+        self.last_bucket.update(zip(sym[last], bucket[last].tolist()))
+        self.seen += len(ticks)
+        self.kept += int(keep.sum())
+
+        # trả về theo thứ tự dòng ban đầu
+        return ticks.iloc[np.sort(order[keep])].reset_index(drop=True)
+
+
+def use_change_filter(timeframes: str | list[str], change_only: bool = CHANGE_ONLY, base: str = BASE_TIMEFRAME) -> bool:
+    """
+    ChangeFilter chỉ giữ nguyên nến khi mọi khung là bội số của `base`; có khung lẻ (vd. "30s") -> tắt lọc.
+    """
+    if not change_only:
+        return False
+    if isinstance(timeframes, str):
+        timeframes = [timeframes]
+    bad = [tf for tf in timeframes if pd.Timedelta(tf) % pd.Timedelta(base) != pd.Timedelta(0)]
+    if bad:
+        print(f"⚠️ Khung {', '.join(bad)} không phải bội số của {base} -> tắt CHANGE_ONLY (giữ toàn bộ tick).")
+        return False
+    return True
 
 
 def hhmm_to_time(hhmm: str) -> dtime:
     return dtime(int(hhmm[:2]), int(hhmm[2:]))
 
 
-def build_ticks_from_folder(folder: str) -> pd.DataFrame:
+def build_ticks_from_folder(folder: str, change_only: bool = CHANGE_ONLY, timeframes: str | list[str] = TIMEFRAME) -> pd.DataFrame:
     """
     Gom toàn bộ tick: time + symbol + price (cột K)
+    change_only: chỉ giữ tick đổi giá (ChangeFilter), nến các khung `timeframes` dựng ra không đổi
+    (tự tắt nếu có khung không phải bội số của BASE_TIMEFRAME, xem use_change_filter()).
     """
-    files = glob.glob(os.path.join(folder, "*.csv"))
+    # theo thứ tự timestamp trong tên file (ChangeFilter cần đúng thứ tự thời gian)
+    files = sorted(glob.glob(os.path.join(folder, "*.csv")), key=os.path.basename)
+    change = ChangeFilter() if use_change_filter(timeframes, change_only) else None
 
     rows = []
     for f in files:
@@ -88,20 +266,76 @@ def build_ticks_from_folder(folder: str) -> pd.DataFrame:
         if sp.empty:
             continue
 
-        sp["time"] = ts
-        rows.append(sp)
+        ticks = make_ticks(sp, ts)
+        if change is not None:
+            ticks = change.apply(ticks)
+        rows.append(ticks)
 
     if not rows:
-        return pd.DataFrame(columns=["time", "symbol", "price"])
+        return empty_ticks()
 
-    data = pd.concat(rows, ignore_index=True)
+    data = concat_ticks(rows)
     data = data.sort_values(["symbol", "time"])
     return data
 
 
+def bucket_start(times: pd.Series, timeframe: str) -> pd.Series:
+    """
+    Mốc mở nến cho từng timestamp, neo từ 00:00 của ngày đầu tiên
+    (giống resample(timeframe) mặc định).
+    """
+    step = pd.Timedelta(timeframe)
+    origin = times.min().normalize()
+    return origin + ((times - origin) // step) * step
+
+
+def build_bars(ticks: pd.DataFrame, timeframe: str, by: list[str] | None = None) -> pd.DataFrame:
+    """
+    Dựng nến OHLC cho tất cả mã trong 1 lượt: gom theo (by..., mã, mốc nến) rồi lấy first/max/min/last.
+    Trả về các cột by..., time, symbol, open, high, low, close.
+    """
+    by = list(by or [])
+    if ticks.empty:
+        return pd.DataFrame(columns=by + ["time", "symbol", "open", "high", "low", "close"])
+
+    # first/last phụ thuộc thứ tự -> sắp theo thời gian (stable để giữ thứ tự file)
+    x = ticks.sort_values("time", kind="stable")
+    bucket = bucket_start(x["time"], timeframe)
+
+    keys = [x[c] for c in by] + [x["symbol"], bucket]
+    bars = (x.groupby(keys, observed=True, sort=False)["price"]
+             .agg(["first", "max", "min", "last"])
+             .dropna())
+    bars.columns = ["open", "high", "low", "close"]
+    if bars["open"].dtype == np.float32:
+        # tick float32 -> nến float64 đúng giá niêm yết (vd. 23.45, không phải 23.450000762...)
+        bars = bars.astype("float64").round(PRICE_DECIMALS)
+    bars = bars.reset_index()
+    bars["symbol"] = bars["symbol"].astype(str)
+    return bars[by + ["time", "symbol", "open", "high", "low", "close"]]
+
+
+def session_labels(times: pd.Series, sessions: list[tuple[str, str]] = SESSIONS) -> pd.Categorical:
+    """
+    Gán tên phiên ("0900-1000", ...) cho từng tick trong 1 lượt (searchsorted trên giờ trong ngày).
+    Tick nằm ngoài mọi phiên -> NaN.
+    """
+    sessions = sorted(sessions)
+    names = [f"{s}-{e}" for s, e in sessions]
+    one_min = pd.Timedelta("1min").value
+    starts = np.array([(int(s[:2]) * 60 + int(s[2:])) * one_min for s, _ in sessions], dtype="int64")
+    ends = np.array([(int(e[:2]) * 60 + int(e[2:])) * one_min for _, e in sessions], dtype="int64")
+
+    tod = (times - times.dt.normalize()).to_numpy().astype("timedelta64[ns]").astype("int64")
+    idx = np.searchsorted(starts, tod, side="right") - 1
+    inside = (idx >= 0) & (tod < ends[idx.clip(0)])
+    codes = np.where(inside, idx, -1)
+    return pd.Categorical.from_codes(codes, categories=names)
+
+
 def ohlc_for_session(data: pd.DataFrame, start_hhmm: str, end_hhmm: str, timeframe: str) -> pd.DataFrame:
     """
-    Lọc dữ liệu theo khoảng giờ trong ngày, rồi resample OHLC theo timeframe cho từng mã.
+    Lọc dữ liệu theo khoảng giờ trong ngày, rồi dựng nến OHLC theo timeframe cho mọi mã cùng lúc.
     """
     if data.empty:
         return pd.DataFrame(columns=["date", "session", "time", "symbol", "open", "high", "low", "close"])
@@ -110,62 +344,149 @@ def ohlc_for_session(data: pd.DataFrame, start_hhmm: str, end_hhmm: str, timefra
     end_t = hhmm_to_time(end_hhmm)
 
     # Lọc theo time-of-day
-    mask = (data["time"].dt.time >= start_t) & (data["time"].dt.time < end_t)
-    sub = data.loc[mask].copy()
+    tod = data["time"].dt.time
+    sub = data.loc[(tod >= start_t) & (tod < end_t)]
     if sub.empty:
         return pd.DataFrame(columns=["date", "session", "time", "symbol", "open", "high", "low", "close"])
 
-    session_name = f"{start_hhmm}-{end_hhmm}"
-    out = []
-
-    for sym, g in sub.groupby("symbol"):
-        s = g.set_index("time")["price"].sort_index()
-        ohlc = s.resample(timeframe).ohlc().dropna()
-        ohlc["symbol"] = sym
-        out.append(ohlc.reset_index())
-
-    if not out:
+    res = build_bars(sub, timeframe)
+    if res.empty:
         return pd.DataFrame(columns=["date", "session", "time", "symbol", "open", "high", "low", "close"])
 
-    res = pd.concat(out, ignore_index=True)
     res["date"] = res["time"].dt.strftime("%Y%m%d")
-    res["session"] = session_name
+    res["session"] = f"{start_hhmm}-{end_hhmm}"
     res = res[["date", "session", "time", "symbol", "open", "high", "low", "close"]]
     return res.sort_values(["date", "session", "time", "symbol"])
 
 
-def export_sessions(folder: str, timeframe: str):
-    data = build_ticks_from_folder(folder)
+def ohlc_all_sessions(data: pd.DataFrame, timeframe: str, sessions: list[tuple[str, str]] = SESSIONS) -> pd.DataFrame:
+    """
+    Dựng nến cho tất cả các phiên trong 1 lượt: gán nhãn phiên cho tick rồi gom theo (phiên, mã, mốc nến).
+    """
+    cols = ["date", "session", "time", "symbol", "open", "high", "low", "close"]
     if data.empty:
-        print("Không có dữ liệu tick hợp lệ từ các file trong folder (kiểm tra tên file/timestamp & cột K).")
-        return
+        return pd.DataFrame(columns=cols)
+
+    labels = session_labels(data["time"], sessions)
+    sub = data.assign(session=labels).loc[~pd.isna(labels)]
+    if sub.empty:
+        return pd.DataFrame(columns=cols)
+
+    res = build_bars(sub, timeframe, by=["session"])
+    res["session"] = res["session"].astype(str)
+    res["date"] = res["time"].dt.strftime("%Y%m%d")
+    return res[cols].sort_values(["date", "session", "time", "symbol"])
+
+
+def rollup_bars(bars: pd.DataFrame, timeframe: str) -> pd.DataFrame:
+    """
+    Gộp nến nhỏ (kết quả ohlc_all_sessions) lên khung lớn hơn trong từng phiên:
+    open đầu, high max, low min, close cuối. Khung mới phải là bội số của khung cũ
+    thì kết quả mới trùng với dựng thẳng từ tick.
+    """
+    cols = ["date", "session", "time", "symbol", "open", "high", "low", "close"]
+    if bars.empty:
+        return pd.DataFrame(columns=cols)
+
+    x = bars.sort_values("time", kind="stable")
+    bucket = bucket_start(x["time"], timeframe)
+    res = (x.groupby([x["session"], x["symbol"], bucket], sort=False)
+            .agg(open=("open", "first"), high=("high", "max"), low=("low", "min"), close=("close", "last"))
+            .reset_index())
+    res["date"] = res["time"].dt.strftime("%Y%m%d")
+    return res[cols].sort_values(["date", "session", "time", "symbol"])
 
-    # đảm bảo time là datetime
-    data["time"] = pd.to_datetime(data["time"], errors="coerce")
-    data = data.dropna(subset=["time"])
+
+def build_bar_pyramid(
+    data: pd.DataFrame,
+    base: str = BASE_TIMEFRAME,
+    timeframes: list[str] = TIMEFRAMES,
+    sessions: list[tuple[str, str]] = SESSIONS,
+) -> dict[str, pd.DataFrame]:
+    """
+    Dựng nến nhiều khung với 1 lượt qua tick: tick -> nến `base` -> gộp lên từng khung.
+    Mỗi khung được gộp từ khung lớn nhất đã có mà nó chia hết (vd. 60min từ 15min).
+    Trả về {timeframe: bảng nến}, gồm cả `base`.
+    """
+    base_td = pd.Timedelta(base)
+    for tf in timeframes:
+        if pd.Timedelta(tf) % base_td != pd.Timedelta(0):
+            raise ValueError(f"Khung {tf} không phải bội số của khung gốc {base}")
+
+    pyramid = {base: ohlc_all_sessions(data, base, sessions)}
+    for tf in sorted(set(timeframes) - {base}, key=pd.Timedelta):
+        td = pd.Timedelta(tf)
+        src = max((k for k in pyramid if td % pd.Timedelta(k) == pd.Timedelta(0)), key=pd.Timedelta)
+        pyramid[tf] = rollup_bars(pyramid[src], tf)
+    return pyramid
+
+
+def write_session_outputs(bars: pd.DataFrame, folder: str, timeframe: str, sessions: list[tuple[str, str]] = SESSIONS):
+    """
+    Ghi OHLC_{timeframe}_{phiên}.csv cho từng phiên và OHLC_ALL_SESSIONS_{timeframe}.csv từ cùng 1 bảng nến.
+    """
+    by_session = dict(tuple(bars.groupby("session", sort=False))) if not bars.empty else {}
 
     # Export mỗi session ra 1 file CSV (gọn, dễ dùng)
-    for start_hhmm, end_hhmm in SESSIONS:
-        sess_df = ohlc_for_session(data, start_hhmm, end_hhmm, timeframe)
-        if sess_df.empty:
+    for start_hhmm, end_hhmm in sessions:
+        sess_df = by_session.get(f"{start_hhmm}-{end_hhmm}")
+        if sess_df is None or sess_df.empty:
             print(f"Session {start_hhmm}-{end_hhmm}: không có dữ liệu.")
             continue
 
         # Nếu bạn muốn tách theo ngày, phần date trong file name sẽ tự gồm các ngày có dữ liệu.
         out_path = os.path.join(folder, f"OHLC_{timeframe}_{start_hhmm}-{end_hhmm}.csv")
-        sess_df.to_csv(out_path, index=False, encoding="utf-8-sig")
+        atomic_write_csv(sess_df, out_path, encoding="utf-8-sig")
         print(f"OK: {start_hhmm}-{end_hhmm} -> {out_path} ({len(sess_df)} dòng)")
 
     # (Tuỳ chọn) xuất 1 file tổng hợp tất cả session
-    all_out = []
-    for start_hhmm, end_hhmm in SESSIONS:
-        all_out.append(ohlc_for_session(data, start_hhmm, end_hhmm, timeframe))
-    all_out = [x for x in all_out if not x.empty]
-    if all_out:
-        merged = pd.concat(all_out, ignore_index=True).sort_values(["date", "session", "time", "symbol"])
+    if not bars.empty:
         merged_path = os.path.join(folder, f"OHLC_ALL_SESSIONS_{timeframe}.csv")
-        merged.to_csv(merged_path, index=False, encoding="utf-8-sig")
-        print(f"OK: Tổng hợp -> {merged_path} ({len(merged)} dòng)")
+        atomic_write_csv(bars, merged_path, encoding="utf-8-sig")
+        print(f"OK: Tổng hợp -> {merged_path} ({len(bars)} dòng)")
+
+
+def export_sessions(folder: str, timeframe: str, data: pd.DataFrame | None = None) -> pd.DataFrame:
+    """
+    Dựng nến mọi phiên 1 lần rồi ghi các file OHLC; trả về bảng nến để dùng tiếp trong bộ nhớ.
+    """
+    if data is None:
+        data = build_ticks_from_folder(folder, timeframes=timeframe)
+    if data.empty:
+        print("Không có dữ liệu tick hợp lệ từ các file trong folder (kiểm tra tên file/timestamp & cột K).")
+        return pd.DataFrame(columns=["date", "session", "time", "symbol", "open", "high", "low", "close"])
+
+    # đảm bảo time là datetime
+    data["time"] = pd.to_datetime(data["time"], errors="coerce")
+    data = data.dropna(subset=["time"])
+
+    bars = ohlc_all_sessions(data, timeframe)
+    write_session_outputs(bars, folder, timeframe)
+    return bars
+
+
+def export_pyramid(
+    folder: str,
+    timeframes: list[str] = TIMEFRAMES,
+    base: str = BASE_TIMEFRAME,
+    data: pd.DataFrame | None = None,
+) -> dict[str, pd.DataFrame]:
+    """
+    Như export_sessions() nhưng cho nhiều khung cùng lúc (chỉ đọc/gom tick 1 lần).
+    """
+    if data is None:
+        data = build_ticks_from_folder(folder, timeframes=[base, *timeframes])
+    if data.empty:
+        print("Không có dữ liệu tick hợp lệ từ các file trong folder (kiểm tra tên file/timestamp & cột K).")
+        return {}
+
+    data["time"] = pd.to_datetime(data["time"], errors="coerce")
+    data = data.dropna(subset=["time"])
+
+    pyramid = build_bar_pyramid(data, base, timeframes)
+    for tf in timeframes:
+        write_session_outputs(pyramid[tf], folder, tf)
+    return pyramid
 
 
 if __name__ == "__main__":
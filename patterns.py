@@ -0,0 +1,249 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from detect import MIN_CLOSE_POSITION, MIN_LOWER_WICK_MULT_BODY, MIN_LOWER_WICK_PCT_RANGE, REQUIRE_BULLISH_CLOSE
+
+EPS = 1e-9
+
+# tên mẫu -> (hàm predicate, tham số mặc định)
+PATTERNS = {}
+
+
+def register_pattern(name: str, **defaults):
+    """
+    Đăng ký 1 mẫu nến. Hàm nhận dict feature (mảng NumPy) + tham số, trả về mảng bool.
+    """
+    def deco(fn):
+        PATTERNS[name] = (fn, defaults)
+        return fn
+    return deco
+
+
+# ======================
+# Features
+# ======================
+def _shift(x: np.ndarray, k: int, valid: np.ndarray) -> np.ndarray:
+    out = np.full_like(x, np.nan)
+    out[k:] = x[:-k]
+    out[~valid] = np.nan
+    return out
+
+
+def compute_features(o, h, l, c, group=None) -> dict[str, np.ndarray]:
+    """
+    Tính 1 lần các đại lượng dùng chung cho mọi mẫu. Dữ liệu phải sắp theo (group, thời gian);
+    giá trị nến trước (prev_*, prev2_*) không lấy chéo giữa các group (mã).
+    """
+    o = np.asarray(o, dtype="float64")
+    h = np.asarray(h, dtype="float64")
+    l = np.asarray(l, dtype="float64")
+    c = np.asarray(c, dtype="float64")
+    n = len(c)
+
+    top = np.maximum(o, c)
+    bottom = np.minimum(o, c)
+    candle_range = np.clip(h - l, 0, None)
+    body = np.abs(c - o)
+    upper_wick = np.clip(h - top, 0, None)
+    lower_wick = np.clip(bottom - l, 0, None)
+
+    f = {
+        "open": o, "high": h, "low": l, "close": c,
+        "top": top, "bottom": bottom,
+        "range": candle_range, "body": body,
+        "upper_wick": upper_wick, "lower_wick": lower_wick,
+        "body_pct_range": body / (candle_range + EPS),
+        "upper_wick_pct_range": upper_wick / (candle_range + EPS),
+        "lower_wick_pct_range": lower_wick / (candle_range + EPS),
+        "upper_wick_mult_body": upper_wick / (body + EPS),
+        "lower_wick_mult_body": lower_wick / (body + EPS),
+        "close_position": (c - l) / (candle_range + EPS),
+    }
+
+    # nến trước / trước nữa cùng group
+    if group is None:
+        same1 = np.r_[False, np.ones(max(n - 1, 0), dtype=bool)]
+    else:
+        g = np.asarray(group)
+        same1 = np.r_[False, g[1:] == g[:-1]]
+    same2 = same1 & np.r_[False, same1[:-1]] if n else same1
+
+    for k, valid, prefix in [(1, same1, "prev_"), (2, same2, "prev2_")]:
+        if n <= k:
+            for name in ["open", "high", "low", "close", "top", "bottom", "body", "range"]:
+                f[prefix + name] = np.full(n, np.nan)
+            continue
+        for name in ["open", "high", "low", "close", "top", "bottom", "body", "range"]:
+            f[prefix + name] = _shift(f[name], k, valid)
+
+    return f
+
+
+# ======================
+# Patterns
+# ======================
+# ngưỡng mặc định dùng chung với detect.py (detect.csv của live pipeline)
+@register_pattern(
+    "lower_wick",
+    min_lower_wick_pct_range=MIN_LOWER_WICK_PCT_RANGE,
+    min_lower_wick_mult_body=MIN_LOWER_WICK_MULT_BODY,
+    min_close_position=MIN_CLOSE_POSITION,
+    require_bullish_close=REQUIRE_BULLISH_CLOSE,
+)
+def lower_wick(f, min_lower_wick_pct_range, min_lower_wick_mult_body, min_close_position, require_bullish_close):
+    """Nến rút chân (hammer): wick dưới dài, close ở phần trên."""
+    sig = ((f["lower_wick_pct_range"] >= min_lower_wick_pct_range)
+           & (f["lower_wick_mult_body"] >= min_lower_wick_mult_body)
+           & (f["close_position"] >= min_close_position))
+    if require_bullish_close:
+        sig &= f["close"] >= f["open"]
+    return sig
+
+
+@register_pattern(
+    "upper_wick",
+    min_upper_wick_pct_range=0.45,
+    min_upper_wick_mult_body=2.0,
+    max_close_position=0.30,
+    require_bearish_close=False,
+)
+def upper_wick(f, min_upper_wick_pct_range, min_upper_wick_mult_body, max_close_position, require_bearish_close):
+    """Nến râu trên (shooting star): wick trên dài, close ở phần dưới."""
+    sig = ((f["upper_wick_pct_range"] >= min_upper_wick_pct_range)
+           & (f["upper_wick_mult_body"] >= min_upper_wick_mult_body)
+           & (f["close_position"] <= max_close_position))
+    if require_bearish_close:
+        sig &= f["close"] <= f["open"]
+    return sig
+
+
+@register_pattern("doji", max_body_pct_range=0.1)
+def doji(f, max_body_pct_range):
+    """Thân rất nhỏ so với biên độ."""
+    return (f["range"] > 0) & (f["body_pct_range"] <= max_body_pct_range)
+
+
+@register_pattern("bullish_engulfing", min_body_mult_prev=1.0)
+def bullish_engulfing(f, min_body_mult_prev):
+    """Nến tăng bao trọn thân nến giảm trước đó."""
+    return ((f["prev_close"] < f["prev_open"])
+            & (f["close"] > f["open"])
+            & (f["bottom"] <= f["prev_bottom"])
+            & (f["top"] >= f["prev_top"])
+            & (f["body"] >= min_body_mult_prev * f["prev_body"]))
+
+
+@register_pattern("bearish_engulfing", min_body_mult_prev=1.0)
+def bearish_engulfing(f, min_body_mult_prev):
+    """Nến giảm bao trọn thân nến tăng trước đó."""
+    return ((f["prev_close"] > f["prev_open"])
+            & (f["close"] < f["open"])
+            & (f["bottom"] <= f["prev_bottom"])
+            & (f["top"] >= f["prev_top"])
+            & (f["body"] >= min_body_mult_prev * f["prev_body"]))
+
+
+@register_pattern("inside_bar")
+def inside_bar(f):
+    """High/low nằm trong high/low của nến trước."""
+    return (f["high"] <= f["prev_high"]) & (f["low"] >= f["prev_low"])
+
+
+@register_pattern("morning_star", max_middle_body_pct=0.3, min_recovery=0.5)
+def morning_star(f, max_middle_body_pct, min_recovery):
+    """3 nến: giảm mạnh, thân nhỏ, tăng lấy lại >= min_recovery thân nến đầu."""
+    first_mid = f["prev2_close"] + min_recovery * (f["prev2_open"] - f["prev2_close"])
+    return ((f["prev2_close"] < f["prev2_open"])
+            & (f["prev_body"] <= max_middle_body_pct * f["prev2_body"])
+            & (f["close"] > f["open"])
+            & (f["close"] >= first_mid))
+
+
+@register_pattern("evening_star", max_middle_body_pct=0.3, min_recovery=0.5)
+def evening_star(f, max_middle_body_pct, min_recovery):
+    """3 nến: tăng mạnh, thân nhỏ, giảm lấy lại >= min_recovery thân nến đầu."""
+    first_mid = f["prev2_close"] - min_recovery * (f["prev2_close"] - f["prev2_open"])
+    return ((f["prev2_close"] > f["prev2_open"])
+            & (f["prev_body"] <= max_middle_body_pct * f["prev2_body"])
+            & (f["close"] < f["open"])
+            & (f["close"] <= first_mid))
+
+
+# ======================
+# Engine
+# ======================
+def default_specs() -> list[tuple[str, str, dict]]:
+    """
+    Mỗi mẫu đã đăng ký với tham số mặc định: [(nhãn, tên mẫu, tham số), ...].
+    """
+    return [(name, name, {}) for name in PATTERNS]
+
+
+def expand_specs(pattern: str, **param_lists) -> list[tuple[str, str, dict]]:
+    """
+    Sinh nhiều bộ tham số cho 1 mẫu, vd. expand_specs("doji", max_body_pct_range=[0.05, 0.1]).
+    """
+    keys = list(param_lists)
+    specs = []
+    for values in itertools.product(*(param_lists[k] for k in keys)):
+        params = dict(zip(keys, values))
+        label = pattern + "".join(f"|{k}={v}" for k, v in params.items())
+        specs.append((label, pattern, params))
+    return specs
+
+
+def pattern_matrix(features: dict[str, np.ndarray], specs: list[tuple[str, str, dict]] | None = None) -> tuple[np.ndarray, list[str]]:
+    """
+    Chạy mọi mẫu trên cùng bộ feature. Trả về ma trận bool [số nến, số mẫu] và nhãn cột.
+    """
+    specs = specs or default_specs()
+    n = len(features["close"])
+    out = np.zeros((n, len(specs)), dtype=bool)
+    for j, (_, name, params) in enumerate(specs):
+        fn, defaults = PATTERNS[name]
+        out[:, j] = fn(features, **{**defaults, **params})
+    return out, [label for label, _, _ in specs]
+
+
+def pack_bits(matrix: np.ndarray) -> np.ndarray:
+    """
+    Nén ma trận bool (tối đa 64 mẫu) thành 1 số uint64 mỗi nến: bit j = mẫu thứ j.
+    """
+    if matrix.shape[1] > 64:
+        raise ValueError("pack_bits hỗ trợ tối đa 64 mẫu, dùng trực tiếp pattern_matrix()")
+    weights = np.left_shift(np.uint64(1), np.arange(matrix.shape[1], dtype=np.uint64))
+    return (matrix.astype(np.uint64) * weights).sum(axis=1, dtype=np.uint64)
+
+
+def unpack_bits(mask: int, labels: list[str]) -> list[str]:
+    return [label for j, label in enumerate(labels) if int(mask) >> j & 1]
+
+
+def detect_patterns(bars: pd.DataFrame, specs: list[tuple[str, str, dict]] | None = None) -> tuple[np.ndarray, list[str]]:
+    """
+    Quét nhiều mẫu trên bảng nến OHLC (date, session, time, symbol, open, high, low, close)
+    trong 1 lượt. Trả về (ma trận bool theo đúng thứ tự dòng của `bars`, nhãn mẫu).
+    """
+    if bars.empty:
+        labels = [label for label, _, _ in (specs or default_specs())]
+        return np.zeros((0, len(labels)), dtype=bool), labels
+
+    # nến trước phải cùng mã -> tính trên thứ tự (symbol, time) rồi trả về thứ tự gốc
+    if "symbol" in bars.columns:
+        sym = bars["symbol"].astype(str).to_numpy()
+        keys = [pd.to_datetime(bars["time"]).to_numpy()] if "time" in bars.columns else []
+        order = np.lexsort(keys + [sym])
+        group = sym[order]
+    else:
+        order = np.arange(len(bars))
+        group = None
+
+    cols = {c: pd.to_numeric(bars[c], errors="coerce").to_numpy()[order] for c in ["open", "high", "low", "close"]}
+    f = compute_features(cols["open"], cols["high"], cols["low"], cols["close"], group)
+    mat_sorted, labels = pattern_matrix(f, specs)
+
+    mat = np.empty_like(mat_sorted)
+    mat[order] = mat_sorted
+    return mat, labels
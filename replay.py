@@ -0,0 +1,171 @@
+import os
+import io
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import contextlib
+
+import numpy as np
+
+import merged_ohlc_detect as live
+from backfill import list_snapshots
+from ohlc import FOLDER, parse_ts_from_filename
+
+# ======================
+# CONFIG
+# ======================
+SPEED = 60              # đồng hồ giả lập chạy nhanh gấp N lần thời gian thật (0 = nhanh nhất có thể)
+MAX_IDLE_SECONDS = 60   # khoảng trống dài (nghỉ trưa, qua đêm) chỉ tính tối đa bấy nhiêu giây giả lập
+
+
+def replay(
+    source: str,
+    work_dir: str | None = None,
+    speed: float = SPEED,
+    timeframe: str = live.TIMEFRAME,
+    poll_seconds: float | None = None,
+    limit: int | None = None,
+    start_date: str | None = None,
+    end_date: str | None = None,
+    verbose: bool = False,
+    clear: bool = False,
+) -> dict:
+    """
+    Phát lại folder snapshot qua đúng LivePipeline (ingest -> nến phiên -> detect -> ghi file),
+    với đồng hồ giả lập chạy nhanh `speed` lần.
+
+    poll_seconds=None: mỗi snapshot 1 chu kỳ (như main.py chạy inline);
+    có giá trị: gom snapshot theo nhịp poll như vòng lặp của merged_ohlc_detect.py.
+    Chu kỳ nào xử lý lâu hơn khoảng thời gian thật tới chu kỳ sau -> quá hạn (pipeline không theo kịp).
+    work_dir đã có file (detect.csv, file phiên... của lần phát lại trước) -> lỗi, trừ khi clear=True (xoá sạch trước).
+    """
+    paths = list_snapshots(source, start_date, end_date)[:limit]
+    if not paths:
+        print("Không có snapshot nào để phát lại.")
+        return {}
+    times = [parse_ts_from_filename(p) for p in paths]
+
+    # mỗi chu kỳ: (giờ giả lập, các file đã "tới" tính đến lúc đó)
+    batches = []
+    if poll_seconds:
+        step = np.timedelta64(int(poll_seconds * 1e9), "ns")
+        ts = np.array(times, dtype="datetime64[ns]")
+        tick = (ts - ts[0]) // step
+        for k in np.unique(tick):
+            idx = np.flatnonzero(tick == k)
+            batches.append((times[idx[-1]], [paths[i] for i in idx]))
+    else:
+        batches = [(t, [p]) for t, p in zip(times, paths)]
+
+    work_dir = work_dir or tempfile.mkdtemp(prefix="replay_")
+    src, work = os.path.abspath(source), os.path.abspath(work_dir)
+    if os.path.commonpath([src, work]) in (src, work):
+        raise ValueError("work_dir phải khác folder nguồn và không chứa/nằm trong nó (pipeline ghi file kết quả vào đó)")
+    os.makedirs(work_dir, exist_ok=True)
+    # kết quả lần trước (checkpoint, detect.csv, file phiên...) làm pipeline bỏ qua file cũ và SignalSink ẩn tín hiệu đã báo
+    leftover = os.listdir(work_dir)
+    if leftover and not clear:
+        raise ValueError(f"work_dir {work_dir} không trống ({len(leftover)} mục); dùng clear=True / --clear để xoá trước")
+    for name in leftover:
+        path = os.path.join(work_dir, name)
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+
+    out = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    cycles = []
+    with out:
+        pipeline = live.LivePipeline(work_dir, timeframe)
+        pipeline.start(now=batches[0][0])
+
+        wall0 = time.perf_counter()
+        sim0 = batches[0][0]
+        sim_offset = 0.0  # giây giả lập đã trôi (đã cắt các khoảng trống dài)
+        for i, (sim_now, batch) in enumerate(batches):
+            if i:
+                gap = (sim_now - batches[i - 1][0]).total_seconds()
+                sim_offset += min(gap, MAX_IDLE_SECONDS)
+            due = wall0 + sim_offset / speed if speed else None
+            if due is not None:
+                # chờ tới giờ của chu kỳ; nếu đã trễ thì chạy luôn (và bị tính lag)
+                time.sleep(max(0.0, due - time.perf_counter()))
+            started = time.perf_counter()
+            pipeline.on_snapshot(batch, now=sim_now)
+            latency = time.perf_counter() - started
+
+            if i + 1 < len(batches):
+                gap_next = min((batches[i + 1][0] - sim_now).total_seconds(), MAX_IDLE_SECONDS)
+                budget = gap_next / speed if speed else None
+            else:
+                budget = None
+            cycles.append({
+                "sim_time": sim_now.isoformat(),
+                "files": len(batch),
+                "parsed": pipeline.ingestor.last_parsed,
+                "latency": latency,
+                "lag": (started - due) if due is not None else 0.0,
+                "budget": budget,
+                "overrun": budget is not None and latency > budget,
+            })
+
+        wall = time.perf_counter() - wall0
+        pipeline.close()
+
+    lat = np.array([c["latency"] for c in cycles])
+    n_ticks = pipeline.ingestor.change.seen if pipeline.ingestor.change is not None else None
+    report = {
+        "source": source,
+        "work_dir": work_dir,
+        "speed": speed,
+        "timeframe": timeframe,
+        "poll_seconds": poll_seconds,
+        "snapshots": len(paths),
+        "cycles": len(cycles),
+        "sim_seconds": (batches[-1][0] - sim0).total_seconds(),
+        "wall_seconds": wall,
+        "snapshots_per_sec": len(paths) / wall if wall else None,
+        "ticks_per_sec": n_ticks / wall if n_ticks and wall else None,
+        "latency_p50": float(np.percentile(lat, 50)),
+        "latency_p90": float(np.percentile(lat, 90)),
+        "latency_p99": float(np.percentile(lat, 99)),
+        "latency_max": float(lat.max()),
+        "overruns": sum(c["overrun"] for c in cycles),
+        "max_lag": max(c["lag"] for c in cycles),
+        "writes_coalesced": pipeline.writer.coalesced,
+        "stages": pipeline.metrics.percentiles(),
+        "cycle_log": cycles,
+    }
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Phát lại folder snapshot qua live pipeline với đồng hồ giả lập")
+    parser.add_argument("--source", default=FOLDER)
+    parser.add_argument("--work-dir", default=None, help="nơi pipeline ghi file kết quả (mặc định: thư mục tạm)")
+    parser.add_argument("--speed", type=float, default=SPEED, help="0 = nhanh nhất có thể")
+    parser.add_argument("--timeframe", default=live.TIMEFRAME)
+    parser.add_argument("--poll", type=float, default=None, help="gom snapshot theo nhịp poll (giây giả lập)")
+    parser.add_argument("--limit", type=int, default=None, help="chỉ phát N snapshot đầu")
+    parser.add_argument("--start", default=None, help="YYYYMMDD")
+    parser.add_argument("--end", default=None, help="YYYYMMDD")
+    parser.add_argument("--verbose", action="store_true", help="in log của pipeline")
+    parser.add_argument("--clear", action="store_true", help="xoá kết quả cũ trong --work-dir trước khi phát lại")
+    parser.add_argument("--out", default=None, help="ghi báo cáo (gồm từng chu kỳ) ra file JSON")
+    args = parser.parse_args()
+
+    r = replay(args.source, args.work_dir, args.speed, args.timeframe, args.poll, args.limit,
+               args.start, args.end, args.verbose, args.clear)
+    if r:
+        print(f"Phát lại {r['snapshots']} snapshot / {r['cycles']} chu kỳ trong {r['wall_seconds']:.1f}s "
+              f"(x{r['speed']:g}, {r['snapshots_per_sec']:.1f} snapshot/s)")
+        print(f"Độ trễ chu kỳ p50/p90/p99/max: {r['latency_p50'] * 1000:.0f}/{r['latency_p90'] * 1000:.0f}/"
+              f"{r['latency_p99'] * 1000:.0f}/{r['latency_max'] * 1000:.0f} ms | quá hạn {r['overruns']} | "
+              f"trễ nhất {r['max_lag']:.2f}s")
+        for name, p in r["stages"].items():
+            print(f"  {name:>10}: " + " / ".join(f"{k} {v * 1000:.0f} ms" for k, v in p.items()))
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                json.dump(r, f, indent=2, ensure_ascii=False)
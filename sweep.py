@@ -0,0 +1,153 @@
+import os
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from ohlc import FOLDER
+from patterns import compute_features
+
+# ======================
+# CONFIG
+# ======================
+# Lưới ngưỡng mặc định (11 x 11 x 11 x 2 = 2.662 tổ hợp)
+GRID_LOWER_WICK_PCT_RANGE = np.round(np.arange(0.30, 0.801, 0.05), 2)
+GRID_LOWER_WICK_MULT_BODY = np.round(np.arange(1.0, 3.501, 0.25), 2)
+GRID_CLOSE_POSITION = np.round(np.arange(0.50, 1.001, 0.05), 2)
+GRID_REQUIRE_BULLISH_CLOSE = [False, True]
+
+HORIZON = 3  # số nến phía trước để tính lợi nhuận sau tín hiệu
+
+PARAM_COLUMNS = ["min_lower_wick_pct_range", "min_lower_wick_mult_body", "min_close_position", "require_bullish_close"]
+
+
+# ======================
+# Helpers
+# ======================
+def symbol_order(bars: pd.DataFrame) -> np.ndarray:
+    """
+    Chỉ số sắp bảng nến theo (symbol, time), dùng cho phép dịch nến trong cùng 1 mã.
+    """
+    # sắp trên mã số nguyên (factorize) thay vì chuỗi: nhanh hơn nhiều với hàng triệu nến
+    codes = pd.factorize(bars["symbol"].astype(str), sort=True)[0]
+    return np.lexsort([pd.to_datetime(bars["time"]).to_numpy(), codes])
+
+
+def forward_return(bars: pd.DataFrame, horizon: int = HORIZON) -> np.ndarray:
+    """
+    close[t + horizon] / close[t] - 1 trong cùng mã, theo đúng thứ tự dòng của `bars`.
+    NaN nếu không đủ `horizon` nến phía sau.
+    """
+    order = symbol_order(bars)
+    close = pd.to_numeric(bars["close"], errors="coerce").to_numpy(dtype="float64")[order]
+    sym = bars["symbol"].astype(str).to_numpy()[order]
+
+    fwd = np.full(len(close), np.nan)
+    if 0 < horizon < len(close):
+        same = sym[horizon:] == sym[:-horizon]
+        fwd[:-horizon] = np.where(same, close[horizon:] / close[:-horizon] - 1, np.nan)
+
+    out = np.empty_like(fwd)
+    out[order] = fwd
+    return out
+
+
+def _rank(values: np.ndarray, grid: np.ndarray) -> np.ndarray:
+    # số ngưỡng <= giá trị: bar thoả `values >= grid[i]` với mọi i < rank
+    return np.searchsorted(grid, values, side="right")
+
+
+def _suffix_sum(h: np.ndarray) -> np.ndarray:
+    # S[i, j, k] = tổng H[i' >= i, j' >= j, k' >= k]
+    for axis in range(h.ndim):
+        h = np.flip(np.cumsum(np.flip(h, axis), axis=axis), axis)
+    return h
+
+
+# ======================
+# Sweep
+# ======================
+def sweep_lower_wick(
+    bars: pd.DataFrame,
+    pct_range_grid=GRID_LOWER_WICK_PCT_RANGE,
+    mult_body_grid=GRID_LOWER_WICK_MULT_BODY,
+    close_position_grid=GRID_CLOSE_POSITION,
+    bullish_grid=GRID_REQUIRE_BULLISH_CLOSE,
+    fwd: np.ndarray | None = None,
+) -> pd.DataFrame:
+    """
+    Đếm số tín hiệu nến rút chân cho mọi tổ hợp ngưỡng trong 1 lượt.
+
+    Tính 3 tỉ lệ 1 lần, đổi mỗi tỉ lệ thành hạng theo lưới (searchsorted), dựng histogram 3 chiều
+    theo hạng rồi cộng dồn ngược -> số nến thoả (a >= A_i, b >= B_j, c >= C_k) cho cả lưới.
+    fwd: lợi nhuận sau tín hiệu của từng nến (vd. forward_return()) -> thêm mean_fwd_return, win_rate.
+    """
+    grids = [np.unique(np.asarray(g, dtype="float64")) for g in (pct_range_grid, mult_body_grid, close_position_grid)]
+    shape = tuple(len(g) + 1 for g in grids)
+
+    f = compute_features(*(pd.to_numeric(bars[c], errors="coerce").to_numpy() for c in ["open", "high", "low", "close"]))
+    feats = [f["lower_wick_pct_range"], f["lower_wick_mult_body"], f["close_position"]]
+    bullish = f["close"] >= f["open"]
+
+    # nến có NaN không bao giờ thoả điều kiện
+    valid = np.isfinite(feats[0]) & np.isfinite(feats[1]) & np.isfinite(feats[2])
+    flat = np.ravel_multi_index([_rank(x[valid], g) for x, g in zip(feats, grids)], shape)
+    bullish = bullish[valid]
+
+    if fwd is not None:
+        fwd = np.asarray(fwd, dtype="float64")[valid]
+        has_fwd = np.isfinite(fwd)
+        fwd0 = np.where(has_fwd, fwd, 0.0)
+
+    size = int(np.prod(shape))
+    frames = []
+    for require_bullish in bullish_grid:
+        m = bullish if require_bullish else np.ones(len(flat), dtype=bool)
+
+        def table(weights=None):
+            w = None if weights is None else weights[m]
+            h = np.bincount(flat[m], weights=w, minlength=size).reshape(shape)
+            # bỏ hạng 0 (không thoả ngưỡng nhỏ nhất): S[1:, 1:, 1:] ứng với ngưỡng i, j, k
+            return _suffix_sum(h)[1:, 1:, 1:].ravel()
+
+        A, B, C = np.meshgrid(*grids, indexing="ij")
+        out = {
+            PARAM_COLUMNS[0]: A.ravel(),
+            PARAM_COLUMNS[1]: B.ravel(),
+            PARAM_COLUMNS[2]: C.ravel(),
+            PARAM_COLUMNS[3]: bool(require_bullish),
+            "hits": table().astype("int64"),
+        }
+        if fwd is not None:
+            n = table(has_fwd.astype("float64"))
+            total = table(fwd0)
+            wins = table((fwd0 > 0).astype("float64"))
+            with np.errstate(invalid="ignore", divide="ignore"):
+                out["fwd_count"] = n.astype("int64")
+                out["mean_fwd_return"] = np.where(n > 0, total / n, np.nan)
+                out["win_rate"] = np.where(n > 0, wins / n, np.nan)
+        frames.append(pd.DataFrame(out))
+
+    return pd.concat(frames, ignore_index=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Quét lưới ngưỡng nến rút chân trên bảng nến OHLC")
+    parser.add_argument("--bars", default=os.path.join(FOLDER, "ohlc.csv"), help="ohlc.csv hoặc file daily của vn30.py")
+    parser.add_argument("--horizon", type=int, default=HORIZON, help="0 = không tính lợi nhuận")
+    parser.add_argument("--min-hits", type=int, default=20)
+    parser.add_argument("--out", default=None, help="ghi toàn bộ kết quả ra CSV")
+    args = parser.parse_args()
+
+    bars = pd.read_csv(args.bars)
+    fwd = forward_return(bars, args.horizon) if args.horizon else None
+    res = sweep_lower_wick(bars, fwd=fwd)
+    print(f"{len(bars)} nến, {len(res)} tổ hợp ngưỡng")
+
+    if args.out:
+        res.to_csv(args.out, index=False, encoding="utf-8-sig")
+        print(f"Đã ghi {args.out}")
+
+    sort_col = "mean_fwd_return" if fwd is not None else "hits"
+    top = res[res["hits"] >= args.min_hits].sort_values(sort_col, ascending=False)
+    print(top.head(20).to_string(index=False))
@@ -0,0 +1,21 @@
+import pandas as pd
+import pytest
+
+from backfill import backfill_sessions, list_snapshots, split_chunks
+from bench import make_snapshot_folder
+from ohlc import export_sessions, parse_ts_from_filename
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_backfill_matches_export_sessions(tmp_path, workers):
+    # 2 ngày x 09:55 -> 10:05 (qua 2 phiên), mỗi đoạn 7 file = 70s -> nến 5min nằm vắt qua 2 đoạn
+    make_snapshot_folder(str(tmp_path), n_symbols=8, n_snapshots=60, n_days=2, start="0955")
+    chunks = split_chunks(list_snapshots(str(tmp_path)), workers, files_per_chunk=7)
+    bucket = [pd.Timestamp(parse_ts_from_filename(c[0])).floor("5min") for c in chunks]
+    prev = [pd.Timestamp(parse_ts_from_filename(c[-1])).floor("5min") for c in chunks]
+    assert any(b == p for b, p in zip(bucket[1:], prev[:-1]))
+
+    got = backfill_sessions(str(tmp_path), "5min", workers=workers, files_per_chunk=7, write=False)
+    ref = export_sessions(str(tmp_path), "5min")
+    assert got["session"].nunique() == 2
+    pd.testing.assert_frame_equal(got.reset_index(drop=True), ref.reset_index(drop=True), check_dtype=False)
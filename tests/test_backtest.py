@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+
+from backtest import signal_trades
+
+T = pd.to_datetime(["2026-02-16 09:00", "2026-02-16 09:30", "2026-02-16 10:00", "2026-02-16 10:30"])
+BARS = pd.DataFrame({
+    "session": ["0900-1000", "0900-1000", "0900-1000", "0900-1000", "1000-1100", "1000-1100"],
+    "time": [T[0], T[1], T[0], T[1], T[2], T[3]],
+    "symbol": ["BBB", "BBB", "AAA", "AAA", "AAA", "AAA"],
+    "high": [20.5, 22.0, 10.5, 11.5, 12.5, 12.0],
+    "low": [19.5, 19.0, 9.5, 10.0, 10.8, 8.8],
+    "close": [20.0, 21.0, 10.0, 11.0, 12.0, 9.0],
+})
+# tín hiệu: BBB 09:00, AAA 09:00, AAA 10:00
+SIGNAL = np.array([True, False, True, False, True, False])
+
+
+def test_signal_trades_matches_hand_computed():
+    trades = signal_trades(BARS, SIGNAL, horizons=[1, 2], window=2)
+    expected = pd.DataFrame({
+        "session": ["0900-1000", "1000-1100", "0900-1000"],
+        "time": [T[0], T[2], T[0]],
+        "symbol": ["AAA", "AAA", "BBB"],
+        "entry": [10.0, 12.0, 20.0],
+        "fwd_ret_1": [0.1, -0.25, 0.05],
+        "fwd_ret_2": [0.2, np.nan, np.nan],   # không lấy nến của mã khác
+        "bars_ahead": [2, 1, 1],
+        "mfe": [0.25, 0.0, 0.1],
+        "mae": [0.0, 8.8 / 12 - 1, -0.05],
+    })
+    pd.testing.assert_frame_equal(trades, expected, check_dtype=False)
+
+
+def test_signal_trades_within_session():
+    trades = signal_trades(BARS, SIGNAL, horizons=[1, 2], window=2, within=["session"])
+    # AAA 09:00: nến 10:00 thuộc phiên sau -> bị che
+    first = trades.iloc[0]
+    assert np.isclose(first["fwd_ret_1"], 0.1) and np.isnan(first["fwd_ret_2"])
+    assert first["bars_ahead"] == 1
+    assert np.isclose(first["mfe"], 0.15) and np.isclose(first["mae"], 0.0)
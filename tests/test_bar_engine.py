@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+from bar_engine import BarEngine
+from ohlc import make_ticks, ohlc_all_sessions
+
+
+def ticks(rows):
+    return make_ticks(pd.DataFrame(rows, columns=["time", "symbol", "price"]))
+
+
+def test_late_tick_for_closed_bar_is_dropped():
+    engine = BarEngine("5min")
+    engine.update(ticks([("2026-02-20 09:00:10", "AAA", 10.0), ("2026-02-20 09:01:00", "AAA", 11.0)]))
+    engine.close_until(pd.Timestamp("2026-02-20 09:05:00"))
+    assert engine.current.empty
+
+    # tick tới muộn của nến 09:00 đã đóng: không được mở lại nến thứ 2 cùng khoá
+    done, _ = engine.update(ticks([("2026-02-20 09:03:00", "AAA", 9.0)]))
+    assert done.empty
+    assert engine.late_ticks == 1
+
+    bars = engine.bars()
+    assert len(bars) == 1
+    row = bars.iloc[0]
+    assert (row["open"], row["high"], row["low"], row["close"]) == (10.0, 11.0, 10.0, 11.0)
+
+    # tick của nến sau vẫn vào bình thường
+    engine.update(ticks([("2026-02-20 09:06:00", "AAA", 12.0)]))
+    assert len(engine.bars()) == 2
+    assert not engine.bars("0900-1000").duplicated(["session", "time", "symbol"]).any()
+
+
+def test_session_bars_match_full_rebuild():
+    rng = np.random.default_rng(0)
+    times = pd.date_range("2026-02-20 09:00", "2026-02-20 11:29:50", freq="10s")
+    rows = [(t, s, round(float(p), 2)) for t in times for s, p in zip(["AAA", "BBB", "CCC"], 10 + rng.random(3))]
+    data = ticks(rows)
+
+    engine = BarEngine("15min")
+    for _, chunk in data.groupby(data["time"].dt.floor("5min")):
+        engine.update(chunk)
+        engine.close_until(chunk["time"].max())
+
+    ref = ohlc_all_sessions(data, "15min")
+    for session, part in ref.groupby("session"):
+        got = engine.bars(session)
+        pd.testing.assert_frame_equal(got.reset_index(drop=True), part.reset_index(drop=True), check_dtype=False)
@@ -0,0 +1,94 @@
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+
+from boards import BoardRenamer, CaptureCoordinator, TickMerger
+from merged_ohlc_detect import LivePipeline
+from ohlc import make_ticks
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "priceboard.html")
+
+
+def ticks(ts, prices):
+    return make_ticks(pd.DataFrame({"symbol": list(prices), "price": list(prices.values())}), ts)
+
+
+def test_tick_merger_drops_duplicate_and_stale_ticks():
+    merger = TickMerger()
+    t0, t1 = datetime(2026, 2, 20, 9, 0, 0), datetime(2026, 2, 20, 9, 0, 10)
+
+    assert merger.apply(ticks(t0, {"VNM": 70.0, "FPT": 120.0}))["symbol"].tolist() == ["VNM", "FPT"]
+    # VNM có trên cả 2 bảng cùng nhịp -> chỉ giữ 1 tick
+    assert merger.apply(ticks(t0, {"VNM": 70.0, "HPG": 25.0}))["symbol"].tolist() == ["HPG"]
+    assert merger.apply(ticks(t1, {"VNM": 70.1}))["symbol"].tolist() == ["VNM"]
+    # bảng tới muộn mang tick cũ hơn tick đã nhận
+    assert merger.apply(ticks(t0, {"VNM": 69.9, "FPT": 120.0})).empty
+    assert merger.dropped == 3
+
+
+def test_coordinator_merges_fixture_boards_into_one_cycle(tmp_path):
+    pipeline = LivePipeline(str(tmp_path), "5min")
+    pipeline.start(now=datetime(2026, 2, 20, 9, 0))
+    coord = CaptureCoordinator(str(tmp_path), pipeline, archive_every=1)
+    # 2 bảng cùng bảng giá (vd. VN30 nằm trong HOSE)
+    coord.add_fixture_board("hose", FIXTURE)
+    coord.add_fixture_board("vn30", FIXTURE)
+
+    ts = datetime(2026, 2, 20, 9, 0, 10)
+    for step in coord._steps.values():
+        step(ts)
+    batch = [coord._queue.get_nowait() for _ in range(coord._queue.qsize())]
+    sess = coord.process(batch)
+    coord.stop()
+    pipeline.close()
+
+    assert sorted(sess["symbol"].astype(str)) == ["BAF", "FPT", "HPG", "VNM"]
+    assert coord.merger.dropped == 4
+    archives = sorted(os.path.basename(p) for _, _, _, p in batch)
+    assert archives == ["20260220_090010_hose_priceboard.csv", "20260220_090010_vn30_priceboard.csv"]
+    # file archive đã được ingest qua on_ticks -> lần quét folder sau không đọc lại
+    assert pipeline.ingestor.scan() == []
+    assert "vn30: 1 snapshot, 4 tick" in coord.summary()
+
+
+def test_board_renamer_tags_file_with_board(tmp_path):
+    download_dir, dest_dir = tmp_path / "dl", tmp_path / "dest"
+    download_dir.mkdir()
+    dest_dir.mkdir()
+    src = download_dir / "priceboard.csv"
+    src.write_text("CK,x\nVNM,1\n", encoding="utf-8")
+
+    published = []
+    with ThreadPoolExecutor(max_workers=1) as ex:
+        renamer = BoardRenamer("hose", str(download_dir), str(dest_dir), lambda b, p: published.append((b, p)), ex)
+        renamer.handle(str(src), completed=True)
+        # sự kiện trùng của cùng file khi đang chờ rename -> bỏ qua
+        renamer.handle(str(src))
+
+    assert renamer.renamed == 1
+    [(board, path)] = published
+    assert board == "hose"
+    assert re.match(r"^\d{8}_\d{6}_hose_priceboard\.csv$", os.path.basename(path))
+    assert os.path.exists(path) and not src.exists()
+
+
+def test_renamer_in_place_without_board_tag(tmp_path):
+    # cách main.py dùng: tải thẳng vào folder theo dõi, rename tại chỗ
+    src = tmp_path / "priceboard.csv"
+    src.write_text("CK,x\nVNM,1\n", encoding="utf-8")
+
+    published = []
+    with ThreadPoolExecutor(max_workers=1) as ex:
+        renamer = BoardRenamer(None, str(tmp_path), str(tmp_path), lambda b, p: published.append(p), ex)
+        renamer.handle(str(src), completed=True)
+    # sự kiện created của chính file vừa rename -> không rename lại
+    with ThreadPoolExecutor(max_workers=1) as ex:
+        renamer.executor = ex
+        renamer.handle(published[0], completed=True)
+
+    assert renamer.renamed == 1
+    assert re.match(r"^\d{8}_\d{6}_priceboard\.csv$", os.path.basename(published[0]))
+    assert os.listdir(tmp_path) == [os.path.basename(published[0])]
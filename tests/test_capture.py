@@ -0,0 +1,62 @@
+import os
+from datetime import datetime
+
+import pandas as pd
+
+from capture import parse_priceboard_html, rows_to_ticks
+from merged_ohlc_detect import LivePipeline
+from ohlc import PRICE_DTYPE
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "priceboard.html")
+
+
+def read_fixture():
+    with open(FIXTURE, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def test_parse_priceboard_html():
+    df = parse_priceboard_html(read_fixture())
+    # dòng header lặp lại ("CK"), giá không phải số ("-") và dòng thiếu cột bị bỏ
+    assert df["symbol"].tolist() == ["VNM", "FPT", "HPG", "BAF"]
+    assert df["price"].tolist() == [70.5, 120.1, 25.35, 1025.5]
+
+
+def test_parse_priceboard_html_with_timestamp_gives_compact_ticks():
+    ts = datetime(2026, 2, 20, 9, 15, 0)
+    ticks = parse_priceboard_html(read_fixture(), ts)
+    assert list(ticks.columns) == ["time", "symbol", "price"]
+    assert (ticks["time"] == pd.Timestamp(ts)).all()
+    assert isinstance(ticks["symbol"].dtype, pd.CategoricalDtype)
+    assert ticks["price"].dtype == PRICE_DTYPE
+
+
+def test_rows_to_ticks_cleans_rows():
+    df = rows_to_ticks([[" AAA ", "1,234.5"], ["", "10"], ["ck", "11"], ["BBB", "n/a"], ["CCC", " 9.9 "]])
+    assert df["symbol"].tolist() == ["AAA", "CCC"]
+    assert df["price"].tolist() == [1234.5, 9.9]
+
+
+def test_dom_ticks_filtered_the_same_with_or_without_archive(tmp_path, capsys):
+    # cùng chuỗi snapshot: 1 pipeline nhận kèm file archive, 1 pipeline không -> cùng tick vào nến
+    html = read_fixture()
+    pipelines = []
+    for name in ["archived", "plain"]:
+        folder = tmp_path / name
+        folder.mkdir()
+        p = LivePipeline(str(folder), "5min")
+        p.start(now=datetime(2026, 2, 20, 9, 0))
+        for i in range(6):
+            ts = datetime(2026, 2, 20, 9, 0, 10 * i)
+            ticks = parse_priceboard_html(html, ts)
+            path = None
+            if name == "archived":
+                path = str(folder / f"{ts:%Y%m%d_%H%M%S}_dom_priceboard.csv")
+                ticks.to_csv(path, index=False)
+            p.on_ticks(ticks, ts, source_path=path)
+        p.close()
+        pipelines.append(p)
+
+    a, b = pipelines
+    assert a.ingestor.change.kept == b.ingestor.change.kept == 4  # giá không đổi -> chỉ giữ tick đầu mỗi mã
+    pd.testing.assert_frame_equal(a.engine.bars().reset_index(drop=True), b.engine.bars().reset_index(drop=True))
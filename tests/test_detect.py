@@ -0,0 +1,27 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from detect import lower_wick_signal
+
+BARS = pd.DataFrame({
+    "open": [10.0, 10.0],
+    "high": [10.2, 10.5],
+    "low": [8.0, 9.8],
+    "close": [10.1, 10.0],
+})
+
+
+def test_lower_wick_signal_dataframe_and_arrays_agree():
+    expected = np.array([True, False])
+    assert (lower_wick_signal(BARS) == expected).all()
+    arrays = [BARS[c].to_numpy() for c in ["open", "high", "low", "close"]]
+    assert (lower_wick_signal(*arrays) == expected).all()
+
+
+def test_lower_wick_signal_thresholds_are_keyword_only():
+    with pytest.raises(TypeError):
+        lower_wick_signal(BARS, 0.9)
+    with pytest.raises(TypeError):
+        lower_wick_signal(*[BARS[c].to_numpy() for c in ["open", "high", "low", "close"]], 0.9)
+    assert not lower_wick_signal(BARS, min_lower_wick_pct_range=0.95).any()
@@ -0,0 +1,61 @@
+import threading
+import time
+
+import pytest
+
+import downloads
+from downloads import wait_until_stable
+
+
+@pytest.fixture(autouse=True)
+def fast_poll(monkeypatch):
+    monkeypatch.setattr(downloads, "STABLE_POLL_SECONDS", 0.02)
+
+
+def test_set_done_event_returns_at_once(tmp_path):
+    done = threading.Event()
+    done.set()
+    t0 = time.monotonic()
+    assert wait_until_stable(str(tmp_path / "missing.csv"), timeout=5, done_event=done)
+    assert time.monotonic() - t0 < 0.5
+
+
+def test_done_event_wakes_the_wait(tmp_path, monkeypatch):
+    path = tmp_path / "x.csv"
+    path.write_text("a\n")
+    done = threading.Event()
+    threading.Timer(0.05, done.set).start()
+    # poll chậm: chỉ xong kịp nhờ done_event đánh thức
+    monkeypatch.setattr(downloads, "STABLE_POLL_SECONDS", 10)
+    t0 = time.monotonic()
+    assert wait_until_stable(str(path), timeout=5, done_event=done)
+    assert time.monotonic() - t0 < 2
+
+
+def test_stable_file_returns_true(tmp_path):
+    path = tmp_path / "x.csv"
+    path.write_text("a,b\n1,2\n")
+    assert wait_until_stable(str(path), timeout=5)
+
+
+def test_growing_file_times_out(tmp_path):
+    path = tmp_path / "x.csv"
+    path.write_text("a\n")
+    stop = threading.Event()
+
+    def grow():
+        with open(path, "a") as f:
+            while not stop.is_set():
+                f.write("1\n")
+                f.flush()
+                time.sleep(0.005)
+
+    t = threading.Thread(target=grow, daemon=True)
+    t.start()
+    try:
+        t0 = time.monotonic()
+        assert not wait_until_stable(str(path), timeout=0.5)
+        assert time.monotonic() - t0 >= 0.5
+    finally:
+        stop.set()
+        t.join()
@@ -0,0 +1,78 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from bench import make_snapshot_folder, write_snapshot
+from ingest import TickIngestor
+from ohlc import build_ticks_from_folder
+
+
+def as_plain(df):
+    df = df.assign(symbol=df["symbol"].astype(str))
+    return df.sort_values(["symbol", "time"]).reset_index(drop=True)
+
+
+def bump_mtime(path, seconds=1):
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + seconds * 10**9))
+
+
+def test_unchanged_files_are_skipped(tmp_path):
+    make_snapshot_folder(str(tmp_path), n_symbols=6, n_snapshots=10)
+    ing = TickIngestor(str(tmp_path), change_only=False)
+
+    assert not ing.update().empty
+    assert ing.last_parsed == 10
+    assert ing.update().empty
+    assert ing.last_parsed == 0
+    assert ing.last_scanned == 10
+
+
+def test_rewritten_file_is_read_again(tmp_path):
+    paths = make_snapshot_folder(str(tmp_path), n_symbols=6, n_snapshots=10)
+    ing = TickIngestor(str(tmp_path), change_only=False)
+    ing.update()
+
+    # cùng nội dung, chỉ đổi mtime
+    bump_mtime(paths[3])
+    ing.update()
+    assert ing.last_parsed == 1
+
+    # ghi lại với giá khác (đổi size)
+    size = os.path.getsize(paths[5])
+    write_snapshot(paths[5], [f"S{i:04d}" for i in range(6)], np.full(6, 1234.5), np.random.default_rng(1))
+    bump_mtime(paths[5])
+    assert os.path.getsize(paths[5]) != size
+    new = ing.update()
+    assert ing.last_parsed == 1
+    assert (new["price"] == 1234.5).any()
+    pd.testing.assert_frame_equal(
+        as_plain(ing.ticks()), as_plain(build_ticks_from_folder(str(tmp_path), change_only=False))
+    )
+
+
+def test_state_round_trip(tmp_path):
+    paths = make_snapshot_folder(str(tmp_path), n_symbols=6, n_snapshots=20)
+    moved = [p + ".later" for p in paths[10:]]
+    for p, m in zip(paths[10:], moved):
+        os.rename(p, m)
+
+    ing = TickIngestor(str(tmp_path), change_only=True)
+    first = ing.update()
+    st = ing.state()
+
+    restored = TickIngestor(str(tmp_path), change_only=True)
+    restored.load_state(st)
+    assert restored.state() == st
+    assert restored.update().empty
+    assert restored.last_parsed == 0
+
+    for p, m in zip(paths[10:], moved):
+        os.rename(m, p)
+    rest = restored.update()
+    assert restored.last_parsed == 10
+
+    # nối tiếp từ checkpoint = đọc liền 1 lượt
+    ref = build_ticks_from_folder(str(tmp_path), change_only=True)
+    pd.testing.assert_frame_equal(as_plain(pd.concat([first, rest])), as_plain(ref))
@@ -0,0 +1,73 @@
+import os
+import pickle
+import shutil
+from datetime import datetime
+
+import pandas as pd
+
+import merged_ohlc_detect as live
+from bench import make_snapshot_folder
+from detect import SignalSink
+from ohlc import build_ticks_from_folder, make_ticks, ohlc_all_sessions, parse_ts_from_filename
+
+
+def ticks(ts, prices):
+    return make_ticks(pd.DataFrame({"symbol": list(prices), "price": list(prices.values())}), ts)
+
+
+def test_only_closed_bars_reach_detect_csv(tmp_path, monkeypatch):
+    monkeypatch.setattr(live, "DETECT_PROVISIONAL", True)
+    p = live.LivePipeline(str(tmp_path), "5min")
+    p.start(now=datetime(2026, 2, 20, 9, 0))
+
+    # 09:00-09:02: nến đang chạy có dạng rút chân (open 10, low 8, close 10.1)
+    for ts, price in [("09:00:00", 10.0), ("09:01:00", 8.0), ("09:02:00", 10.1)]:
+        now = datetime.fromisoformat(f"2026-02-20T{ts}")
+        p.on_ticks(ticks(now, {"AAA": price}), now)
+    p.writer.flush()
+    provisional = pd.read_csv(p.provisional_path)
+    assert provisional["symbol"].tolist() == ["AAA"]
+
+    # cuối nến giá rơi về 8.1 -> nến đóng không còn là rút chân
+    now = datetime(2026, 2, 20, 9, 4)
+    p.on_ticks(ticks(now, {"AAA": 8.1}), now)
+    now = datetime(2026, 2, 20, 9, 5, 10)
+    p.on_ticks(ticks(now, {"AAA": 8.1}), now)
+    p.close()
+
+    assert pd.read_csv(p.detect_path).empty
+    assert pd.read_csv(p.provisional_path).empty
+
+
+def test_warm_restart_outside_session_rewrites_session_files(tmp_path):
+    src, live_dir = tmp_path / "src", tmp_path / "live"
+    live_dir.mkdir()
+    paths = make_snapshot_folder(str(src), n_symbols=10, n_snapshots=30, n_days=3)
+    for f in paths[:70]:
+        shutil.copy(f, live_dir)
+
+    p = live.LivePipeline(str(live_dir), "1min")
+    p.start(now=parse_ts_from_filename(paths[69]))
+    p.close()
+    # checkpoint chỉ giữ nến đã đóng của ngày mới nhất, 2 ngày trước nằm ở file riêng
+    with open(p.checkpoint_path, "rb") as f:
+        state = pickle.load(f)
+    assert state["history"] == ["20260216", "20260217"]
+    assert set(state["engine"]["completed"]["date"]) == {"20260218"}
+    # manifest chỉ còn file của ngày mới nhất
+    assert {os.path.basename(f)[:8] for f in state["ingestor"]["manifest"]} == {"20260218"}
+    # tín hiệu đã checkpoint đều đã nằm trong detect.csv
+    assert state["signals"] <= set(SignalSink(p.detect_path).seen)
+
+    # snapshot đến trong lúc dừng, khởi động lại sau giờ giao dịch
+    for f in paths[70:]:
+        shutil.copy(f, live_dir)
+    p2 = live.LivePipeline(str(live_dir), "1min")
+    p2.start(now=datetime(2026, 2, 18, 12, 0))
+    p2.close()
+
+    ref = ohlc_all_sessions(build_ticks_from_folder(str(src), change_only=False), "1min")
+    pd.testing.assert_frame_equal(p2.engine.bars().reset_index(drop=True), ref.reset_index(drop=True), check_dtype=False)
+    sess = pd.read_csv(live_dir / "OHLC_1min_0900-1000.csv", dtype={"date": str}, parse_dates=["time"])
+    assert len(sess) == len(ref)
+    assert sess["time"].max() == ref["time"].max()
@@ -0,0 +1,20 @@
+import json
+from datetime import datetime
+
+from metrics import Metrics
+from writer import AsyncWriter
+
+
+def test_metrics_lines_go_through_writer_into_daily_file(tmp_path):
+    writer = AsyncWriter()
+    metrics = Metrics(str(tmp_path / "metrics_{date}.jsonl"), budget=0, writer=writer)
+    for n in (3, 5):
+        with metrics.cycle() as m:
+            with m.stage("bars"):
+                m.count("ticks", n)
+    writer.close()
+
+    path = tmp_path / f"metrics_{datetime.now():%Y%m%d}.jsonl"
+    recs = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert [r["counters"]["ticks"] for r in recs] == [3, 5]
+    assert all(r["overrun"] for r in recs) and metrics.overruns == 2
@@ -0,0 +1,125 @@
+import pandas as pd
+import pytest
+
+from bench import make_snapshot_folder
+from ingest import TickIngestor
+from ohlc import (
+    SESSIONS,
+    _read_symbol_price_arrow,
+    _read_symbol_price_pandas,
+    build_bar_pyramid,
+    build_ticks_from_folder,
+    hhmm_to_time,
+    ohlc_all_sessions,
+    read_symbol_price_from_file,
+    use_change_filter,
+)
+
+COLS = ["date", "session", "time", "symbol", "open", "high", "low", "close"]
+
+
+def resample_reference(data, timeframe, sessions=SESSIONS):
+    """
+    Cách dựng nến cũ: lọc từng phiên, groupby mã rồi resample(timeframe).ohlc().
+    """
+    out = []
+    tod = data["time"].dt.time
+    for start_hhmm, end_hhmm in sessions:
+        sub = data.loc[(tod >= hhmm_to_time(start_hhmm)) & (tod < hhmm_to_time(end_hhmm))]
+        for sym, g in sub.groupby("symbol", observed=True):
+            ohlc = g.set_index("time")["price"].astype("float64").sort_index().resample(timeframe).ohlc().dropna()
+            ohlc["symbol"] = str(sym)
+            ohlc["session"] = f"{start_hhmm}-{end_hhmm}"
+            out.append(ohlc.reset_index())
+    res = pd.concat(out, ignore_index=True)
+    res["date"] = res["time"].dt.strftime("%Y%m%d")
+    res[["open", "high", "low", "close"]] = res[["open", "high", "low", "close"]].round(2)
+    return res[COLS].sort_values(["date", "session", "time", "symbol"]).reset_index(drop=True)
+
+
+@pytest.fixture(scope="module")
+def ticks(tmp_path_factory):
+    # 2 ngày, 09:50 -> 11:10: đi qua 3 phiên (0900-1000, 1000-1100, 1100-1130)
+    folder = tmp_path_factory.mktemp("snap")
+    make_snapshot_folder(str(folder), n_symbols=6, n_snapshots=240, n_days=2, interval_s=20, start="0950")
+    return build_ticks_from_folder(str(folder), change_only=False)
+
+
+@pytest.mark.parametrize("timeframe", ["30s", "1min", "90s", "5min", "15min", "60min"])
+def test_ohlc_all_sessions_matches_resample(ticks, timeframe):
+    got = ohlc_all_sessions(ticks, timeframe).reset_index(drop=True)
+    ref = resample_reference(ticks, timeframe)
+    assert got["session"].nunique() == 3 and got["date"].nunique() == 2
+    pd.testing.assert_frame_equal(got, ref, check_dtype=False)
+
+
+def test_bar_pyramid_matches_resample(ticks):
+    pyramid = build_bar_pyramid(ticks, "1min", ["5min", "15min", "60min"])
+    for tf in ["1min", "5min", "15min", "60min"]:
+        pd.testing.assert_frame_equal(pyramid[tf].reset_index(drop=True), resample_reference(ticks, tf), check_dtype=False)
+
+
+def test_bar_pyramid_rejects_timeframe_not_multiple_of_base(ticks):
+    with pytest.raises(ValueError):
+        build_bar_pyramid(ticks, "1min", ["90s"])
+
+
+def test_use_change_filter_only_for_multiples_of_base():
+    assert use_change_filter("5min")
+    assert use_change_filter(["1min", "15min", "60min"])
+    assert not use_change_filter("30s")
+    assert not use_change_filter(["5min", "90s"])
+    assert not use_change_filter("5min", change_only=False)
+
+
+def test_odd_timeframe_bars_match_unfiltered_ticks(tmp_path):
+    make_snapshot_folder(str(tmp_path), n_symbols=20, n_snapshots=30, interval_s=10)
+    full = ohlc_all_sessions(build_ticks_from_folder(str(tmp_path), change_only=False), "30s")
+
+    # "30s" không phải bội số của 1min: ChangeFilter bị tắt, nến vẫn đúng
+    got = ohlc_all_sessions(build_ticks_from_folder(str(tmp_path), change_only=True, timeframes="30s"), "30s")
+    pd.testing.assert_frame_equal(got.reset_index(drop=True), full.reset_index(drop=True))
+
+    ingestor = TickIngestor(str(tmp_path), change_only=True, timeframe="30s")
+    assert ingestor.change is None
+    ingestor.update()
+    got = ohlc_all_sessions(ingestor.ticks(), "30s")
+    pd.testing.assert_frame_equal(got.reset_index(drop=True), full.reset_index(drop=True))
+
+
+MESSY_ROWS = [
+    ["VNM", " 70.5 "], ['"FPT"', '"120.1"'], ["HPG", "inf"], ["MSN", "-inf"], ["VIC", "nan"],
+    ["SSI", "1e2"], ["BAF", '"1,025.5"'], ["ABC", "-"], ["XYZ", ""], ["CK", "Giá"], ["", "10"], [" MWG ", "+45"],
+]
+
+
+def write_messy(path, ragged=False):
+    lines = ["CK," + ",".join(f"c{i}" for i in range(1, 12))]
+    for sym, price in MESSY_ROWS:
+        cells = [sym] + ["1"] * 9 + [price, "x"]
+        lines.append(",".join(cells))
+    if ragged:
+        lines.append("SHORT,1,2")
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+def test_arrow_and_pandas_readers_agree_on_messy_file(tmp_path):
+    pytest.importorskip("pyarrow")
+    path = tmp_path / "20260220_091500_priceboard.csv"
+    write_messy(path)
+    arrow = _read_symbol_price_arrow(str(path))
+    fallback = _read_symbol_price_pandas(str(path))
+    assert arrow["symbol"].astype(str).tolist() == ["VNM", "FPT", "SSI", "MWG"]
+    assert arrow["price"].tolist() == [70.5, 120.1, 100.0, 45.0]
+    pd.testing.assert_frame_equal(arrow, fallback, check_categorical=False)
+
+
+def test_ragged_file_falls_back_to_pandas_with_same_cleaning(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    path = tmp_path / "20260220_091500_priceboard.csv"
+    write_messy(path, ragged=True)
+    with pytest.raises(pa.ArrowInvalid):
+        _read_symbol_price_arrow(str(path))
+    got = read_symbol_price_from_file(str(path))
+    assert got["symbol"].astype(str).tolist() == ["VNM", "FPT", "SSI", "MWG"]
+    assert got["price"].tolist() == [70.5, 120.1, 100.0, 45.0]
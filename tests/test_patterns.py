@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import detect
+from detect import lower_wick_signal
+from patterns import PATTERNS, compute_features, detect_patterns, expand_specs, pack_bits, pattern_matrix, unpack_bits
+
+
+def run(name, rows, **params):
+    o, h, l, c = (np.array(x, dtype="float64") for x in zip(*rows))
+    mat, _ = pattern_matrix(compute_features(o, h, l, c), [(name, name, params)])
+    return mat[:, 0].tolist()
+
+
+def test_lower_wick_defaults_come_from_detect():
+    _, defaults = PATTERNS["lower_wick"]
+    assert defaults == {
+        "min_lower_wick_pct_range": detect.MIN_LOWER_WICK_PCT_RANGE,
+        "min_lower_wick_mult_body": detect.MIN_LOWER_WICK_MULT_BODY,
+        "min_close_position": detect.MIN_CLOSE_POSITION,
+        "require_bullish_close": detect.REQUIRE_BULLISH_CLOSE,
+    }
+
+
+def test_single_bar_predicates():
+    # (open, high, low, close)
+    hammer = (10.0, 10.2, 8.0, 10.1)
+    star = (10.0, 12.0, 9.9, 9.95)
+    doji = (10.0, 10.5, 9.5, 10.02)
+    plain = (10.0, 10.6, 9.9, 10.5)
+    rows = [hammer, star, doji, plain]
+    assert run("lower_wick", rows) == [True, False, False, False]
+    assert run("upper_wick", rows) == [False, True, False, False]
+    # thân hammer / shooting star cũng < 10% biên độ
+    assert run("doji", rows) == [True, True, True, False]
+    # hammer giảm nhẹ bị loại khi yêu cầu close >= open
+    assert run("lower_wick", [(10.1, 10.2, 8.0, 10.05)], require_bullish_close=True) == [False]
+
+
+def test_multi_bar_predicates():
+    assert run("bullish_engulfing", [(10.0, 10.1, 9.4, 9.5), (9.4, 10.3, 9.3, 10.2)]) == [False, True]
+    assert run("bearish_engulfing", [(9.5, 10.1, 9.4, 10.0), (10.1, 10.2, 9.3, 9.4)]) == [False, True]
+    assert run("inside_bar", [(10.0, 11.0, 9.0, 10.5), (10.2, 10.5, 9.5, 10.0)]) == [False, True]
+    assert run("morning_star", [(11.0, 11.1, 9.9, 10.0), (9.9, 10.0, 9.8, 9.95), (10.0, 10.7, 9.9, 10.6)]) == [False, False, True]
+    assert run("evening_star", [(10.0, 11.1, 9.9, 11.0), (11.1, 11.2, 11.0, 11.05), (11.0, 11.1, 10.3, 10.4)]) == [False, False, True]
+
+
+def test_pack_and_unpack_bits():
+    mat = np.array([[True, False, True], [False, False, False], [False, True, False]])
+    assert pack_bits(mat).tolist() == [5, 0, 2]
+    assert unpack_bits(5, ["a", "b", "c"]) == ["a", "c"]
+
+    wide = np.zeros((1, 64), dtype=bool)
+    wide[0, 63] = True
+    assert pack_bits(wide)[0] == np.uint64(2 ** 63)
+    with pytest.raises(ValueError):
+        pack_bits(np.zeros((1, 65), dtype=bool))
+
+
+def test_detect_patterns_bit_layout_and_row_order():
+    t = pd.to_datetime(["2026-02-16 09:00", "2026-02-16 09:05"])
+    # 2 mã xen kẽ, không theo thứ tự thời gian; BBB 09:00 nằm trong nến AAA 09:05 nhưng khác mã
+    bars = pd.DataFrame({
+        "time": [t[1], t[0], t[0], t[1]],
+        "symbol": ["AAA", "BBB", "AAA", "BBB"],
+        "open": [10.2, 10.0, 10.0, 10.0],
+        "high": [10.5, 10.2, 11.0, 10.2],
+        "low": [9.5, 8.0, 9.0, 8.0],
+        "close": [10.0, 10.1, 10.5, 10.1],
+    })
+    mat, labels = detect_patterns(bars)
+    assert labels == list(PATTERNS)
+    inside = labels.index("inside_bar")
+    assert mat[:, inside].tolist() == [True, False, False, True]
+    assert mat[:, labels.index("lower_wick")].tolist() == lower_wick_signal(bars).tolist()
+
+    bits = pack_bits(mat)
+    for row, mask in zip(mat, bits):
+        assert unpack_bits(mask, labels) == [label for label, hit in zip(labels, row) if hit]
+
+
+def test_expand_specs_labels():
+    specs = expand_specs("doji", max_body_pct_range=[0.05, 0.1])
+    assert [label for label, _, _ in specs] == ["doji|max_body_pct_range=0.05", "doji|max_body_pct_range=0.1"]
@@ -0,0 +1,36 @@
+import glob
+import os
+
+import pandas as pd
+import pytest
+
+from bench import make_snapshot_folder
+from replay import replay
+
+
+def test_replay_twice_into_same_work_dir(tmp_path):
+    src, work = str(tmp_path / "src"), str(tmp_path / "work")
+    make_snapshot_folder(src, n_symbols=30, n_snapshots=60)
+
+    r = replay(src, work, speed=0, timeframe="1min", poll_seconds=30)
+    assert r["snapshots"] == 60
+    first = pd.read_csv(os.path.join(work, "detect.csv"))
+    assert not first.empty
+
+    # kết quả cũ còn đó -> từ chối thay vì để SignalSink ẩn hết tín hiệu
+    with pytest.raises(ValueError):
+        replay(src, work, speed=0, timeframe="1min", poll_seconds=30)
+
+    # clear=True: chỉ còn kết quả của lần này (số đo đúng bằng số chu kỳ, tín hiệu ghi lại đủ)
+    r = replay(src, work, speed=0, timeframe="1min", poll_seconds=30, clear=True)
+    lines = sum(len(open(p, encoding="utf-8").readlines()) for p in glob.glob(os.path.join(work, "metrics_*.jsonl")))
+    assert lines == r["cycles"]
+    pd.testing.assert_frame_equal(pd.read_csv(os.path.join(work, "detect.csv")), first)
+
+
+def test_replay_rejects_work_dir_around_source(tmp_path):
+    src = str(tmp_path / "src")
+    make_snapshot_folder(src, n_symbols=3, n_snapshots=2)
+    with pytest.raises(ValueError):
+        replay(src, str(tmp_path), speed=0, clear=True)
+    assert len(os.listdir(src)) == 2
@@ -0,0 +1,56 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from detect import lower_wick_signal
+from patterns import compute_features
+from sweep import forward_return, sweep_lower_wick
+
+
+def make_bars(n=400, seed=0):
+    # giá bước 0.1 -> nhiều nến có cùng tỉ lệ
+    rng = np.random.default_rng(seed)
+    o = rng.integers(95, 105, n) / 10
+    c = rng.integers(95, 105, n) / 10
+    h = np.maximum(o, c) + rng.integers(0, 4, n) / 10
+    l = np.minimum(o, c) - rng.integers(0, 8, n) / 10
+    return pd.DataFrame({"symbol": np.repeat(["AAA", "BBB"], n // 2),
+                         "time": np.tile(pd.date_range("2026-02-16 09:00", periods=n // 2, freq="1min"), 2),
+                         "open": o, "high": h, "low": l, "close": c})
+
+
+def test_sweep_counts_match_lower_wick_signal():
+    bars = make_bars()
+    # ngưỡng lấy đúng bằng giá trị tỉ lệ của vài nến: nến nằm đúng trên ngưỡng phải được đếm (>=),
+    # lệch 1 bậc trong histogram hạng sẽ làm sai số đếm
+    f = compute_features(*(bars[c].to_numpy() for c in ["open", "high", "low", "close"]))
+    grids = []
+    for name in ["lower_wick_pct_range", "lower_wick_mult_body", "close_position"]:
+        vals, counts = np.unique(f[name], return_counts=True)
+        grids.append(list(vals[counts > 1][[2, 5, 9]]))
+    fwd = forward_return(bars, 3)
+    res = sweep_lower_wick(bars, *grids, bullish_grid=[False, True], fwd=fwd)
+    assert len(res) == 3 * 3 * 3 * 2
+
+    for a, b, c, bull in itertools.product(*grids, [False, True]):
+        hit = lower_wick_signal(bars, min_lower_wick_pct_range=a, min_lower_wick_mult_body=b,
+                                min_close_position=c, require_bullish_close=bull)
+        row = res[(res["min_lower_wick_pct_range"] == a) & (res["min_lower_wick_mult_body"] == b)
+                  & (res["min_close_position"] == c) & (res["require_bullish_close"] == bull)].iloc[0]
+        assert row["hits"] == hit.sum(), (a, b, c, bull)
+        f = fwd[hit & np.isfinite(fwd)]
+        assert row["fwd_count"] == len(f)
+        if len(f):
+            assert np.isclose(row["mean_fwd_return"], f.mean())
+            assert np.isclose(row["win_rate"], (f > 0).mean())
+    assert res["hits"].max() > 0
+
+
+def test_forward_return_stays_within_symbol():
+    bars = make_bars(n=10)
+    fwd = forward_return(bars, 3)
+    close = bars["close"].to_numpy()
+    assert np.isclose(fwd[0], close[3] / close[0] - 1)
+    # 3 nến cuối của mỗi mã không có đủ nến phía sau
+    assert np.isnan(fwd[2:5]).all() and np.isnan(fwd[7:]).all()
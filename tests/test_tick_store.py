@@ -0,0 +1,60 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from bench import make_snapshot_folder, write_snapshot
+from ohlc import build_ticks_from_folder
+from tick_store import compact_folder, read_ticks
+
+
+def as_plain(df):
+    df = df.assign(symbol=df["symbol"].astype(str), price=df["price"].astype("float64"))
+    return df.sort_values(["symbol", "time"]).reset_index(drop=True)
+
+
+def test_compact_round_trip_matches_folder(tmp_path):
+    src, store = tmp_path / "src", tmp_path / "store"
+    make_snapshot_folder(str(src), n_symbols=12, n_snapshots=30, n_days=2, start="0930")
+
+    n = compact_folder(str(src), str(store))
+    ref = build_ticks_from_folder(str(src), change_only=False)
+    assert n == len(ref)
+    assert sorted(os.listdir(store)) == ["_manifest.json", "date=20260216", "date=20260217"]
+    pd.testing.assert_frame_equal(as_plain(read_ticks(str(store))), as_plain(ref))
+
+    # chạy lại không có file mới -> không ghi gì thêm
+    assert compact_folder(str(src), str(store)) == 0
+    pd.testing.assert_frame_equal(as_plain(read_ticks(str(store))), as_plain(ref))
+
+    day = read_ticks(str(store), start_date="20260217", end_date="20260217", symbols=["S0003"])
+    pd.testing.assert_frame_equal(
+        as_plain(day),
+        as_plain(ref[(ref["symbol"] == "S0003") & (ref["time"].dt.day == 17)]),
+    )
+
+
+def test_rewritten_source_rebuilds_its_date_partition(tmp_path):
+    src, store = tmp_path / "src", tmp_path / "store"
+    paths = make_snapshot_folder(str(src), n_symbols=12, n_snapshots=30, n_days=2, start="0930")
+    compact_folder(str(src), str(store))
+    other_day = sorted(os.listdir(store / "date=20260216"))
+
+    # ghi lại 1 file của ngày 17/02 với giá khác hẳn
+    target = paths[40]
+    symbols = [f"S{i:04d}" for i in range(12)]
+    write_snapshot(target, symbols, np.full(12, 999.0), np.random.default_rng(1))
+    st = os.stat(target)
+    os.utime(target, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+    compact_folder(str(src), str(store))
+    got = as_plain(read_ticks(str(store)))
+    ref = as_plain(build_ticks_from_folder(str(src), change_only=False))
+    pd.testing.assert_frame_equal(got, ref)
+    assert (got["price"] == 999.0).any()
+    assert not got.duplicated(["symbol", "time"]).any()
+    # phân vùng ngày không bị ghi lại thì giữ nguyên
+    assert sorted(os.listdir(store / "date=20260216")) == other_day
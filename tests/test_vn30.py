@@ -0,0 +1,106 @@
+import pytest
+import pandas as pd
+
+import vn30
+
+
+class StubListing:
+    def symbols_by_group(self, group):
+        return pd.Series(["AAA", "BBB"])
+
+
+class StubQuote:
+    def __init__(self, sym):
+        self.sym = sym
+
+    def history(self, symbol, start, end, interval):
+        if symbol == "BBB":
+            raise ValueError("no data")
+        return pd.DataFrame({
+            "time": pd.date_range("2026-01-01", periods=5, freq="D"),
+            "open": 1.0, "high": 2.0, "low": 0.5, "close": 1.5, "volume": 100,
+        })
+
+
+def test_main_writes_files_named_after_group(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(vn30, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(vn30, "RATE_PER_SEC", 1000)
+
+    vn30.main(group="HNX30", listing=StubListing(), quote_factory=StubQuote)
+
+    assert (tmp_path / f"HNX30_daily_last{vn30.TAKE_LAST_N}.csv").exists()
+    assert (tmp_path / "HNX30_failed.csv").exists()
+    assert not (tmp_path / f"VN30_daily_last{vn30.TAKE_LAST_N}.csv").exists()
+    out = pd.read_csv(tmp_path / f"HNX30_daily_last{vn30.TAKE_LAST_N}.csv")
+    assert out["symbol"].unique().tolist() == ["AAA"]
+
+
+class FeedQuote:
+    """Quote giả: trả về các phiên trong `bars` từ ngày start, ghi lại các start đã gọi."""
+
+    def __init__(self, bars):
+        self.bars = bars
+        self.starts = []
+
+    def __call__(self, sym):
+        return self
+
+    def history(self, symbol, start, end, interval):
+        self.starts.append(start)
+        df = self.bars[self.bars["time"] >= pd.Timestamp(start)]
+        return df.assign(time=df["time"].dt.strftime("%Y-%m-%d"))
+
+
+def daily_bars(closes, start="2026-03-02"):
+    return pd.DataFrame({
+        "time": pd.date_range(start, periods=len(closes), freq="D"),
+        "open": closes, "high": closes, "low": closes, "close": closes, "volume": 100,
+    })
+
+
+def run(feed, now):
+    return vn30.fetch_symbol("AAA", vn30.RateLimiter(rate=1000), quote_factory=feed, now=pd.Timestamp(now).to_pydatetime())
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(vn30, "CACHE_DIR", str(tmp_path / "cache"))
+
+
+def test_incremental_fetch_starts_from_last_cached_session(cache_dir):
+    feed = FeedQuote(daily_bars([10.0, 11.0, 12.0]))
+    run(feed, "2026-03-10 16:00")
+    feed.bars = daily_bars([10.0, 11.0, 12.0, 13.0, 14.0])
+    out = run(feed, "2026-03-10 16:00")
+
+    assert feed.starts == [vn30.START, "2026-03-04"]
+    assert out["close"].tolist() == [10.0, 11.0, 12.0, 13.0, 14.0]
+    assert vn30.load_cache("AAA")["close"].tolist() == [10.0, 11.0, 12.0, 13.0, 14.0]
+
+
+def test_partial_session_not_cached_during_trading_hours(cache_dir):
+    # 10:30 ngày 04/03: nến ngày 04/03 còn đang chạy
+    feed = FeedQuote(daily_bars([10.0, 11.0, 12.5]))
+    out = run(feed, "2026-03-04 10:30")
+    assert out["close"].tolist() == [10.0, 11.0, 12.5]
+    assert vn30.load_cache("AAA")["time"].max() == pd.Timestamp("2026-03-03")
+
+    # sau giờ đóng cửa nến 04/03 chốt ở giá khác -> không được coi là điều chỉnh giá
+    feed.bars = daily_bars([10.0, 11.0, 12.0])
+    out = run(feed, "2026-03-04 15:30")
+    assert feed.starts == [vn30.START, "2026-03-03"]
+    assert out["close"].tolist() == [10.0, 11.0, 12.0]
+    assert vn30.load_cache("AAA")["time"].max() == pd.Timestamp("2026-03-04")
+
+
+def test_adjusted_overlap_triggers_full_refetch(cache_dir):
+    feed = FeedQuote(daily_bars([10.0, 11.0, 12.0]))
+    run(feed, "2026-03-10 16:00")
+    # chia cổ tức: toàn bộ lịch sử bị điều chỉnh xuống
+    feed.bars = daily_bars([9.0, 9.9, 10.8, 11.0])
+    out = run(feed, "2026-03-10 16:00")
+
+    assert feed.starts == [vn30.START, "2026-03-04", vn30.START]
+    assert out["close"].tolist() == [9.0, 9.9, 10.8, 11.0]
+    assert vn30.load_cache("AAA")["close"].tolist() == [9.0, 9.9, 10.8, 11.0]
@@ -0,0 +1,82 @@
+import os
+import threading
+
+import pandas as pd
+
+import writer
+from writer import AsyncWriter
+
+
+class BlockingFrame(pd.DataFrame):
+    """DataFrame mà to_csv chờ `gate` -> giữ thread ghi bận trong lúc test gửi thêm việc."""
+    gate = threading.Event()
+
+    @property
+    def _constructor(self):
+        return pd.DataFrame
+
+    def to_csv(self, *args, **kwargs):
+        self.gate.wait(5)
+        return super().to_csv(*args, **kwargs)
+
+
+class BrokenFrame(pd.DataFrame):
+    """DataFrame ghi được nửa file tạm rồi lỗi."""
+
+    @property
+    def _constructor(self):
+        return pd.DataFrame
+
+    def to_csv(self, path, *args, **kwargs):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("a\n1\n")
+        raise OSError("disk full")
+
+
+def leftovers(folder):
+    return [n for n in os.listdir(folder) if n.endswith(".tmp")]
+
+
+def test_repeated_writes_to_one_target_keep_last_payload(tmp_path):
+    w = AsyncWriter()
+    try:
+        BlockingFrame.gate.clear()
+        w.write(BlockingFrame({"a": [0]}), str(tmp_path / "busy.csv"))
+        target = str(tmp_path / "out.csv")
+        for i in range(1, 6):
+            w.write(pd.DataFrame({"a": [i] * i}), target)
+        BlockingFrame.gate.set()
+        assert w.flush(5)
+    finally:
+        BlockingFrame.gate.set()
+        w.close(5)
+
+    assert w.coalesced == 4
+    assert w.written == 2
+    assert pd.read_csv(target)["a"].tolist() == [5] * 5
+    assert leftovers(tmp_path) == []
+
+
+def test_failed_write_keeps_old_file_and_no_tmp(tmp_path, monkeypatch):
+    target = str(tmp_path / "out.csv")
+    writer.atomic_write_csv(pd.DataFrame({"a": [1, 2]}), target)
+
+    w = AsyncWriter()
+    try:
+        w.write(BrokenFrame({"a": [9]}), target)
+        assert w.flush(5)
+        # đổi tên lỗi (file đích bị khoá quá số lần thử lại)
+        monkeypatch.setattr(writer, "REPLACE_RETRIES", 0)
+
+        def locked(src, dst):
+            raise PermissionError("locked")
+
+        monkeypatch.setattr(writer.os, "replace", locked)
+        w.write(pd.DataFrame({"a": [7]}), target)
+        assert w.flush(5)
+    finally:
+        w.close(5)
+
+    assert w.errors == 2
+    assert pd.read_csv(target)["a"].tolist() == [1, 2]
+    assert leftovers(tmp_path) == []
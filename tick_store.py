@@ -0,0 +1,211 @@
+import os
+import json
+import argparse
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from ohlc import FOLDER, TIMEFRAME, hhmm_to_time, export_sessions, make_ticks, parse_ts_from_filename
+from ingest import TickIngestor
+
+# ======================
+# CONFIG
+# ======================
+# Kho tick dạng cột: <STORE_DIR>/date=YYYYMMDD/part-<ts đầu>_<ts cuối>.parquet
+STORE_DIR = os.path.join(FOLDER, "tick_store")
+MANIFEST_NAME = "_manifest.json"
+
+SCHEMA = pa.schema([
+    ("time", pa.timestamp("ns")),
+    ("symbol", pa.dictionary(pa.int16(), pa.string())),
+    ("price", pa.float32()),
+])
+
+
+# ======================
+# Helpers
+# ======================
+def _load_manifest(store_dir: str) -> dict:
+    path = os.path.join(store_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return {k: tuple(v) for k, v in json.load(f).items()}
+
+
+def _save_manifest(store_dir: str, manifest: dict):
+    path = os.path.join(store_dir, MANIFEST_NAME)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, path)
+
+
+def _to_table(ticks: pd.DataFrame) -> pa.Table:
+    return pa.Table.from_pandas(make_ticks(ticks), schema=SCHEMA, preserve_index=False)
+
+
+def _date_of(path: str) -> str:
+    return parse_ts_from_filename(path).strftime("%Y%m%d")
+
+
+def compact_folder(folder: str = FOLDER, store_dir: str = STORE_DIR, delete_sources: bool = False) -> int:
+    """
+    Chuyển các snapshot CSV mới (chưa compact) vào kho Parquet phân vùng theo ngày.
+    Trả về số tick đã ghi.
+
+    Kho giữ toàn bộ tick (không qua ChangeFilter) để dựng được nến mọi khung, kể cả khung nhỏ hơn
+    BASE_TIMEFRAME. File nguồn đã compact mà bị ghi lại -> dựng lại cả phân vùng ngày của nó
+    từ các file nguồn của ngày đó (không append thêm, tránh trùng tick).
+    """
+    os.makedirs(store_dir, exist_ok=True)
+
+    ingestor = TickIngestor(folder, change_only=False)
+    compacted = _load_manifest(store_dir)
+    ingestor.manifest.update(compacted)
+    # không prune: manifest nhớ mọi file đã vào kho, kể cả file nguồn đã xoá
+    found = ingestor.scan()
+
+    # file đã compact bị ghi lại -> phân vùng ngày đó phải dựng lại
+    rebuild = set()
+    skip = set()
+    for path, sig in found:
+        if path in compacted:
+            date = _date_of(path)
+            missing = [p for p in compacted if _date_of(p) == date and not os.path.exists(p)]
+            if missing:
+                # nguồn cũ đã bị xoá (--delete-sources), không dựng lại được -> giữ phân vùng cũ, bỏ thay đổi này
+                print(f"Bỏ qua {os.path.basename(path)} đã ghi lại: thiếu {len(missing)} file nguồn để dựng lại ngày {date}")
+                ingestor.manifest[path] = sig
+                skip.add(path)
+                continue
+            rebuild.add(date)
+
+    found = [x for x in found if x[0] not in skip]
+    if rebuild:
+        paths = {p for p, _ in found}
+        for p, sig in ingestor.manifest.items():
+            if p not in paths and _date_of(p) in rebuild:
+                found.append((p, sig))
+        found.sort(key=lambda x: os.path.basename(x[0]))
+    new = ingestor.ingest(found)
+
+    written = 0
+    stale = {date: [e.path for e in os.scandir(os.path.join(store_dir, f"date={date}")) if e.name.endswith(".parquet")]
+             for date in rebuild if os.path.isdir(os.path.join(store_dir, f"date={date}"))}
+    if not new.empty:
+        new = new.sort_values(["time", "symbol"])
+        dates = new["time"].dt.strftime("%Y%m%d")
+        for date, part in new.groupby(dates, sort=True):
+            part_dir = os.path.join(store_dir, f"date={date}")
+            os.makedirs(part_dir, exist_ok=True)
+            first = part["time"].iloc[0].strftime("%H%M%S")
+            last = part["time"].iloc[-1].strftime("%H%M%S")
+            out_path = os.path.join(part_dir, f"part-{first}_{last}.parquet")
+            i = 1
+            while os.path.exists(out_path):
+                out_path = os.path.join(part_dir, f"part-{first}_{last}_{i}.parquet")
+                i += 1
+            pq.write_table(_to_table(part), out_path)
+            written += len(part)
+
+    # phân vùng dựng lại: file mới đã ghi xong mới xoá file cũ
+    for paths in stale.values():
+        for path in paths:
+            os.remove(path)
+
+    _save_manifest(store_dir, ingestor.manifest)
+
+    if delete_sources:
+        for path in ingestor.manifest:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    return written
+
+
+def read_ticks(
+    store_dir: str = STORE_DIR,
+    start_date: str | None = None,
+    end_date: str | None = None,
+    start_hhmm: str | None = None,
+    end_hhmm: str | None = None,
+    symbols: list[str] | None = None,
+    columns: list[str] | None = None,
+) -> pd.DataFrame:
+    """
+    Đọc tick từ kho, chỉ quét các phân vùng ngày [start_date, end_date] và các cột cần.
+    Kết quả cùng định dạng với build_ticks_from_folder() (sắp theo symbol, time).
+    """
+    cols = columns or ["time", "symbol", "price"]
+    if not os.path.isdir(store_dir):
+        return pd.DataFrame(columns=cols)
+
+    dataset = ds.dataset(
+        store_dir,
+        format="parquet",
+        partitioning=ds.partitioning(pa.schema([("date", pa.string())]), flavor="hive"),
+        exclude_invalid_files=True,
+    )
+
+    flt = None
+    if start_date is not None:
+        flt = ds.field("date") >= start_date
+    if end_date is not None:
+        f = ds.field("date") <= end_date
+        flt = f if flt is None else flt & f
+    if symbols is not None:
+        f = ds.field("symbol").isin([s.upper() for s in symbols])
+        flt = f if flt is None else flt & f
+
+    read_cols = list(cols)
+    if (start_hhmm or end_hhmm) and "time" not in read_cols:
+        read_cols.append("time")
+
+    df = dataset.to_table(columns=read_cols, filter=flt).to_pandas()
+    if df.empty:
+        return pd.DataFrame(columns=cols)
+
+    if start_hhmm or end_hhmm:
+        tod = df["time"].dt.time
+        mask = pd.Series(True, index=df.index)
+        if start_hhmm:
+            mask &= tod >= hhmm_to_time(start_hhmm)
+        if end_hhmm:
+            mask &= tod < hhmm_to_time(end_hhmm)
+        df = df.loc[mask]
+
+    sort_cols = [c for c in ["symbol", "time"] if c in df.columns]
+    if sort_cols:
+        df = df.sort_values(sort_cols)
+    return df[cols].reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Kho tick Parquet cho snapshot iBoard")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("compact", help="Gom snapshot CSV mới vào kho")
+    p.add_argument("--folder", default=FOLDER)
+    p.add_argument("--store", default=STORE_DIR)
+    p.add_argument("--delete-sources", action="store_true")
+
+    p = sub.add_parser("ohlc", help="Xuất OHLC theo phiên từ kho")
+    p.add_argument("--folder", default=FOLDER)
+    p.add_argument("--store", default=STORE_DIR)
+    p.add_argument("--start", default=None, help="YYYYMMDD")
+    p.add_argument("--end", default=None, help="YYYYMMDD")
+    p.add_argument("--timeframe", default=TIMEFRAME)
+
+    args = parser.parse_args()
+
+    if args.cmd == "compact":
+        n = compact_folder(args.folder, args.store, delete_sources=args.delete_sources)
+        print(f"OK: đã compact {n} tick -> {args.store}")
+    else:
+        data = read_ticks(args.store, start_date=args.start, end_date=args.end)
+        export_sessions(args.folder, args.timeframe, data=data)
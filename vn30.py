@@ -1,24 +1,40 @@
+import os
 import time
 import random
+import threading
+from datetime import datetime, time as dtime
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
-from vnstock import Listing, Quote
 
 # ================= CONFIG =================
 SOURCE = "vci"          # nếu vẫn bị limit, đổi "tcbs"
+GROUP = "VN30"          # nhóm mã lấy từ Listing.symbols_by_group (VN30, VN100, HOSE, ...)
 START = "2025-01-01"    # lấy dư để chắc chắn đủ >= 60 phiên
 INTERVAL = "1D"
 TAKE_LAST_N = 60
 
-SLEEP_EACH_SYMBOL = (1.2, 2.2)   # nghỉ ngẫu nhiên giữa các mã (giây)
-PAUSE_BETWEEN_BATCH = 120        # nghỉ giữa 2 lượt (giây) -> có thể tăng 180 nếu vẫn dính limit
+# Giới hạn request: token bucket + vài luồng song song
+MAX_WORKERS = 3
+RATE_PER_SEC = 0.5      # số request trung bình mỗi giây
+BURST = 3               # số request được bắn liền nhau khi bucket đầy
+MIN_RATE_PER_SEC = 0.05
 
-OUT_FINAL = "VN30_daily_last60.csv"
-OUT_BATCH1 = "VN30_batch1.csv"
-OUT_BATCH2 = "VN30_batch2.csv"
-OUT_FAILED = "VN30_failed.csv"
+# Bị rate limit -> chờ lũy thừa (giây) rồi thử lại, đồng thời giảm tốc độ chung
+MAX_RETRIES = 5
+BACKOFF_BASE = 10
+BACKOFF_MAX = 180
+
+# Cache lịch sử theo từng mã: mỗi lần chạy chỉ tải các phiên sau ngày cuối đã lưu
+CACHE_DIR = "history_cache"
+ADJUST_RTOL = 1e-4      # giá phiên cuối lệch hơn mức này -> có điều chỉnh (chia cổ tức, tách cổ phiếu...) -> tải lại
+MARKET_CLOSE = "1500"   # trước giờ này nến ngày hôm nay chưa chốt -> không lưu vào cache
+
+# tên file kết quả theo nhóm mã đang chạy (main(group=...))
+OUT_FINAL = "{group}_daily_last{take_last}.csv"
+OUT_FAILED = "{group}_failed.csv"
 # ==========================================
 
-def normalize_history(df: pd.DataFrame, symbol: str) -> pd.DataFrame:
+def normalize_history(df: pd.DataFrame, symbol: str, take_last: int | None = TAKE_LAST_N) -> pd.DataFrame:
     df = df.copy()
 
     # chuẩn hoá time/date
@@ -36,9 +52,10 @@ def normalize_history(df: pd.DataFrame, symbol: str) -> pd.DataFrame:
 
     df = (df[keep]
           .dropna(subset=["time", "close", "volume"])
-          .sort_values("time")
-          .tail(TAKE_LAST_N)
-          .reset_index(drop=True))
+          .sort_values("time"))
+    if take_last is not None:
+        df = df.tail(take_last)
+    df = df.reset_index(drop=True)
 
     df.insert(0, "symbol", symbol)
 
@@ -49,77 +66,206 @@ def normalize_history(df: pd.DataFrame, symbol: str) -> pd.DataFrame:
 
     return df
 
-def fetch_batch(symbols, batch_name: str):
-    quote = Quote(source=SOURCE, symbol=symbols[0])  # init; khi history sẽ truyền symbol cụ thể
-    batch_frames = []
-    failed = []
+class RateLimiter:
+    """
+    Token bucket dùng chung cho các luồng; tự giảm tốc khi bị rate limit và tăng dần lại khi ổn.
+    """
+
+    def __init__(self, rate=None, burst=None, min_rate=None):
+        self.max_rate = rate or RATE_PER_SEC
+        self.rate = self.max_rate
+        self.min_rate = min_rate or MIN_RATE_PER_SEC
+        self.burst = burst or BURST
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if now >= self.blocked_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self.blocked_until - now, (1 - self.tokens) / self.rate)
+
+            time.sleep(wait + random.uniform(0, 0.2))
+
+    def on_success(self):
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate * 1.1)
+
+    def on_rate_limited(self, delay):
+        # dừng tất cả các luồng trong `delay` giây và giảm tốc độ một nửa
+        with self.lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = 0
+            self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
 
-    for i, sym in enumerate(symbols, 1):
+def is_rate_limited(e: Exception) -> bool:
+    msg = str(e).lower()
+    return any(k in msg for k in ("429", "rate limit", "too many", "quá nhiều", "limit exceeded"))
+
+def cache_path(sym):
+    return os.path.join(CACHE_DIR, f"{sym}.parquet")
+
+def load_cache(sym):
+    path = cache_path(sym)
+    if not os.path.exists(path):
+        return None
+    try:
+        return pd.read_parquet(path)
+    except Exception:
+        return None
+
+def save_cache(sym, df):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = cache_path(sym)
+    tmp = path + ".tmp"
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+
+def cache_cutoff(now: datetime | None = None) -> pd.Timestamp:
+    """
+    Chỉ cache các phiên có time < mốc này: phiên hôm nay chỉ được lưu sau MARKET_CLOSE,
+    để lần chạy sau không so nến tạm (đang giao dịch) với nến đã chốt mà tưởng là có điều chỉnh giá.
+    """
+    now = now or datetime.now()
+    today = pd.Timestamp(now.date())
+    if now.time() >= dtime(int(MARKET_CLOSE[:2]), int(MARKET_CLOSE[2:])):
+        return today + pd.Timedelta(days=1)
+    return today
+
+def default_quote_factory(sym):
+    # import khi cần: module vẫn import được (và test với quote_factory giả) khi không có vnstock
+    from vnstock import Quote
+
+    return Quote(source=SOURCE, symbol=sym)
+
+def fetch_history(sym, start, limiter, quote_factory=None):
+    quote_factory = quote_factory or default_quote_factory
+
+    for attempt in range(MAX_RETRIES + 1):
+        limiter.acquire()
         try:
-            df = quote.history(symbol=sym, start=START, end=None, interval=INTERVAL)
-            if df is None or len(df) == 0:
+            df = quote_factory(sym).history(symbol=sym, start=start, end=None, interval=INTERVAL)
+        except Exception as e:
+            if not is_rate_limited(e) or attempt == MAX_RETRIES:
+                raise
+            delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt) * random.uniform(0.8, 1.2)
+            limiter.on_rate_limited(delay)
+            print(f"[{sym}] Bị rate limit, chờ {delay:.0f}s rồi thử lại ({attempt + 1}/{MAX_RETRIES})")
+            continue
+
+        limiter.on_success()
+        if df is None or len(df) == 0:
+            return None
+        return normalize_history(df, sym, take_last=None)
+
+def is_adjusted(cached_row, fresh_row):
+    for c in ["open", "high", "low", "close"]:
+        a, b = float(cached_row[c]), float(fresh_row[c])
+        if abs(a - b) > ADJUST_RTOL * max(abs(a), abs(b), 1e-9):
+            return True
+    return False
+
+def fetch_symbol(sym, limiter, quote_factory=None, use_cache=True, now=None):
+    cached = load_cache(sym) if use_cache else None
+
+    if cached is None or cached.empty:
+        full = fetch_history(sym, START, limiter, quote_factory)
+        if full is None:
+            raise ValueError("Empty data returned")
+    else:
+        # tải lại từ phiên cuối đã lưu (gồm cả phiên đó để so xem có điều chỉnh giá không)
+        last = cached["time"].max()
+        fresh = fetch_history(sym, last.strftime("%Y-%m-%d"), limiter, quote_factory)
+
+        overlap = fresh[fresh["time"] == last] if fresh is not None else None
+        if overlap is not None and not overlap.empty and is_adjusted(cached[cached["time"] == last].iloc[-1], overlap.iloc[-1]):
+            print(f"[{sym}] Giá đã điều chỉnh (sự kiện doanh nghiệp) -> tải lại toàn bộ")
+            full = fetch_history(sym, START, limiter, quote_factory)
+            if full is None:
                 raise ValueError("Empty data returned")
+        elif fresh is None or fresh.empty:
+            full = cached
+        else:
+            full = (pd.concat([cached[cached["time"] < fresh["time"].min()], fresh], ignore_index=True)
+                    .drop_duplicates("time", keep="last")
+                    .sort_values("time")
+                    .reset_index(drop=True))
 
-            df = normalize_history(df, sym)
-            batch_frames.append(df)
+    if use_cache:
+        # cache chỉ giữ phiên đã chốt; kết quả trả về vẫn có nến hôm nay
+        save_cache(sym, full[full["time"] < cache_cutoff(now)].reset_index(drop=True))
+    return full.tail(TAKE_LAST_N).reset_index(drop=True)
 
-            print(f"[{batch_name}] OK {sym} ({i}/{len(symbols)}) rows={len(df)}")
+def fetch_group(symbols, workers=None, limiter=None, quote_factory=None):
+    workers = workers or MAX_WORKERS
+    limiter = limiter or RateLimiter()
+    frames = []
+    failed = []
+    done = 0
+    lock = threading.Lock()
 
+    def run(sym):
+        nonlocal done
+        try:
+            df = fetch_symbol(sym, limiter, quote_factory)
         except Exception as e:
-            failed.append((sym, f"{batch_name}: {e}"))
-            print(f"[{batch_name}] FAIL {sym} ({i}/{len(symbols)}): {e}")
+            with lock:
+                done += 1
+                failed.append((sym, str(e)))
+                print(f"FAIL {sym} ({done}/{len(symbols)}): {e}")
+            return
+        with lock:
+            done += 1
+            frames.append(df)
+            print(f"OK {sym} ({done}/{len(symbols)}) rows={len(df)}")
+
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        list(ex.map(run, symbols))
+
+    return frames, failed
+
+def get_group_symbols(group=GROUP, listing=None):
+    if listing is None:
+        from vnstock import Listing
+
+        listing = Listing(source=SOURCE)
+    syms = listing.symbols_by_group(group)
+    syms = syms.tolist() if hasattr(syms, "tolist") else list(syms)
+    return [str(s).strip().upper() for s in syms if str(s).strip()]
+
+def main(group=GROUP, listing=None, quote_factory=None):
+    print(f"Đang lấy danh sách {group}...")
+    symbols = get_group_symbols(group, listing)
+    print(f"Tổng số mã {group}: {len(symbols)}")
+
+    out_final = OUT_FINAL.format(group=group, take_last=TAKE_LAST_N)
+    out_failed = OUT_FAILED.format(group=group)
+
+    t0 = time.time()
+    frames, failed = fetch_group(symbols, quote_factory=quote_factory)
+
+    if frames:
+        final_df = pd.concat(frames, ignore_index=True).sort_values(["symbol", "time"]).reset_index(drop=True)
+        final_df.to_csv(out_final, index=False, encoding="utf-8-sig")
+        print(f"\n✅ Đã lưu file cuối: {out_final} | rows={len(final_df)} | symbols={final_df['symbol'].nunique()}")
+    else:
+        print("\n❌ Không có dữ liệu nào được tải.")
 
-        # nghỉ giữa từng mã để tránh burst
-        time.sleep(random.uniform(*SLEEP_EACH_SYMBOL))
+    # Lưu lỗi (nếu có)
+    if failed:
+        pd.DataFrame(failed, columns=["symbol", "error"]).to_csv(out_failed, index=False, encoding="utf-8-sig")
+        print(f"⚠️ Có {len(failed)} mã lỗi -> xem {out_failed}")
 
-    return batch_frames, failed
+    print(f"\nHoàn tất sau {time.time() - t0:.0f}s.")
 
 # ================= MAIN =================
-print("Đang lấy danh sách VN30...")
-listing = Listing(source=SOURCE)
-vn30 = listing.symbols_by_group("VN30")
-symbols = vn30.tolist() if hasattr(vn30, "tolist") else list(vn30)
-symbols = [str(s).strip().upper() for s in symbols if str(s).strip()]
-print(f"Tổng số mã VN30: {len(symbols)}")
-
-first = symbols[:15]
-second = symbols[15:]
-
-print("\n=== LƯỢT 1/2: 15 mã đầu ===")
-frames1, failed1 = fetch_batch(first, "BATCH1")
-if frames1:
-    df1 = pd.concat(frames1, ignore_index=True)
-    df1.to_csv(OUT_BATCH1, index=False, encoding="utf-8-sig")
-    print(f"Đã lưu tạm: {OUT_BATCH1} | rows={len(df1)} | symbols={df1['symbol'].nunique()}")
-
-print(f"\nNghỉ {PAUSE_BETWEEN_BATCH}s trước khi chạy lượt 2...")
-time.sleep(PAUSE_BETWEEN_BATCH)
-
-print("\n=== LƯỢT 2/2: 15 mã sau ===")
-frames2, failed2 = fetch_batch(second, "BATCH2")
-if frames2:
-    df2 = pd.concat(frames2, ignore_index=True)
-    df2.to_csv(OUT_BATCH2, index=False, encoding="utf-8-sig")
-    print(f"Đã lưu tạm: {OUT_BATCH2} | rows={len(df2)} | symbols={df2['symbol'].nunique()}")
-
-# Gộp kết quả
-all_frames = []
-if frames1:
-    all_frames.append(pd.concat(frames1, ignore_index=True))
-if frames2:
-    all_frames.append(pd.concat(frames2, ignore_index=True))
-
-if all_frames:
-    final_df = pd.concat(all_frames, ignore_index=True)
-    final_df.to_csv(OUT_FINAL, index=False, encoding="utf-8-sig")
-    print(f"\n✅ Đã lưu file cuối: {OUT_FINAL} | rows={len(final_df)} | symbols={final_df['symbol'].nunique()}")
-else:
-    print("\n❌ Không có dữ liệu nào được tải.")
-
-# Lưu lỗi (nếu có)
-failed = failed1 + failed2
-if failed:
-    pd.DataFrame(failed, columns=["symbol", "error"]).to_csv(OUT_FAILED, index=False, encoding="utf-8-sig")
-    print(f"⚠️ Có {len(failed)} mã lỗi -> xem {OUT_FAILED}")
-
-print("\nHoàn tất.")
+if __name__ == "__main__":
+    main()
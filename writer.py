@@ -0,0 +1,171 @@
+import os
+import time
+import threading
+
+import pandas as pd
+
+# ======================
+# CONFIG
+# ======================
+# Windows: os.replace lỗi PermissionError khi file đích đang mở (Excel...) -> thử lại vài lần
+REPLACE_RETRIES = 20
+REPLACE_RETRY_SECONDS = 0.25
+
+# Ghi thêm bản nhị phân cạnh CSV (cùng tên, đuôi .parquet) cho dashboard đọc nhanh; None = tắt
+SIDECAR_FORMAT = None
+
+
+# ======================
+# Helpers
+# ======================
+def replace_with_retry(src: str, dst: str, retries: int | None = None, delay: float | None = None):
+    """
+    os.replace (atomic trên cùng ổ đĩa), thử lại nếu file đích đang bị khoá.
+    """
+    retries = REPLACE_RETRIES if retries is None else retries
+    delay = REPLACE_RETRY_SECONDS if delay is None else delay
+    for i in range(retries + 1):
+        try:
+            os.replace(src, dst)
+            return
+        except PermissionError:
+            if i == retries:
+                raise
+            time.sleep(delay)
+
+
+def sidecar_path(path: str, fmt: str = "parquet") -> str:
+    return os.path.splitext(path)[0] + f".{fmt}"
+
+
+def atomic_write_csv(df: pd.DataFrame, path: str, sidecar: str | None = None, **to_csv_kwargs):
+    """
+    Ghi CSV ra file tạm cùng thư mục rồi đổi tên đè lên file đích:
+    người đọc luôn thấy file cũ hoặc file mới hoàn chỉnh, không bao giờ thấy file trống/ghi dở.
+    """
+    to_csv_kwargs.setdefault("index", False)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        df.to_csv(tmp, **to_csv_kwargs)
+        replace_with_retry(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+    if sidecar == "parquet":
+        out = sidecar_path(path, sidecar)
+        tmp = f"{out}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            df.to_parquet(tmp, index=False)
+            replace_with_retry(tmp, out)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+
+def append_csv(df: pd.DataFrame, path: str, **to_csv_kwargs):
+    """
+    Ghi thêm dòng vào cuối CSV; header chỉ ghi khi file chưa có hoặc đang trống.
+    """
+    header = not os.path.exists(path) or os.path.getsize(path) == 0
+    to_csv_kwargs.setdefault("index", False)
+    df.to_csv(path, mode="a", header=header, **to_csv_kwargs)
+
+
+class AsyncWriter:
+    """
+    Thread nền ghi các bảng đã tính xong ra đĩa, để vòng lặp chính không chờ I/O.
+
+    - write(): ghi đè cả file (atomic). Nhiều lần write() cùng 1 file chưa kịp ghi -> chỉ ghi bản cuối.
+    - append(): ghi thêm dòng. Nhiều lần append() cùng 1 file chưa kịp ghi -> gộp thành 1 lần ghi.
+    - append_lines(): như append() nhưng cho dòng text có sẵn (vd. JSON lines).
+    Các file được ghi theo thứ tự được gửi lần đầu.
+    """
+
+    def __init__(self, sidecar: str | None = SIDECAR_FORMAT):
+        if sidecar == "parquet":
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                print("Không có pyarrow, bỏ ghi file .parquet kèm theo.")
+                sidecar = None
+        self.sidecar = sidecar
+        self._pending = {}  # path -> [mode, df, to_csv_kwargs]
+        self._cond = threading.Condition()
+        self._busy = False
+        self._closed = False
+        self.written = 0
+        self.coalesced = 0
+        self.errors = 0
+        self._thread = threading.Thread(target=self._run, name="writer", daemon=True)
+        self._thread.start()
+
+    def write(self, df: pd.DataFrame, path: str, **to_csv_kwargs):
+        self._submit("w", df, path, to_csv_kwargs)
+
+    def append(self, df: pd.DataFrame, path: str, **to_csv_kwargs):
+        if not df.empty:
+            self._submit("a", df, path, to_csv_kwargs)
+
+    def append_lines(self, lines: list[str], path: str):
+        if lines:
+            self._submit("l", list(lines), path, {})
+
+    def _submit(self, mode: str, df: pd.DataFrame | list[str], path: str, kwargs: dict):
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("AsyncWriter đã đóng")
+            old = self._pending.get(path)
+            if old is None:
+                self._pending[path] = [mode, df, kwargs]
+            else:
+                self.coalesced += 1
+                if mode == "a":
+                    # ghi đè/append đang chờ + append mới = 1 lần ghi, giữ kiểu của lần đầu
+                    old[1] = pd.concat([old[1], df], ignore_index=True)
+                elif mode == "l":
+                    old[1].extend(df)
+                else:
+                    self._pending[path] = [mode, df, kwargs]
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                path = next(iter(self._pending))
+                mode, df, kwargs = self._pending.pop(path)
+                self._busy = True
+
+            try:
+                if mode == "w":
+                    atomic_write_csv(df, path, sidecar=self.sidecar, **kwargs)
+                elif mode == "l":
+                    with open(path, "a", encoding="utf-8") as f:
+                        f.writelines(df)
+                else:
+                    append_csv(df, path, **kwargs)
+                self.written += 1
+            except Exception as e:
+                self.errors += 1
+                print(f"Lỗi ghi file {path}: {e}")
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """
+        Chờ ghi hết các file đang chờ. Trả về False nếu hết timeout.
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending and not self._busy, timeout)
+
+    def close(self, timeout: float | None = None):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)